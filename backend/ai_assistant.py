@@ -8,14 +8,14 @@ the remote course application form. It uses Gemini and reference PDFs.
 import os
 import json
 from typing import Dict, List, Any, Optional
-import google.generativeai as genai
 from dotenv import load_dotenv
+import gemini
+import validation
 
 # Load environment variables
 load_dotenv()
 
-# Configure Gemini
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+# Gemini is imported and configured lazily (see gemini.py)
 
 # PDF file paths
 RESOURCES_DIR = os.path.join(os.path.dirname(__file__), "resources")
@@ -42,7 +42,7 @@ def upload_reference_pdfs() -> Dict[str, Any]:
     for name, path in PDF_FILES.items():
         if os.path.exists(path):
             try:
-                uploaded = genai.upload_file(path, display_name=name)
+                uploaded = gemini.client().upload_file(path, display_name=name)
                 _uploaded_files[name] = uploaded
                 print(f"  Uploaded: {name}")
             except Exception as e:
@@ -135,37 +135,8 @@ def get_page_context(step: int) -> str:
 
 
 def analyze_form_data(form_data: Dict, step: int) -> str:
-    """Analyze current form data and provide context."""
-    analysis = []
-    
-    if step == 1:
-        if not form_data.get("course_name_zh"):
-            analysis.append("課程中文名稱尚未填寫")
-        if not form_data.get("course_name_en"):
-            analysis.append("課程英文名稱尚未填寫")
-        if not form_data.get("teacher_name"):
-            analysis.append("授課教師尚未填寫")
-        if not form_data.get("credits"):
-            analysis.append("學分數尚未填寫")
-            
-    elif step == 2:
-        if not form_data.get("teaching_objectives"):
-            analysis.append("教學目標尚未填寫")
-            
-    elif step == 3:
-        weeks = form_data.get("course_outline_weeks", [])
-        if len(weeks) < 18:
-            analysis.append(f"課程大綱只有 {len(weeks)} 週，建議填滿 18 週")
-        empty_weeks = [w["week"] for w in weeks if not w.get("content")]
-        if empty_weeks:
-            analysis.append(f"第 {', '.join(map(str, empty_weeks[:3]))} 週內容尚未填寫")
-            
-    elif step == 5:
-        grading = form_data.get("grading_criteria", [])
-        if grading:
-            total = sum(int(g.get("percentage", 0) or 0) for g in grading)
-            if total != 100:
-                analysis.append(f"成績評量百分比總和為 {total}%，應為 100%")
+    """Analyze current form data and provide context (the page's validation errors, see validation.py)."""
+    analysis = [error["message"] for error in validation.page_errors(form_data, step)]
     
     if analysis:
         return "目前發現以下待填項目：\n- " + "\n- ".join(analysis)
@@ -176,7 +147,7 @@ class AIAssistant:
     """AI Assistant for form filling help."""
     
     def __init__(self):
-        self.model = genai.GenerativeModel(
+        self.model = gemini.client().GenerativeModel(
             model_name="gemini-2.0-flash-exp",  # Will be updated if gemini-3-pro-preview available
             generation_config={
                 "temperature": 0.7,
@@ -1,41 +1,20 @@
 """
 Analyze a generated Word document to find unreplaced placeholders.
 """
-from docx import Document
-import re
 import sys
 
+import placeholder_scanner
+
 def find_unreplaced_placeholders(docx_path: str):
     """Find all {{placeholder}} that are still in the document."""
-    doc = Document(docx_path)
-    unreplaced = []
-    
-    def check_paragraph(para, location):
-        matches = re.findall(r'\{\{([^}]+)\}\}', para.text)
-        for match in matches:
-            unreplaced.append({
-                'placeholder': f'{{{{{match}}}}}',
-                'location': location,
-                'full_text': para.text[:100] + '...' if len(para.text) > 100 else para.text
-            })
-    
-    def process_table(table, table_idx):
-        for row_idx, row in enumerate(table.rows):
-            for cell_idx, cell in enumerate(row.cells):
-                for para_idx, para in enumerate(cell.paragraphs):
-                    check_paragraph(para, f'Table {table_idx}, Row {row_idx}, Cell {cell_idx}, Para {para_idx}')
-                for nested_idx, nested_table in enumerate(cell.tables):
-                    process_table(nested_table, f'{table_idx}.{nested_idx}')
-    
-    # Check paragraphs
-    for para_idx, para in enumerate(doc.paragraphs):
-        check_paragraph(para, f'Paragraph {para_idx}')
-    
-    # Check tables
-    for table_idx, table in enumerate(doc.tables):
-        process_table(table, table_idx)
-    
-    return unreplaced
+    return [
+        {
+            'placeholder': occurrence['placeholder'],
+            'location': occurrence['location'],
+            'full_text': occurrence['context'],
+        }
+        for occurrence in placeholder_scanner.scan(docx_path)
+    ]
 
 if __name__ == "__main__":
     # Use the file path from command line or default
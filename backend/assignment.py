@@ -0,0 +1,88 @@
+"""
+Reviewer Assignment Planning
+
+Pure functions that decide which reviewer reviews which application for
+bulk assignment. Database access lives in crud.bulk_assign_reviews.
+"""
+
+import heapq
+from typing import Dict, List, Optional, Set, Tuple
+
+ROUND_ROBIN = "round_robin"
+LEAST_LOADED = "least_loaded"
+STRATEGIES = (ROUND_ROBIN, LEAST_LOADED)
+
+
+class AssignmentCandidate:
+    """What the planner needs to know about an application."""
+
+    __slots__ = ("id", "departments", "assigned")
+
+    def __init__(self, application_id: str, departments: Set[str], assigned: Set[str]):
+        self.id = application_id
+        self.departments = {d for d in departments if d}
+        self.assigned = set(assigned)
+
+
+def _eligible(candidate: AssignmentCandidate, reviewer_id: str, reviewer_departments: Dict[str, Optional[str]], exclude_same_department: bool) -> bool:
+    if reviewer_id in candidate.assigned:
+        return False
+    if exclude_same_department and reviewer_departments.get(reviewer_id) in candidate.departments:
+        return False
+    return True
+
+
+def plan(
+    candidates: List[AssignmentCandidate],
+    reviewer_departments: Dict[str, Optional[str]],
+    strategy: str,
+    reviewers_per_application: int = 1,
+    exclude_same_department: bool = True,
+    pending_counts: Optional[Dict[str, int]] = None,
+) -> Tuple[List[Tuple[str, str]], List[Dict[str, str]]]:
+    """Return (application_id, reviewer_id) pairs plus applications that could not be fully staffed."""
+    reviewer_ids = sorted(reviewer_departments)
+    pairs: List[Tuple[str, str]] = []
+    skipped: List[Dict[str, str]] = []
+    if not reviewer_ids:
+        return pairs, [{"application_id": c.id, "reason": "No reviewers available"} for c in candidates]
+
+    if strategy == ROUND_ROBIN:
+        cursor = 0
+        for candidate in candidates:
+            chosen = 0
+            for step in range(len(reviewer_ids)):
+                if chosen == reviewers_per_application:
+                    break
+                reviewer_id = reviewer_ids[(cursor + step) % len(reviewer_ids)]
+                if _eligible(candidate, reviewer_id, reviewer_departments, exclude_same_department):
+                    pairs.append((candidate.id, reviewer_id))
+                    candidate.assigned.add(reviewer_id)
+                    chosen += 1
+            cursor = (cursor + max(chosen, 1)) % len(reviewer_ids)
+            if chosen < reviewers_per_application:
+                skipped.append({"application_id": candidate.id, "reason": "Not enough eligible reviewers"})
+
+    elif strategy == LEAST_LOADED:
+        loads = pending_counts or {}
+        heap = [(loads.get(r, 0), r) for r in reviewer_ids]
+        heapq.heapify(heap)
+        for candidate in candidates:
+            chosen, held = 0, []
+            while heap and chosen < reviewers_per_application:
+                load, reviewer_id = heapq.heappop(heap)
+                if _eligible(candidate, reviewer_id, reviewer_departments, exclude_same_department):
+                    pairs.append((candidate.id, reviewer_id))
+                    candidate.assigned.add(reviewer_id)
+                    load += 1
+                    chosen += 1
+                held.append((load, reviewer_id))
+            for item in held:
+                heapq.heappush(heap, item)
+            if chosen < reviewers_per_application:
+                skipped.append({"application_id": candidate.id, "reason": "Not enough eligible reviewers"})
+
+    else:
+        raise ValueError(f"Unknown assignment strategy: {strategy}")
+
+    return pairs, skipped
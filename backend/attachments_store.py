@@ -0,0 +1,207 @@
+"""
+Attachment Storage
+
+Attachment uploads (syllabi, slide decks, course videos) are parsed straight
+off the request stream with python-multipart's push parser: each chunk is
+hashed and written to a temp file as it arrives, so memory per upload stays
+at one batch regardless of file size. Parsing, hashing and writing run in a
+worker thread, a batch of up to WRITE_BATCH_BYTES at a time, so a large
+upload doesn't stall the event loop. Disallowed file types are rejected as
+soon as the part headers arrive and oversized files as soon as they cross
+ATTACHMENT_MAX_MB, before the rest of the body is read.
+
+Received files go into the content-addressed blob store (blobstore.py);
+Attachment.file_path holds the blob key, so the same slides attached to
+several applications share one blob.
+"""
+
+import hashlib
+import os
+from typing import AsyncIterator, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+import blobstore
+
+MAX_BYTES = int(float(os.getenv("ATTACHMENT_MAX_MB", "250")) * 1024 * 1024)
+# Multipart boundaries and part headers on top of the file itself
+ENVELOPE_BYTES = 64 * 1024
+FILE_FIELD = "file"
+# Body bytes handed to the worker thread at once (the ASGI server delivers ~64 KiB chunks)
+WRITE_BATCH_BYTES = 1024 * 1024
+
+# Extension -> stored content type; the client's declared type is not trusted
+ALLOWED_TYPES = {
+    ".pdf": "application/pdf",
+    ".doc": "application/msword",
+    ".docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    ".ppt": "application/vnd.ms-powerpoint",
+    ".pptx": "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+    ".xls": "application/vnd.ms-excel",
+    ".xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    ".odt": "application/vnd.oasis.opendocument.text",
+    ".odp": "application/vnd.oasis.opendocument.presentation",
+    ".txt": "text/plain",
+    ".csv": "text/csv",
+    ".zip": "application/zip",
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".gif": "image/gif",
+    ".mp3": "audio/mpeg",
+    ".m4a": "audio/mp4",
+    ".mp4": "video/mp4",
+    ".mov": "video/quicktime",
+    ".webm": "video/webm",
+}
+
+
+class UploadRejected(Exception):
+    """The upload was refused; status_code is the HTTP status to answer with."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+
+
+def content_type_for(filename: str) -> Optional[str]:
+    return ALLOWED_TYPES.get(os.path.splitext(filename)[1].lower())
+
+
+def clean_filename(filename: str) -> str:
+    """Base name only (browsers on Windows may send full paths), at most 255 characters."""
+    name = os.path.basename(filename.replace("\\", "/")).strip()
+    stem, ext = os.path.splitext(name)
+    return stem[: 255 - len(ext)] + ext
+
+
+class IncomingFile:
+    """A file being received: hashed and spooled to disk chunk by chunk."""
+
+    def __init__(self, filename: str, content_type: str, max_bytes: int = MAX_BYTES):
+        self.filename = filename
+        self.content_type = content_type
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.content_hash: Optional[str] = None
+        self._sha256 = hashlib.sha256()
+        # Spooled on the blob store's filesystem so storing it is a rename
+        self.path = blobstore.temp_path()
+        self._file = open(self.path, "wb")
+
+    def write(self, data: bytes):
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            raise UploadRejected(413, f"File exceeds the {self.max_bytes // (1024 * 1024)} MB limit")
+        self._sha256.update(data)
+        self._file.write(data)
+
+    def finish(self):
+        self._file.close()
+        self.content_hash = self._sha256.hexdigest()
+
+    def discard(self):
+        self._file.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class _MultipartReceiver:
+    """python-multipart callbacks that route the single file part into an IncomingFile."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.file: Optional[IncomingFile] = None
+        self._current: Optional[IncomingFile] = None
+        self._headers = {}
+        self._header_field = b""
+        self._header_value = b""
+
+    def on_part_begin(self):
+        self._headers = {}
+        self._current = None
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def on_header_end(self):
+        self._headers[self._header_field.strip().lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition"))
+        if options.get(b"name", b"").decode("latin-1") != FILE_FIELD or b"filename" not in options:
+            return  # other form fields are ignored
+        if self.file is not None:
+            raise UploadRejected(400, "Upload one file per request")
+        filename = clean_filename(options[b"filename"].decode("utf-8", "replace"))
+        content_type = content_type_for(filename)
+        if not filename or content_type is None:
+            raise UploadRejected(415, f"File type not allowed: {filename or '(no name)'}")
+        self.file = self._current = IncomingFile(filename, content_type, self.max_bytes)
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        if self._current is not None:
+            self._current.write(data[start:end])
+
+    def on_part_end(self):
+        self._current = None
+
+
+async def receive(stream: AsyncIterator[bytes], content_type: Optional[str], content_length: Optional[str] = None,
+                  max_bytes: int = MAX_BYTES) -> IncomingFile:
+    """
+    Read a multipart/form-data body with a "file" field from an ASGI byte stream.
+
+    Returns the finished IncomingFile, still in its spool file (see
+    crud.create_attachment); raises UploadRejected.
+    """
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes + ENVELOPE_BYTES:
+        raise UploadRejected(413, f"File exceeds the {max_bytes // (1024 * 1024)} MB limit")
+    media_type, options = parse_options_header(content_type)
+    if media_type != b"multipart/form-data" or b"boundary" not in options:
+        raise UploadRejected(415, "Expected multipart/form-data")
+
+    receiver = _MultipartReceiver(max_bytes)
+    parser = MultipartParser(options[b"boundary"], {
+        "on_part_begin": receiver.on_part_begin,
+        "on_header_field": receiver.on_header_field,
+        "on_header_value": receiver.on_header_value,
+        "on_header_end": receiver.on_header_end,
+        "on_headers_finished": receiver.on_headers_finished,
+        "on_part_data": receiver.on_part_data,
+        "on_part_end": receiver.on_part_end,
+    })
+    try:
+        batch = bytearray()
+        async for chunk in stream:
+            batch += chunk
+            if len(batch) >= WRITE_BATCH_BYTES:
+                await run_in_threadpool(parser.write, bytes(batch))
+                batch.clear()
+        if batch:
+            await run_in_threadpool(parser.write, bytes(batch))
+        await run_in_threadpool(parser.finalize)
+    except UploadRejected:
+        if receiver.file is not None:
+            receiver.file.discard()
+        raise
+    except Exception as e:
+        if receiver.file is not None:
+            receiver.file.discard()
+        raise UploadRejected(400, f"Malformed multipart body: {e}")
+    if receiver.file is None:
+        raise UploadRejected(400, f"Missing '{FILE_FIELD}' file field")
+    await run_in_threadpool(receiver.file.finish)
+    return receiver.file
@@ -0,0 +1,113 @@
+"""
+Auth throughput benchmark against a running server.
+
+Fires a burst of concurrent logins at /api/token and, while they are in flight,
+probes a cheap endpoint to measure how much unrelated requests are delayed.
+
+Usage:
+    uvicorn main:app --port 8000
+    python bench_auth.py --logins 200 --concurrency 20
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def login(base_url: str, email: str, password: str) -> float:
+    body = urllib.parse.urlencode({"username": email, "password": password}).encode()
+    request = urllib.request.Request(f"{base_url}/token", data=body, method="POST")
+    start = time.perf_counter()
+    with urllib.request.urlopen(request, timeout=60) as response:
+        response.read()
+    return time.perf_counter() - start
+
+
+def probe(base_url: str, path: str, stop: threading.Event, latencies: list, interval: float):
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(f"{base_url}{path}", timeout=60) as response:
+                response.read()
+            latencies.append(time.perf_counter() - start)
+        except urllib.error.URLError as e:
+            print(f"[BENCH] Probe failed: {e}")
+        time.sleep(interval)
+
+
+def summarize(latencies: list) -> dict:
+    return {
+        "count": len(latencies),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 2) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_ms": round(max(latencies) * 1000, 2) if latencies else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000/api")
+    parser.add_argument("--email", default="test@example.com")
+    parser.add_argument("--password", default="password")
+    parser.add_argument("--logins", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--probe-path", default="/health")
+    parser.add_argument("--probe-interval", type=float, default=0.01)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    # Baseline probe latency with no logins in flight
+    idle_latencies = []
+    stop = threading.Event()
+    prober = threading.Thread(target=probe, args=(args.base_url, args.probe_path, stop, idle_latencies, args.probe_interval))
+    prober.start()
+    time.sleep(1.0)
+    stop.set()
+    prober.join()
+
+    # Login storm with the prober running alongside
+    busy_latencies = []
+    stop = threading.Event()
+    prober = threading.Thread(target=probe, args=(args.base_url, args.probe_path, stop, busy_latencies, args.probe_interval))
+    prober.start()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        login_latencies = list(pool.map(lambda _: login(args.base_url, args.email, args.password), range(args.logins)))
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    prober.join()
+
+    report = {
+        "logins": args.logins,
+        "concurrency": args.concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "logins_per_sec": round(args.logins / elapsed, 2),
+        "login_latency": summarize(login_latencies),
+        "probe_latency_idle": summarize(idle_latencies),
+        "probe_latency_during_logins": summarize(busy_latencies),
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""
+Synthetic data for load tests.
+
+Fills a database with teachers, reviewers, applications carrying complete
+six-page form_data (18-week outline, grading table, ...) and review
+assignments, then rebuilds the derived tables (search index, stats
+counters) the API expects. Rows are bulk-inserted, so 2000 teachers with
+two applications each take seconds, not minutes.
+
+Accounts follow a fixed pattern (teacher{i}@bench.example.com,
+reviewer{i}@bench.example.com, password "password"); the manifest written
+next to the database tells bench_load.py how many there are.
+
+Usage:
+    python bench_data.py --database-url sqlite:///./bench.db --teachers 2000
+    DATABASE_URL=sqlite:///./bench.db GEMINI_STUB=1 uvicorn main:app --port 8000
+    python bench_load.py --base-url http://localhost:8000/api
+"""
+import argparse
+import json
+import os
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+EMAIL_DOMAIN = "bench.example.com"
+PASSWORD = "password"
+MANIFEST_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_manifest.json")
+
+DEPARTMENTS = ["資訊工程學系", "電機工程學系", "管理科學系", "外國語文學系", "應用數學系", "數位教學中心", "教育研究所"]
+DEGREE_LEVELS = ["學士班", "碩士班", "博士班", "學位學程", "學分學程"]
+SUBJECT_TYPES = ["專業科目", "通識課程", "共同課程"]
+ACTIVITIES = ["A.講述", "B.小組討論", "C.分組報告", "D.實作", "E.議題討論", "F.線上測驗"]
+E3_FUNCTIONS = ["討論區", "線上測驗", "作業繳交", "公告", "影音教材"]
+TOPICS = ["課程介紹", "基礎概念", "資料結構", "演算法分析", "系統設計", "案例研討", "分組專題", "期中考", "期末報告"]
+PARAGRAPH = "本課程介紹遠距教學的設計原則與實務操作，學生將透過線上討論、分組專題與期末報告，培養自主學習與跨域整合的能力。"
+
+
+def synthetic_form_data(rng: random.Random, index: int, teacher_name: str = "測試教師") -> Dict[str, Any]:
+    """A complete six-page application form, shaped like the one the frontend saves."""
+    weeks = []
+    for week in range(1, 19):
+        mode = rng.choice(["physical", "async", "sync"])
+        weeks.append({
+            "week": week,
+            "content": f"第{week}週：{rng.choice(TOPICS)}（{PARAGRAPH[:rng.randint(10, 40)]}）",
+            "has_activity": week % 3 == 0,
+            "activity_description": "課後線上討論與作業" if week % 3 == 0 else "",
+            "hours_physical": "3" if mode == "physical" else "",
+            "hours_async": "3" if mode == "async" else "",
+            "hours_sync": "3" if mode == "sync" else "",
+            "note": "",
+        })
+    shares = rng.choice([(20, 30, 50), (30, 30, 40), (10, 40, 50), (25, 25, 50)])
+    return {
+        # Page 1
+        "academic_year": str(rng.choice([113, 114])),
+        "semester": rng.choice(["上學期", "下學期"]),
+        "main_department": rng.choice(DEPARTMENTS),
+        "co_department": "",
+        "degree_level": rng.choice(DEGREE_LEVELS),
+        "degree_program_type": "碩士班",
+        "subject_type": rng.choice(SUBJECT_TYPES),
+        "course_name_zh": f"遠距課程設計實務 {index}",
+        "course_name_en": f"Practice of Distance Course Design {index}",
+        "teacher_name": f"{teacher_name} 副教授",
+        "permanent_course_id": f"BENCH{index:05d}",
+        "credits": str(rng.choice([2, 3])),
+        "course_type": rng.choice(["必修", "選修"]),
+        "class_count": "1",
+        "student_count": str(rng.randint(20, 120)),
+        "language": "否",
+        "subtitles": "無字幕",
+        "platform": ["E3"],
+        "external_participation": "否",
+        "review_category": "校內遠距課程審查",
+        "past_async_materials_type": ["首次開課"],
+        # Page 2
+        "teaching_method_async_weeks": "8",
+        "teaching_method_async_hours": "24",
+        "teaching_method_sync_weeks": "4",
+        "teaching_method_sync_hours": "12",
+        "teaching_method_physical_weeks": "6",
+        "teaching_method_physical_hours": "18",
+        "teaching_method_total_weeks": "18",
+        "teaching_objectives": PARAGRAPH * 3,
+        "textbooks": "遠距教學設計導論（第三版）",
+        "reference_materials": "線上課程設計實務手冊",
+        # Page 3
+        "course_outline_weeks": weeks,
+        # Page 4
+        "teaching_activities": rng.sample(ACTIVITIES, 3),
+        "e3_functions": rng.sample(E3_FUNCTIONS, 2),
+        "interaction_sync_checked": True,
+        "interaction_sync_count": "4",
+        "interaction_async_checked": True,
+        "interaction_async_count": "8",
+        "assignment_submission": ["E3平台"],
+        # Page 5
+        "async_check": "1/2作業",
+        "grading_criteria": [
+            {"category": "平時成績", "percentage": str(shares[0]), "description": "課堂參與與線上討論", "ref_calculation": ""},
+            {"category": "期中報告", "percentage": str(shares[1]), "description": "小組報告", "ref_calculation": ""},
+            {"category": "期末報告", "percentage": str(shares[2]), "description": "專案成果", "ref_calculation": ""},
+        ],
+        "teacher_email": f"teacher{index}@{EMAIL_DOMAIN}",
+        "ta_name": "王小明",
+        "ta_email": f"ta{index}@{EMAIL_DOMAIN}",
+        "office_hour": "週三 14:00-16:00",
+        # Page 6
+        "notes": "",
+        "electronic_delivery": "是",
+        "copyright_declaration": True,
+    }
+
+
+def _chunks(rows: List[dict], size: int = 1000):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def generate(db, teachers: int, apps_per_teacher: int, reviewers: int, reviews_per_app: int, seed: int) -> Dict[str, int]:
+    from sqlalchemy import insert
+
+    import models
+    import projection
+    import search
+    import security
+    import stats
+    import validation
+
+    rng = random.Random(seed)
+    # One bcrypt hash shared by every synthetic account keeps generation fast
+    hashed_password = security.get_password_hash(PASSWORD)
+    now = datetime.utcnow()
+
+    teacher_rows = [{
+        "id": str(uuid.uuid4()),
+        "email": f"teacher{i}@{EMAIL_DOMAIN}",
+        "hashed_password": hashed_password,
+        "name": f"教師{i}",
+        "role": models.UserRole.TEACHER,
+        "department": rng.choice(DEPARTMENTS),
+    } for i in range(teachers)]
+    reviewer_rows = [{
+        "id": str(uuid.uuid4()),
+        "email": f"reviewer{i}@{EMAIL_DOMAIN}",
+        "hashed_password": hashed_password,
+        "name": f"審查委員{i}",
+        "role": models.UserRole.REVIEWER,
+        "department": rng.choice(DEPARTMENTS),
+    } for i in range(reviewers)]
+    for chunk in _chunks(teacher_rows + reviewer_rows):
+        db.execute(insert(models.User), chunk)
+
+    statuses = [models.ApplicationStatus.DRAFT] * 4 + [models.ApplicationStatus.SUBMITTED] * 2 + [
+        models.ApplicationStatus.UNDER_REVIEW, models.ApplicationStatus.APPROVED, models.ApplicationStatus.CORRECTION_NEEDED
+    ]
+    application_rows, review_rows = [], []
+    index = 0
+    for teacher in teacher_rows:
+        for _ in range(apps_per_teacher):
+            form_data = synthetic_form_data(rng, index, teacher["name"])
+            status = rng.choice(statuses)
+            created = now - timedelta(days=rng.randint(0, 180))
+            row = {
+                "id": str(uuid.uuid4()),
+                "teacher_id": teacher["id"],
+                "course_name_zh": form_data["course_name_zh"],
+                "course_name_en": form_data["course_name_en"],
+                "permanent_course_id": form_data["permanent_course_id"],
+                "status": status,
+                "submission_time": created if status != models.ApplicationStatus.DRAFT else None,
+                "is_moe_certified": False,
+                "form_data": form_data,
+                "version": 1,
+                "created_at": created,
+                "updated_at": created,
+                **projection.project(form_data),
+                **validation.columns(validation.validate(form_data)),
+            }
+            application_rows.append(row)
+            if status != models.ApplicationStatus.DRAFT and reviewer_rows:
+                for reviewer in rng.sample(reviewer_rows, min(reviews_per_app, len(reviewer_rows))):
+                    done = status in (models.ApplicationStatus.APPROVED, models.ApplicationStatus.CORRECTION_NEEDED)
+                    review_rows.append({
+                        "id": str(uuid.uuid4()),
+                        "application_id": row["id"],
+                        "reviewer_id": reviewer["id"],
+                        "status": models.ReviewStatus.COMPLETED if done else models.ReviewStatus.PENDING,
+                        "result": models.ReviewResult.PASSED if done else None,
+                        "comments": "內容完整" if done else None,
+                    })
+            index += 1
+    for chunk in _chunks(application_rows, 500):
+        db.execute(insert(models.Application), chunk)
+    for chunk in _chunks(review_rows):
+        db.execute(insert(models.Review), chunk)
+    db.commit()
+
+    # Derived tables normally maintained by crud on every write
+    search.rebuild(db)
+    stats.reconcile(db)
+    db.commit()
+    return {
+        "teachers": teachers,
+        "reviewers": reviewers,
+        "applications": len(application_rows),
+        "reviews": len(review_rows),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=None, help="defaults to DATABASE_URL / the app's database")
+    parser.add_argument("--teachers", type=int, default=2000)
+    parser.add_argument("--apps-per-teacher", type=int, default=2)
+    parser.add_argument("--reviewers", type=int, default=50)
+    parser.add_argument("--reviews-per-app", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--manifest", default=MANIFEST_PATH)
+    args = parser.parse_args()
+
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    # Imported after DATABASE_URL is set, since database.py reads it at import
+    import database
+    import migrations
+
+    migrations.upgrade(database.engine)
+    start = time.perf_counter()
+    db = database.SessionLocal()
+    try:
+        migrations.seed_demo_users(db)
+        counts = generate(db, args.teachers, args.apps_per_teacher, args.reviewers, args.reviews_per_app, args.seed)
+    finally:
+        db.close()
+    counts["seconds"] = round(time.perf_counter() - start, 1)
+
+    manifest = {
+        "database_url": database.SQLALCHEMY_DATABASE_URL,
+        "email_domain": EMAIL_DOMAIN,
+        "password": PASSWORD,
+        "seed": args.seed,
+        "generated_at": datetime.utcnow().isoformat(timespec="seconds"),
+        **counts,
+    }
+    with open(args.manifest, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    print(json.dumps(manifest, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Import-time (cold start) benchmark.
+
+Runs `python -X importtime -c "import main"` in fresh interpreters, parses the
+per-module timings and compares them with the committed baseline in
+import_baseline.json. Exits non-zero when importing main got more than
+--tolerance slower than the baseline, or when a module listed under
+"forbidden" (heavy SDKs that must stay lazy) is imported at start-up.
+
+Usage:
+    python bench_import.py                     # compare with the baseline
+    python bench_import.py --update-baseline   # record the current timings
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(BASE_DIR, "import_baseline.json")
+DEFAULT_FORBIDDEN = ["google.generativeai", "googleapiclient.discovery"]
+
+
+def parse_importtime(stderr: str) -> Dict[str, Tuple[int, int]]:
+    """Module name -> (self_us, cumulative_us) from -X importtime output."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+            modules[name.strip()] = (int(self_us), int(cumulative_us))
+        except ValueError:
+            continue
+    return modules
+
+
+def measure(module: str) -> Dict[str, Tuple[int, int]]:
+    env = dict(os.environ, AUTO_MIGRATE="0", PYTHONDONTWRITEBYTECODE="1")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BASE_DIR, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        sys.stderr.write(result.stderr[-2000:])
+        raise SystemExit(f"[BENCH] Importing {module} failed")
+    return parse_importtime(result.stderr)
+
+
+def summarize(runs: List[Dict[str, Tuple[int, int]]], module: str, top: int) -> dict:
+    totals = [run[module][1] for run in runs]
+    # Heaviest direct dependencies of the module, by median cumulative time
+    names = set().union(*runs)
+    medians = {
+        name: statistics.median(run[name][1] for run in runs if name in run)
+        for name in names if name != module
+    }
+    heaviest = sorted(medians.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {
+        "module": module,
+        "runs": len(runs),
+        "total_ms": round(statistics.median(totals) / 1000, 1),
+        "min_ms": round(min(totals) / 1000, 1),
+        "modules_imported": len(names),
+        "heaviest": [{"module": name, "cumulative_ms": round(us / 1000, 1)} for name, us in heaviest],
+        "imported": sorted(names),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown vs. baseline (0.25 = 25%%)")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    summary = summarize([measure(args.module) for _ in range(args.runs)], args.module, args.top)
+    imported = set(summary.pop("imported"))
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+
+    baseline = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, encoding="utf-8") as f:
+            baseline = json.load(f)
+    forbidden = baseline.get("forbidden", DEFAULT_FORBIDDEN)
+
+    if args.update_baseline:
+        record = {key: summary[key] for key in ("module", "total_ms", "modules_imported")}
+        record["forbidden"] = forbidden
+        with open(BASELINE_PATH, "w", encoding="utf-8") as f:
+            json.dump(record, f, indent=2)
+            f.write("\n")
+        print(f"[BENCH] Baseline written to {BASELINE_PATH}")
+        return
+
+    failures = [f"{name} is imported at start-up" for name in forbidden if name in imported]
+    if baseline.get("module") == args.module and baseline.get("total_ms"):
+        limit = baseline["total_ms"] * (1 + args.tolerance)
+        print(f"[BENCH] {args.module}: {summary['total_ms']} ms (baseline {baseline['total_ms']} ms, limit {limit:.1f} ms)")
+        if summary["total_ms"] > limit:
+            failures.append(f"import time {summary['total_ms']} ms exceeds {limit:.1f} ms")
+    for failure in failures:
+        print(f"[BENCH] FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
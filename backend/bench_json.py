@@ -0,0 +1,153 @@
+"""
+JSON payload benchmark for a 100-application list.
+
+Offline (default): builds a synthetic list of applications with Chinese
+form_data, then compares the stdlib JSONResponse renderer with
+FastJSONResponse and the payload size uncompressed, gzipped and brotli'd.
+
+Against a running server (--base-url): logs in, fetches the application list
+with each Accept-Encoding and reports bytes on the wire and latency.
+
+Usage:
+    python bench_json.py
+    python bench_json.py --base-url http://localhost:8000/api --email admin@example.com --password password
+"""
+import argparse
+import gzip
+import json
+import statistics
+import time
+import urllib.parse
+import urllib.request
+import uuid
+from datetime import datetime
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+import compression
+import json_response
+import schemas
+
+PARAGRAPH = "本課程介紹遠距教學的設計原則與實務操作，學生將透過線上討論、分組專題與期末報告，培養自主學習與跨域整合的能力。"
+
+
+def synthetic_application(index: int) -> dict:
+    now = datetime.utcnow()
+    form_data = {
+        "course_name_zh": f"遠距課程設計實務 {index}",
+        "course_name_en": f"Practice of Distance Course Design {index}",
+        "academic_year": "113",
+        "semester": "1",
+        "main_department": "資訊工程學系",
+        "degree_level": "學士班",
+        "credits": 3,
+        "platform": ["Moodle", "Google Meet"],
+        "course_objectives": PARAGRAPH * 4,
+        "course_outline": [{"week": w, "topic": f"第{w}週：{PARAGRAPH[:30]}", "hours": 3} for w in range(1, 19)],
+        "grading": [{"item": "期中報告", "ratio": 30}, {"item": "期末專題", "ratio": 40}, {"item": "課堂參與", "ratio": 30}],
+    }
+    return {
+        "id": str(uuid.uuid4()),
+        "teacher_id": str(uuid.uuid4()),
+        "course_name_zh": form_data["course_name_zh"],
+        "course_name_en": form_data["course_name_en"],
+        "status": "DRAFT",
+        "version": 3,
+        "form_data": form_data,
+        "created_at": now,
+        "updated_at": now,
+        "reviews": [],
+        "attachments": [],
+    }
+
+
+def timed(func, repeat: int) -> dict:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return {"mean_ms": round(statistics.mean(samples) * 1000, 3), "min_ms": round(min(samples) * 1000, 3)}
+
+
+def offline(count: int, repeat: int) -> dict:
+    applications = [schemas.Application(**synthetic_application(i)) for i in range(count)]
+    content = jsonable_encoder(applications)
+
+    before = JSONResponse(content).body
+    after = json_response.FastJSONResponse(content).body
+    assert json.loads(before) == json.loads(after)
+
+    report = {
+        "applications": count,
+        "orjson": json_response.orjson is not None,
+        "render": {
+            "stdlib_json": timed(lambda: JSONResponse(content), repeat),
+            "fast_json": timed(lambda: json_response.FastJSONResponse(content), repeat),
+        },
+        "bytes": {
+            "ascii_escaped_json": len(json.dumps(content).encode("utf-8")),
+            "identity": len(after),
+            "gzip": len(gzip.compress(after, compresslevel=compression.GZIP_LEVEL)),
+        },
+        "compress": {"gzip": timed(lambda: compression.compress(after, "gzip"), repeat)},
+    }
+    if compression.brotli is not None:
+        report["bytes"]["br"] = len(compression.compress(after, "br"))
+        report["compress"]["br"] = timed(lambda: compression.compress(after, "br"), repeat)
+    return report
+
+
+def login(base_url: str, email: str, password: str) -> str:
+    body = urllib.parse.urlencode({"username": email, "password": password}).encode()
+    with urllib.request.urlopen(urllib.request.Request(f"{base_url}/token", data=body, method="POST"), timeout=60) as response:
+        return json.load(response)["access_token"]
+
+
+def online(base_url: str, email: str, password: str, limit: int, repeat: int) -> dict:
+    token = login(base_url, email, password)
+    report = {}
+    for encoding in ["identity"] + compression.supported_encodings():
+        samples, size = [], 0
+        for _ in range(repeat):
+            request = urllib.request.Request(
+                f"{base_url}/applications?limit={limit}",
+                headers={"Authorization": f"Bearer {token}", "Accept-Encoding": encoding},
+            )
+            start = time.perf_counter()
+            with urllib.request.urlopen(request, timeout=60) as response:
+                size = len(response.read())
+                served = response.headers.get("Content-Encoding", "identity")
+            samples.append(time.perf_counter() - start)
+        report[encoding] = {
+            "served_encoding": served,
+            "bytes": size,
+            "mean_ms": round(statistics.mean(samples) * 1000, 2),
+            "min_ms": round(min(samples) * 1000, 2),
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=100, help="applications in the list")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--base-url", help="benchmark a running server instead, e.g. http://localhost:8000/api")
+    parser.add_argument("--email", default="admin@example.com")
+    parser.add_argument("--password", default="password")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    args = parser.parse_args()
+
+    if args.base_url:
+        report = online(args.base_url.rstrip("/"), args.email, args.password, args.count, args.repeat)
+    else:
+        report = offline(args.count, args.repeat)
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+"""
+End-to-end load test against a running server.
+
+Simulated users work through a weighted mix of the app's hot paths for a
+fixed duration and the per-scenario latencies (p50/p95/p99), throughput and
+error counts are written as a JSON report:
+
+    login      POST  /api/token
+    dashboard  GET   /api/applications (teacher's own list)
+    autosave   PATCH /api/applications/{id} (merge patch, optimistic version)
+    review     PUT   /api/reviews/{id} (reviewer inbox + decision)
+    document   GET   /api/applications/{id}/download
+    chat       POST  /api/ai-assistant/chat
+
+Accounts come from bench_data.py (see its manifest). Start the server with
+GEMINI_STUB=1 so document generation and chat exercise the pipeline with a
+fixed model latency instead of calling Gemini.
+
+With --compare, the run is checked against an earlier report and the script
+exits non-zero if any scenario's p95 got more than --max-regression percent
+slower, or its error rate went up.
+
+Usage:
+    python bench_data.py --database-url sqlite:///./bench.db
+    DATABASE_URL=sqlite:///./bench.db GEMINI_STUB=1 uvicorn main:app --port 8000
+    python bench_load.py --users 20 --duration 60 --output load_baseline.json
+    python bench_load.py --users 20 --duration 60 --compare load_baseline.json
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from bench_auth import percentile, summarize
+from bench_data import MANIFEST_PATH
+
+DEFAULT_MIX = "login=1,dashboard=6,autosave=8,review=3,document=1,chat=1"
+SCENARIOS = ["login", "dashboard", "autosave", "review", "document", "chat"]
+
+
+class Stats:
+    """Latencies and outcomes per scenario, shared by all user threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = {name: [] for name in SCENARIOS}
+        self.errors: Dict[str, int] = {name: 0 for name in SCENARIOS}
+        self.statuses: Dict[str, Dict[str, int]] = {name: {} for name in SCENARIOS}
+
+    def record(self, scenario: str, elapsed: float, status: int, ok: bool):
+        with self._lock:
+            self.latencies[scenario].append(elapsed)
+            codes = self.statuses[scenario]
+            codes[str(status)] = codes.get(str(status), 0) + 1
+            if not ok:
+                self.errors[scenario] += 1
+
+
+class Client:
+    """One simulated user: a bearer token and a tiny urllib wrapper."""
+
+    def __init__(self, base_url: str, stats: Stats):
+        self.base_url = base_url
+        self.stats = stats
+        self.token: Optional[str] = None
+
+    def request(self, scenario: Optional[str], method: str, path: str, body=None, form=None, ok=(200,)):
+        """Send a request and, if scenario is given, record it; returns (status, parsed body or None)."""
+        headers = {}
+        data = None
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        if form is not None:
+            data = urllib.parse.urlencode(form).encode()
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        elif body is not None:
+            data = json.dumps(body).encode()
+            headers["Content-Type"] = "application/json"
+        request = urllib.request.Request(f"{self.base_url}{path}", data=data, method=method, headers=headers)
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=120) as response:
+                status, raw = response.status, response.read()
+                content_type = response.headers.get("Content-Type", "")
+        except urllib.error.HTTPError as e:
+            status, raw, content_type = e.code, e.read(), e.headers.get("Content-Type", "")
+        except (urllib.error.URLError, OSError):
+            status, raw, content_type = 0, b"", ""
+        elapsed = time.perf_counter() - start
+        if scenario:
+            self.stats.record(scenario, elapsed, status, status in ok)
+        if "json" in content_type and raw:
+            return status, json.loads(raw)
+        return status, None
+
+    def login(self, email: str, password: str, scenario: Optional[str] = "login") -> bool:
+        self.token = None
+        status, body = self.request(scenario, "POST", "/token", form={"username": email, "password": password})
+        if status == 200:
+            self.token = body["access_token"]
+        return self.token is not None
+
+
+class TeacherSession:
+    def __init__(self, client: Client, email: str, password: str, rng: random.Random):
+        self.client = client
+        self.email = email
+        self.password = password
+        self.rng = rng
+        self.applications: List[str] = []
+        self.versions: Dict[str, int] = {}
+
+    def start(self) -> bool:
+        if not self.client.login(self.email, self.password, scenario=None):
+            return False
+        status, body = self.client.request(None, "GET", "/applications?limit=20")
+        if status == 200:
+            self.applications = [a["id"] for a in body if a["status"] in ("DRAFT", "CORRECTION_NEEDED")] or [a["id"] for a in body]
+            self.versions = {a["id"]: a.get("version", 1) for a in body}
+        return bool(self.applications)
+
+    def login(self):
+        self.client.login(self.email, self.password)
+
+    def dashboard(self):
+        self.client.request("dashboard", "GET", "/applications?limit=20")
+
+    def autosave(self):
+        application_id = self.rng.choice(self.applications)
+        week = self.rng.randint(1, 18)
+        merge = {
+            "teaching_objectives": f"自動儲存測試 {time.time():.3f}",
+            f"bench_week_{week}_note": "x" * self.rng.randint(20, 400),
+        }
+        status, body = self.client.request(
+            "autosave", "PATCH", f"/applications/{application_id}",
+            body={"version": self.versions.get(application_id, 1), "merge": merge}, ok=(200, 409),
+        )
+        if status == 200:
+            self.versions[application_id] = body["version"]
+        elif status == 409:
+            # Another tab won; pick up the current version like the frontend does
+            status, body = self.client.request(None, "GET", f"/applications/{application_id}")
+            if status == 200:
+                self.versions[application_id] = body["version"]
+
+    def document(self):
+        self.client.request("document", "GET", f"/applications/{self.rng.choice(self.applications)}/download")
+
+    def chat(self):
+        self.client.request("chat", "POST", "/ai-assistant/chat", body={
+            "message": "請問課程大綱要寫到多詳細？", "step": self.rng.randint(1, 6), "formData": {},
+        })
+
+
+class ReviewerSession:
+    def __init__(self, client: Client, email: str, password: str, rng: random.Random):
+        self.client = client
+        self.email = email
+        self.password = password
+        self.rng = rng
+
+    def start(self) -> bool:
+        return self.client.login(self.email, self.password, scenario=None)
+
+    def review(self):
+        status, body = self.client.request(None, "GET", "/reviews/inbox?limit=20")
+        if status != 200 or not body["items"]:
+            return
+        item = self.rng.choice(body["items"])
+        self.client.request("review", "PUT", f"/reviews/{item['id']}", body={
+            "result": self.rng.choice(["PASSED", "MODIFICATION_NEEDED", "REJECTED"]),
+            "comments": f"壓力測試審查意見 {time.time():.3f}",
+        })
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise SystemExit(f"Unknown scenario '{name}' (choose from {', '.join(SCENARIOS)})")
+        mix[name] = float(weight or 1)
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+def run_user(index: int, args, manifest: dict, mix: Dict[str, float], stats: Stats, deadline: float):
+    rng = random.Random(args.seed + index)
+    domain, password = manifest["email_domain"], manifest["password"]
+    teacher = TeacherSession(
+        Client(args.base_url, stats), f"teacher{index % manifest['teachers']}@{domain}", password, rng
+    )
+    reviewer = None
+    if manifest.get("reviewers") and "review" in mix:
+        reviewer = ReviewerSession(
+            Client(args.base_url, stats), f"reviewer{index % manifest['reviewers']}@{domain}", password, rng
+        )
+        if not reviewer.start():
+            reviewer = None
+    if not teacher.start():
+        print(f"[BENCH] User {index}: could not log in as {teacher.email}")
+        return
+
+    actions = {
+        "login": teacher.login,
+        "dashboard": teacher.dashboard,
+        "autosave": teacher.autosave,
+        "document": teacher.document,
+        "chat": teacher.chat,
+        "review": reviewer.review if reviewer else None,
+    }
+    names = [name for name in mix if actions[name] is not None]
+    weights = [mix[name] for name in names]
+    while time.perf_counter() < deadline:
+        actions[rng.choices(names, weights)[0]]()
+        if args.think_time:
+            time.sleep(rng.uniform(0, 2 * args.think_time))
+
+
+def build_report(args, stats: Stats, elapsed: float) -> dict:
+    scenarios = {}
+    for name in SCENARIOS:
+        latencies = stats.latencies[name]
+        if not latencies:
+            continue
+        scenarios[name] = {
+            **summarize(latencies),
+            "rps": round(len(latencies) / elapsed, 2),
+            "errors": stats.errors[name],
+            "error_rate": round(stats.errors[name] / len(latencies), 4),
+            "status_codes": stats.statuses[name],
+        }
+    everything = [value for values in stats.latencies.values() for value in values]
+    return {
+        "base_url": args.base_url,
+        "users": args.users,
+        "duration_s": round(elapsed, 1),
+        "mix": args.mix,
+        "requests": len(everything),
+        "rps": round(len(everything) / elapsed, 2),
+        "errors": sum(stats.errors.values()),
+        "p95_ms": round(percentile(everything, 95) * 1000, 2),
+        "scenarios": scenarios,
+    }
+
+
+def compare(report: dict, baseline: dict, max_regression: float) -> List[str]:
+    """Scenario regressions of report against baseline, as printable lines."""
+    problems = []
+    for name, current in report["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if before is None:
+            continue
+        if before["p95_ms"] and current["p95_ms"] > before["p95_ms"] * (1 + max_regression / 100):
+            problems.append(f"{name}: p95 {before['p95_ms']} ms -> {current['p95_ms']} ms")
+        if current["error_rate"] > before["error_rate"] + 0.01:
+            problems.append(f"{name}: error rate {before['error_rate']:.2%} -> {current['error_rate']:.2%}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000/api")
+    parser.add_argument("--manifest", default=MANIFEST_PATH, help="written by bench_data.py")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="scenario weights, e.g. autosave=8,document=1")
+    parser.add_argument("--think-time", type=float, default=0.0, help="mean pause between actions, seconds")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--compare", help="Baseline report to check this run against")
+    parser.add_argument("--max-regression", type=float, default=20.0, help="allowed p95 slowdown, percent")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.manifest):
+        raise SystemExit(f"{args.manifest} not found; run bench_data.py first")
+    with open(args.manifest, encoding="utf-8") as f:
+        manifest = json.load(f)
+    mix = parse_mix(args.mix)
+
+    stats = Stats()
+    start = time.perf_counter()
+    deadline = start + args.duration
+    with ThreadPoolExecutor(max_workers=args.users) as pool:
+        for future in [pool.submit(run_user, i, args, manifest, mix, stats, deadline) for i in range(args.users)]:
+            future.result()
+    report = build_report(args, stats, time.perf_counter() - start)
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            problems = compare(report, json.load(f), args.max_regression)
+        for line in problems:
+            print(f"[BENCH] Regression: {line}")
+        if problems:
+            sys.exit(1)
+        print(f"[BENCH] No regressions against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+Micro-benchmarks for the CPU-bound stages of the document pipeline.
+
+Times the pieces we control, with no server, database or Gemini involved:
+
+    extract_placeholders   scan resources/template.docx for {{placeholders}}
+    fill_template          fill the template from a fixed fake value map
+    save_document          serialize the filled document (fixed zip timestamps)
+    verify_placeholders    audit the generated document for unreplaced placeholders
+    analyze_form_data      pages 1-6 of a large synthetic form
+    validate_form          all validation rules over the same form
+    revalidate_field       incremental validation after one field changed
+    application_schema     validate + encode 100 schemas.Application objects
+
+Each benchmark is calibrated like timeit's autorange (enough calls per round
+to take ~0.2 s) and reported per call: min, median, mean, stddev. The change
+against the latest entry of bench_history.jsonl recorded on the same kind of
+machine (architecture, OS, CPU count, Python version) is printed at the end;
+timings from other machines are not comparable and are skipped. --record
+appends the run with the git commit, so numbers before and after an
+optimization sit side by side; record baselines deliberately, not on every run.
+
+Usage:
+    python bench_pipeline.py
+    python bench_pipeline.py --filter fill --rounds 10
+    python bench_pipeline.py --record
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import timeit
+import uuid
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+from fastapi.encoders import jsonable_encoder
+
+import ai_assistant
+import schemas
+import validation
+import word_generator
+from bench_data import PARAGRAPH, synthetic_form_data
+
+HISTORY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_history.jsonl")
+
+
+def fake_values(placeholders) -> Dict[str, str]:
+    """Deterministic values of mixed length, some with line breaks like real LLM output."""
+    values = {}
+    for i, key in enumerate(placeholders):
+        if i % 7 == 0:
+            values[key] = f"第{i}項\n{PARAGRAPH}"
+        elif i % 3 == 0:
+            values[key] = PARAGRAPH[: 10 + i % 40]
+        else:
+            values[key] = f"值{i}"
+    return values
+
+
+def large_form(rng: random.Random) -> dict:
+    """A form well past typical size: long week descriptions and a long grading table."""
+    form_data = synthetic_form_data(rng, 0)
+    for week in form_data["course_outline_weeks"]:
+        week["content"] = week["content"] + PARAGRAPH * 10
+        week["activity_description"] = PARAGRAPH * 3
+    form_data["course_outline_weeks"][5]["content"] = ""
+    form_data["grading_criteria"] = [
+        {"category": f"項目{i}", "percentage": "5", "description": PARAGRAPH, "ref_calculation": ""} for i in range(20)
+    ]
+    form_data["teaching_objectives"] = PARAGRAPH * 40
+    return form_data
+
+
+def application_dicts(rng: random.Random, count: int) -> list:
+    now = datetime.utcnow()
+    rows = []
+    for i in range(count):
+        form_data = synthetic_form_data(rng, i)
+        rows.append({
+            "id": str(uuid.uuid4()),
+            "teacher_id": str(uuid.uuid4()),
+            "course_name_zh": form_data["course_name_zh"],
+            "course_name_en": form_data["course_name_en"],
+            "status": "DRAFT",
+            "version": 3,
+            "form_data": form_data,
+            "academic_year": form_data["academic_year"],
+            "semester": form_data["semester"],
+            "main_department": form_data["main_department"],
+            "created_at": now,
+            "updated_at": now,
+            "reviews": [],
+            "attachments": [],
+        })
+    return rows
+
+
+def build_benchmarks() -> Dict[str, Callable[[], object]]:
+    template_bytes, placeholders = word_generator.load_template()
+    values = fake_values(placeholders)
+    filled = word_generator.fill_template(io.BytesIO(template_bytes), values)
+    generated = word_generator.save_document(filled)
+    rng = random.Random(0)
+    form_data = large_form(rng)
+    stored = validation.validate(form_data)
+    edited = {**form_data, "teaching_objectives": form_data["teaching_objectives"] + "。"}
+    applications = application_dicts(rng, 100)
+
+    def analyze_all_pages():
+        for step in range(1, 7):
+            ai_assistant.analyze_form_data(form_data, step)
+
+    return {
+        "extract_placeholders": lambda: word_generator.extract_placeholders(io.BytesIO(template_bytes)),
+        "fill_template": lambda: word_generator.fill_template(io.BytesIO(template_bytes), values),
+        "save_document": lambda: word_generator.save_document(filled),
+        "verify_placeholders": lambda: word_generator.find_unreplaced(generated),
+        "analyze_form_data": analyze_all_pages,
+        "validate_form": lambda: validation.validate(form_data),
+        "revalidate_field": lambda: validation.revalidate(stored, form_data, edited),
+        "application_schema": lambda: jsonable_encoder([schemas.Application(**row) for row in applications]),
+    }
+
+
+def measure(func: Callable[[], object], rounds: int) -> dict:
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    samples = [total / number for total in timer.repeat(repeat=rounds, number=number)]
+    return {
+        "min_ms": round(min(samples) * 1000, 4),
+        "median_ms": round(statistics.median(samples) * 1000, 4),
+        "mean_ms": round(statistics.mean(samples) * 1000, 4),
+        "stddev_ms": round(statistics.stdev(samples) * 1000, 4) if len(samples) > 1 else 0.0,
+        "rounds": rounds,
+        "iterations": number,
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+MACHINE_KEYS = ("machine", "system", "cpus", "python")
+
+
+def machine_info() -> dict:
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "system": platform.system(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def last_entry(path: str, machine: dict) -> Optional[dict]:
+    """The latest recorded entry from the same kind of machine."""
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    for entry in reversed(entries):
+        if all(entry.get(key) == machine[key] for key in MACHINE_KEYS):
+            return entry
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--filter", help="only run benchmarks whose name contains this")
+    parser.add_argument("--history", default=HISTORY_PATH)
+    parser.add_argument("--record", action="store_true", help="append this run to the history")
+    args = parser.parse_args()
+
+    # fill_template and friends print progress lines; keep them out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        benchmarks = build_benchmarks()
+        results = {}
+        for name, func in benchmarks.items():
+            if args.filter and args.filter not in name:
+                continue
+            results[name] = measure(func, args.rounds)
+
+    entry = {
+        "timestamp": datetime.utcnow().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        **machine_info(),
+        "results": results,
+    }
+    print(json.dumps(entry, indent=2))
+
+    previous = last_entry(args.history, entry)
+    if previous is None:
+        print("[BENCH] No recorded entry from this machine to compare against")
+    else:
+        for name, result in results.items():
+            before = previous["results"].get(name)
+            if before:
+                change = (result["median_ms"] / before["median_ms"] - 1) * 100 if before["median_ms"] else 0.0
+                print(f"[BENCH] {name}: {before['median_ms']} ms -> {result['median_ms']} ms "
+                      f"({change:+.1f}% vs {previous.get('commit') or previous['timestamp']})")
+    if args.record:
+        with open(args.history, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+
+
+if __name__ == "__main__":
+    main()
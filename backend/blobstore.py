@@ -0,0 +1,471 @@
+"""
+Content-Addressed Blob Store
+
+Attachments and generated documents are stored once per SHA-256 of their
+contents, under keys sharded two levels deep (ab/cd/abcd...), so storage and
+I/O grow with unique content rather than with upload count.
+
+Every stored blob has a row in the blobs table with a reference count:
+each Attachment (file_path holds the blob key) and each row of the
+downloads table holds one reference. add_ref()/release() run inside the
+caller's transaction; gc() deletes blobs whose count has been zero for
+BLOB_GC_GRACE_MINUTES (the grace period keeps a blob that is being
+re-uploaded from being collected under it) and files no row knows about.
+recount() rebuilds the counts from the referencing tables.
+
+BLOBSTORE_BACKEND selects where bytes live:
+- "local" (default): files under BLOBSTORE_DIR
+- "s3": an S3-compatible bucket through boto3 (BLOBSTORE_BUCKET,
+  BLOBSTORE_PREFIX, BLOBSTORE_ENDPOINT_URL for MinIO/R2/...)
+- "s3-local": the S3 code path against LocalS3Client, a filesystem stand-in
+  for the boto3 client, for tests and development
+
+    python blobstore.py --gc [--recount]
+"""
+
+import hashlib
+import os
+import shutil
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import BinaryIO, Iterator, Optional
+
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+import logs
+import models
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BLOBSTORE_DIR = os.getenv("BLOBSTORE_DIR", os.path.join(BASE_DIR, "blobs"))
+GC_GRACE = timedelta(minutes=float(os.getenv("BLOB_GC_GRACE_MINUTES", "60")))
+
+logger = logs.get_logger("blobs")
+
+
+def blob_key(content_hash: str) -> str:
+    return f"{content_hash[:2]}/{content_hash[2:4]}/{content_hash}"
+
+
+def hash_of(key: str) -> str:
+    return key.rsplit("/", 1)[-1]
+
+
+class LocalBlobStore:
+    """Blobs as files under root/<key>."""
+
+    def __init__(self, root: str = BLOBSTORE_DIR):
+        self.root = root
+        self.temp_dir = os.path.join(self.root, "tmp")
+        os.makedirs(self.temp_dir, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split("/"))
+
+    def temp_path(self) -> str:
+        """A fresh path on the store's filesystem for spooling an incoming file."""
+        return os.path.join(self.temp_dir, f"{uuid.uuid4().hex}.part")
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def put_file(self, key: str, source_path: str, overwrite: bool = False):
+        """Move source_path into the store (it is consumed); an existing blob is kept unless overwrite."""
+        path = self._path(key)
+        if os.path.exists(path) and not overwrite:
+            os.remove(source_path)
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(source_path, path)
+
+    def put_bytes(self, key: str, data: bytes, overwrite: bool = False):
+        if not overwrite and self.exists(key):
+            return
+        tmp_path = self.temp_path()
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        self.put_file(key, tmp_path, overwrite=overwrite)
+
+    def open(self, key: str) -> BinaryIO:
+        return open(self._path(key), "rb")
+
+    def local_path(self, key: str) -> Optional[str]:
+        """Filesystem path for serving with FileResponse (Range support)."""
+        path = self._path(key)
+        return path if os.path.exists(path) else None
+
+    def presigned_url(self, key: str, filename: str, content_type: str, expires: int = 3600) -> Optional[str]:
+        return None
+
+    def delete(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def keys(self) -> Iterator[tuple]:
+        """(key, modification time) of every stored blob."""
+        for root, dirs, files in os.walk(self.root):
+            dirs[:] = [d for d in dirs if d != "tmp"]
+            for name in files:
+                path = os.path.join(root, name)
+                yield os.path.relpath(path, self.root).replace(os.sep, "/"), os.path.getmtime(path)
+
+
+class LocalS3Client:
+    """Filesystem stand-in for the subset of the boto3 S3 client that S3BlobStore uses."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, bucket: str, key: str) -> str:
+        return os.path.join(self.root, bucket, *key.split("/"))
+
+    def _missing(self, key: str):
+        error = FileNotFoundError(key)
+        error.response = {"Error": {"Code": "404"}}
+        return error
+
+    def head_object(self, Bucket: str, Key: str) -> dict:
+        path = self._path(Bucket, Key)
+        if not os.path.exists(path):
+            raise self._missing(Key)
+        return {"ContentLength": os.path.getsize(path)}
+
+    def upload_file(self, Filename: str, Bucket: str, Key: str, ExtraArgs: Optional[dict] = None):
+        path = self._path(Bucket, Key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.copyfile(Filename, path)
+
+    def get_object(self, Bucket: str, Key: str) -> dict:
+        path = self._path(Bucket, Key)
+        if not os.path.exists(path):
+            raise self._missing(Key)
+        return {"Body": open(path, "rb")}
+
+    def delete_object(self, Bucket: str, Key: str):
+        try:
+            os.remove(self._path(Bucket, Key))
+        except FileNotFoundError:
+            pass
+
+    def list_objects_v2(self, Bucket: str, Prefix: str = "", ContinuationToken: Optional[str] = None) -> dict:
+        bucket_root = os.path.join(self.root, Bucket)
+        contents = []
+        for root, _, files in os.walk(bucket_root):
+            for name in files:
+                path = os.path.join(root, name)
+                key = os.path.relpath(path, bucket_root).replace(os.sep, "/")
+                if key.startswith(Prefix):
+                    contents.append({"Key": key, "LastModified": datetime.fromtimestamp(os.path.getmtime(path))})
+        return {"Contents": contents, "IsTruncated": False}
+
+    def generate_presigned_url(self, operation: str, Params: dict, ExpiresIn: int) -> str:
+        return "file://" + self._path(Params["Bucket"], Params["Key"])
+
+
+class S3BlobStore:
+    """Blobs as objects <prefix><key> in an S3-compatible bucket."""
+
+    def __init__(self, client, bucket: str, prefix: str = "blobs/"):
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+        # Uploads are spooled locally before being sent to the bucket
+        self.temp_dir = os.path.join(BLOBSTORE_DIR, "tmp")
+        os.makedirs(self.temp_dir, exist_ok=True)
+
+    def temp_path(self) -> str:
+        return os.path.join(self.temp_dir, f"{uuid.uuid4().hex}.part")
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.prefix + key)
+            return True
+        except Exception as e:
+            if getattr(e, "response", {}).get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def put_file(self, key: str, source_path: str, overwrite: bool = False):
+        try:
+            if overwrite or not self.exists(key):
+                self.client.upload_file(Filename=source_path, Bucket=self.bucket, Key=self.prefix + key)
+        finally:
+            os.remove(source_path)
+
+    def put_bytes(self, key: str, data: bytes, overwrite: bool = False):
+        if not overwrite and self.exists(key):
+            return
+        tmp_path = self.temp_path()
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        self.put_file(key, tmp_path, overwrite=overwrite)
+
+    def open(self, key: str) -> BinaryIO:
+        return self.client.get_object(Bucket=self.bucket, Key=self.prefix + key)["Body"]
+
+    def local_path(self, key: str) -> Optional[str]:
+        return None
+
+    def presigned_url(self, key: str, filename: str, content_type: str, expires: int = 3600) -> Optional[str]:
+        from urllib.parse import quote
+        params = {
+            "Bucket": self.bucket,
+            "Key": self.prefix + key,
+            "ResponseContentType": content_type,
+            "ResponseContentDisposition": f"attachment; filename*=UTF-8''{quote(filename)}",
+        }
+        return self.client.generate_presigned_url("get_object", Params=params, ExpiresIn=expires)
+
+    def delete(self, key: str):
+        self.client.delete_object(Bucket=self.bucket, Key=self.prefix + key)
+
+    def keys(self) -> Iterator[tuple]:
+        token = None
+        while True:
+            kwargs = {"Bucket": self.bucket, "Prefix": self.prefix}
+            if token:
+                kwargs["ContinuationToken"] = token
+            page = self.client.list_objects_v2(**kwargs)
+            for item in page.get("Contents", []):
+                yield item["Key"][len(self.prefix):], item["LastModified"].timestamp()
+            if not page.get("IsTruncated"):
+                break
+            token = page.get("NextContinuationToken")
+
+
+def create_store(name: Optional[str] = None):
+    name = (name or os.getenv("BLOBSTORE_BACKEND", "local")).lower()
+    if name == "local":
+        return LocalBlobStore()
+    bucket = os.getenv("BLOBSTORE_BUCKET", "course-blobs")
+    prefix = os.getenv("BLOBSTORE_PREFIX", "blobs/")
+    if name == "s3":
+        import boto3  # optional dependency, only needed for this backend
+        client = boto3.client("s3", endpoint_url=os.getenv("BLOBSTORE_ENDPOINT_URL") or None)
+        return S3BlobStore(client, bucket, prefix)
+    if name == "s3-local":
+        return S3BlobStore(LocalS3Client(os.path.join(BLOBSTORE_DIR, "s3")), bucket, prefix)
+    raise ValueError(f"Unknown BLOBSTORE_BACKEND: {name}")
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = create_store()
+    return _store
+
+
+def set_store(store):
+    """Swap the backend (tests, tools)."""
+    global _store
+    _store = store
+
+
+# =============================================================================
+# Reference counting
+# =============================================================================
+
+def _add_ref(db: Session, content_hash: str, size: int, content_type: str) -> tuple:
+    """add_ref(), also returning whether the blob row was created by this call."""
+    now = datetime.utcnow()
+    result = db.execute(
+        update(models.Blob)
+        .where(models.Blob.content_hash == content_hash)
+        .values(refcount=models.Blob.refcount + 1, updated_at=now)
+    )
+    created = False
+    if result.rowcount == 0:
+        try:
+            with db.begin_nested():
+                db.add(models.Blob(
+                    content_hash=content_hash, size=size, content_type=content_type,
+                    refcount=1, created_at=now, updated_at=now,
+                ))
+            created = True
+        except IntegrityError:
+            # Inserted concurrently by another request
+            db.execute(
+                update(models.Blob)
+                .where(models.Blob.content_hash == content_hash)
+                .values(refcount=models.Blob.refcount + 1, updated_at=now)
+            )
+    return db.get(models.Blob, content_hash), created
+
+
+def add_ref(db: Session, content_hash: str, size: int, content_type: str) -> models.Blob:
+    """Take one reference on a blob, creating its row if needed; the caller commits."""
+    return _add_ref(db, content_hash, size, content_type)[0]
+
+
+def release(db: Session, content_hash: str):
+    """Drop one reference; the blob itself is removed later by gc(). The caller commits."""
+    if content_hash is None:
+        return
+    db.execute(
+        update(models.Blob)
+        .where(models.Blob.content_hash == content_hash, models.Blob.refcount > 0)
+        .values(refcount=models.Blob.refcount - 1, updated_at=datetime.utcnow())
+    )
+
+
+def put_bytes(db: Session, data: bytes, content_type: str) -> models.Blob:
+    """Store data and take a reference on it; the caller commits."""
+    content_hash = hashlib.sha256(data).hexdigest()
+    blob, created = _add_ref(db, content_hash, len(data), content_type)
+    # Written after the reference is taken, so a concurrent gc() cannot collect it.
+    # A new row means any file still there belongs to a collected blob that gc()
+    # may be about to delete, so it is rewritten rather than trusted.
+    get_store().put_bytes(blob_key(content_hash), data, overwrite=created)
+    return blob
+
+
+def put_file(db: Session, source_path: str, content_hash: str, size: int, content_type: str) -> models.Blob:
+    """Move an already hashed file (e.g. from temp_path()) into the store and take a reference."""
+    blob, created = _add_ref(db, content_hash, size, content_type)
+    get_store().put_file(blob_key(content_hash), source_path, overwrite=created)
+    return blob
+
+
+def temp_path() -> str:
+    return get_store().temp_path()
+
+
+def exists(content_hash: str) -> bool:
+    return get_store().exists(blob_key(content_hash))
+
+
+def recount(db: Session) -> int:
+    """Recompute every refcount from attachments and downloads; returns rows corrected."""
+    counts = {}
+    for (content_hash,) in db.query(models.Attachment.content_hash).filter(models.Attachment.content_hash.isnot(None)):
+        counts[content_hash] = counts.get(content_hash, 0) + 1
+    for (content_hash,) in db.query(models.Download.content_hash):
+        counts[content_hash] = counts.get(content_hash, 0) + 1
+    corrected = 0
+    for blob in db.query(models.Blob).all():
+        expected = counts.get(blob.content_hash, 0)
+        if blob.refcount != expected:
+            blob.refcount = expected
+            blob.updated_at = datetime.utcnow()
+            corrected += 1
+    db.commit()
+    return corrected
+
+
+def gc(db: Session, grace: Optional[timedelta] = None) -> int:
+    """Delete unreferenced blobs and stray files older than grace (GC_GRACE); returns blobs removed."""
+    grace = GC_GRACE if grace is None else grace
+    store = get_store()
+    cutoff = datetime.utcnow() - grace
+    stale_before = time.time() - grace.total_seconds()
+    candidates = [
+        content_hash for (content_hash,) in
+        db.query(models.Blob.content_hash).filter(models.Blob.refcount <= 0, models.Blob.updated_at < cutoff)
+    ]
+    removed = 0
+    for content_hash in candidates:
+        # Conditional delete: skipped if a reference was taken since the query above
+        result = db.execute(
+            models.Blob.__table__.delete().where(
+                models.Blob.content_hash == content_hash,
+                models.Blob.refcount <= 0,
+                models.Blob.updated_at < cutoff,
+            )
+        )
+        if not result.rowcount:
+            db.rollback()
+            continue
+        # The file goes before the row delete commits: until then a concurrent
+        # add_ref() waits on the row, then re-creates it and writes the file anew
+        store.delete(blob_key(content_hash))
+        db.commit()
+        removed += 1
+
+    # Spool files of uploads that never finished
+    for name in os.listdir(store.temp_dir):
+        path = os.path.join(store.temp_dir, name)
+        if os.path.getmtime(path) < stale_before:
+            os.remove(path)
+
+    # Blobs without a row: writes whose transaction rolled back, or rows removed by hand
+    known = {content_hash for (content_hash,) in db.query(models.Blob.content_hash)}
+    for key, modified in list(store.keys()):
+        if hash_of(key) not in known and modified < stale_before:
+            # Checked again: an upload may have taken a reference since `known` was read
+            if db.query(models.Blob.content_hash).filter(models.Blob.content_hash == hash_of(key)).first():
+                continue
+            store.delete(key)
+            removed += 1
+    if removed:
+        logger.info("blobs collected", extra={"removed": removed})
+    return removed
+
+
+def _import_file(old_path: str, content_hash: str):
+    temp = temp_path()
+    shutil.copyfile(old_path, temp)
+    get_store().put_file(blob_key(content_hash), temp)
+    os.remove(old_path)
+
+
+def import_legacy_files(db: Session, downloads_dir: str, attachments_dir: str) -> int:
+    """
+    Move files written by the previous per-feature stores (downloads/ab/<hash>,
+    attachments/ab/<hash>) into the blob store and point rows at blob keys.
+    """
+    moved = 0
+    for attachment in db.query(models.Attachment).filter(models.Attachment.content_hash.isnot(None)).all():
+        key = blob_key(attachment.content_hash)
+        if attachment.file_path == key:
+            continue
+        old_path = os.path.join(attachments_dir, *attachment.file_path.split("/"))
+        if os.path.exists(old_path):
+            _import_file(old_path, attachment.content_hash)
+            moved += 1
+        attachment.file_path = key
+    for download in db.query(models.Download).all():
+        old_path = os.path.join(downloads_dir, download.content_hash[:2], download.content_hash)
+        if os.path.exists(old_path):
+            _import_file(old_path, download.content_hash)
+            moved += 1
+    db.commit()
+
+    # Blob rows for everything referenced, then counts from the referencing tables
+    for content_hash, size, content_type in (
+        db.query(models.Attachment.content_hash, models.Attachment.file_size, models.Attachment.file_type)
+        .filter(models.Attachment.content_hash.isnot(None)).all()
+        + db.query(models.Download.content_hash, models.Download.size, models.Download.content_type).all()
+    ):
+        if db.get(models.Blob, content_hash) is None:
+            db.add(models.Blob(content_hash=content_hash, size=size, content_type=content_type, refcount=0))
+            db.flush()
+    db.commit()
+    recount(db)
+    if moved:
+        logger.info("legacy files imported", extra={"moved": moved})
+    return moved
+
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    session = SessionLocal()
+    try:
+        if "--recount" in sys.argv:
+            logger.info("reference counts recounted", extra={"corrected": recount(session)})
+        if "--gc" in sys.argv:
+            gc(session)
+    finally:
+        session.close()
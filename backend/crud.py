@@ -1,6 +1,22 @@
-from sqlalchemy.orm import Session
+from collections import defaultdict
+from sqlalchemy import func, insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm.exc import StaleDataError
 import models, schemas, security
-from datetime import datetime
+import blobstore
+import projection
+import revisions
+import search
+import stats
+import validation
+import workflow
+from datetime import datetime, timedelta
+import uuid
+import assignment
+
+class StaleVersionError(Exception):
+    """The application was modified since the version the client last saw."""
 
 def get_user(db: Session, user_id: str):
     return db.query(models.User).filter(models.User.id == user_id).first()
@@ -22,18 +38,114 @@ def create_user(db: Session, user: schemas.UserCreate):
     db.refresh(db_user)
     return db_user
 
-def get_applications(db: Session, skip: int = 0, limit: int = 100, user_id: str = None):
+def update_user_password_hash(db: Session, user: models.User, hashed_password: str):
+    user.hashed_password = hashed_password
+    db.commit()
+    db.refresh(user)
+    return user
+
+def create_refresh_token(db: Session, user_id: str):
+    """Store a new refresh token for the user and return the raw token."""
+    token = security.create_refresh_token()
+    db_token = models.RefreshToken(
+        user_id=user_id,
+        token_hash=security.hash_refresh_token(token),
+        expires_at=datetime.utcnow() + timedelta(days=security.REFRESH_TOKEN_EXPIRE_DAYS)
+    )
+    db.add(db_token)
+    db.commit()
+    return token
+
+def get_refresh_token(db: Session, token: str):
+    return (
+        db.query(models.RefreshToken)
+        .options(joinedload(models.RefreshToken.user))
+        .filter(models.RefreshToken.token_hash == security.hash_refresh_token(token))
+        .first()
+    )
+
+def rotate_refresh_token(db: Session, db_token: models.RefreshToken, token: str):
+    """
+    Revoke a refresh token and issue its successor in the same transaction.
+
+    The revoke is conditional on the token still being active, so of two
+    concurrent refreshes only one rotates; the other gets None back.
+    """
+    successor_token = security.successor_refresh_token(token)
+    successor_id = str(uuid.uuid4())
+    result = db.execute(
+        update(models.RefreshToken)
+        .where(models.RefreshToken.id == db_token.id, models.RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=datetime.utcnow(), replaced_by=successor_id)
+    )
+    if result.rowcount != 1:
+        db.rollback()
+        return None
+    db.add(models.RefreshToken(
+        id=successor_id,
+        user_id=db_token.user_id,
+        token_hash=security.hash_refresh_token(successor_token),
+        expires_at=datetime.utcnow() + timedelta(days=security.REFRESH_TOKEN_EXPIRE_DAYS)
+    ))
+    db.commit()
+    return successor_token
+
+def recently_rotated_successor(db: Session, db_token: models.RefreshToken, token: str):
+    """
+    The successor of a token rotated within the reuse grace window, if that
+    successor is still active; None means the reuse is suspicious.
+    """
+    if db_token.revoked_at is None or db_token.replaced_by is None:
+        return None
+    if datetime.utcnow() - db_token.revoked_at > timedelta(seconds=security.REFRESH_TOKEN_REUSE_GRACE_SECONDS):
+        return None
+    successor_token = security.successor_refresh_token(token)
+    successor = db.query(models.RefreshToken).filter(
+        models.RefreshToken.id == db_token.replaced_by,
+        models.RefreshToken.token_hash == security.hash_refresh_token(successor_token),
+        models.RefreshToken.revoked_at.is_(None),
+        models.RefreshToken.expires_at > datetime.utcnow()
+    ).first()
+    return successor_token if successor else None
+
+def revoke_refresh_token(db: Session, db_token: models.RefreshToken):
+    if db_token.revoked_at is None:
+        db_token.revoked_at = datetime.utcnow()
+        db.commit()
+
+def revoke_user_refresh_tokens(db: Session, user_id: str):
+    db.query(models.RefreshToken).filter(
+        models.RefreshToken.user_id == user_id,
+        models.RefreshToken.revoked_at.is_(None)
+    ).update({models.RefreshToken.revoked_at: datetime.utcnow()}, synchronize_session=False)
+    db.commit()
+
+def applications_query(db: Session, user_id: str = None, filters: dict = None):
     query = db.query(models.Application)
     if user_id:
         query = query.filter(models.Application.teacher_id == user_id)
-    return query.offset(skip).limit(limit).all()
+    # Filters map to indexed columns (status or projected form_data fields)
+    for column, value in (filters or {}).items():
+        if value is not None:
+            query = query.filter(getattr(models.Application, column) == value)
+    return query
+
+def get_applications(db: Session, skip: int = 0, limit: int = 100, user_id: str = None, filters: dict = None):
+    return applications_query(db, user_id=user_id, filters=filters).offset(skip).limit(limit).all()
 
 def create_application(db: Session, application: schemas.ApplicationCreate, user_id: str):
     db_application = models.Application(
         **application.dict(),
         teacher_id=user_id
     )
+    projection.apply(db_application)
+    validation.apply(db_application)
     db.add(db_application)
+    db.flush()
+    stats.track_application(db, None, db_application)
+    if db_application.form_data:
+        revisions.record_revision(db, db_application, None, author_id=user_id)
+    search.index_application(db, db_application)
     db.commit()
     db.refresh(db_application)
     return db_application
@@ -47,36 +159,312 @@ def create_review(db: Session, review: schemas.ReviewCreate):
         reviewer_id=review.reviewer_id,
         status=models.ReviewStatus.PENDING
     )
+    # Update application status to UNDER_REVIEW in the same transaction
+    application = db.query(models.Application).filter(models.Application.id == review.application_id).first()
+    if application:
+        workflow.transition(db, application, models.ApplicationStatus.UNDER_REVIEW)
     db.add(db_review)
+    stats.track_reviews_assigned(db, review.reviewer_id)
     db.commit()
     db.refresh(db_review)
-    
-    # Update application status to UNDER_REVIEW
-    application = db.query(models.Application).filter(models.Application.id == review.application_id).first()
-    if application:
-        application.status = models.ApplicationStatus.UNDER_REVIEW
-        db.commit()
         
     return db_review
 
+def bulk_assign_reviews(db: Session, request: schemas.BulkReviewAssign):
+    """Create many reviews and move their applications to UNDER_REVIEW in one transaction."""
+    explicit = request.assignments or []
+    application_ids = set(request.application_ids) | {a.application_id for a in explicit}
+    applications = {
+        row.id: row
+        for row in db.query(
+            models.Application.id, models.Application.status,
+            models.Application.main_department, models.User.department.label("teacher_department"),
+        )
+        .outerjoin(models.User, models.User.id == models.Application.teacher_id)
+        .filter(models.Application.id.in_(application_ids))
+        .all()
+    }
+    reviewer_query = db.query(models.User.id, models.User.department).filter(models.User.role == models.UserRole.REVIEWER)
+    if request.reviewer_ids is not None:
+        reviewer_query = reviewer_query.filter(models.User.id.in_(request.reviewer_ids))
+    reviewers = dict(reviewer_query.all())
+
+    assigned = defaultdict(set)
+    for application_id, reviewer_id in db.query(models.Review.application_id, models.Review.reviewer_id).filter(
+        models.Review.application_id.in_(applications.keys()),
+        models.Review.status == models.ReviewStatus.PENDING
+    ):
+        assigned[application_id].add(reviewer_id)
+
+    skipped = [
+        {"application_id": application_id, "reason": "Application not found"}
+        for application_id in sorted(application_ids - applications.keys())
+    ]
+    for application_id, row in list(applications.items()):
+        if row.status != models.ApplicationStatus.UNDER_REVIEW and not workflow.can_transition(row.status, models.ApplicationStatus.UNDER_REVIEW):
+            skipped.append({"application_id": application_id, "reason": f"Cannot assign reviewers in status {row.status.value}"})
+            del applications[application_id]
+    if explicit:
+        pairs = []
+        for item in explicit:
+            if item.application_id not in applications:
+                continue
+            if item.reviewer_id not in reviewers:
+                skipped.append({"application_id": item.application_id, "reviewer_id": item.reviewer_id, "reason": "Reviewer not found"})
+            elif item.reviewer_id in assigned[item.application_id]:
+                skipped.append({"application_id": item.application_id, "reviewer_id": item.reviewer_id, "reason": "Already assigned"})
+            else:
+                pairs.append((item.application_id, item.reviewer_id))
+                assigned[item.application_id].add(item.reviewer_id)
+    else:
+        pending_counts = dict(
+            db.query(models.Review.reviewer_id, func.count())
+            .filter(models.Review.status == models.ReviewStatus.PENDING, models.Review.reviewer_id.in_(reviewers.keys()))
+            .group_by(models.Review.reviewer_id)
+            .all()
+        )
+        candidates = [
+            assignment.AssignmentCandidate(
+                application_id,
+                {applications[application_id].main_department, applications[application_id].teacher_department},
+                assigned[application_id],
+            )
+            for application_id in request.application_ids if application_id in applications
+        ]
+        pairs, unstaffed = assignment.plan(
+            candidates, reviewers, request.strategy or assignment.ROUND_ROBIN,
+            reviewers_per_application=request.reviewers_per_application,
+            exclude_same_department=request.exclude_same_department,
+            pending_counts=pending_counts,
+        )
+        skipped.extend(unstaffed)
+
+    now = datetime.utcnow()
+    rows = [
+        {
+            "id": str(uuid.uuid4()),
+            "application_id": application_id,
+            "reviewer_id": reviewer_id,
+            "status": models.ReviewStatus.PENDING,
+            "assigned_at": now,
+        }
+        for application_id, reviewer_id in pairs
+    ]
+    if rows:
+        db.execute(insert(models.Review), rows)
+        per_reviewer = defaultdict(int)
+        for row in rows:
+            per_reviewer[row["reviewer_id"]] += 1
+        for reviewer_id, count in per_reviewer.items():
+            stats.track_reviews_assigned(db, reviewer_id, count)
+
+    to_review = [
+        applications[application_id] for application_id in {row["application_id"] for row in rows}
+        if applications[application_id].status != models.ApplicationStatus.UNDER_REVIEW
+    ]
+    if to_review:
+        db.execute(
+            update(models.Application)
+            .where(models.Application.id.in_([a.id for a in to_review]))
+            .values(status=models.ApplicationStatus.UNDER_REVIEW, version=models.Application.version + 1)
+        )
+        by_status = defaultdict(int)
+        for application in to_review:
+            by_status[application.status] += 1
+            workflow.queue_event(db, application.id, application.status, models.ApplicationStatus.UNDER_REVIEW)
+        for old_status, count in by_status.items():
+            stats.track_status_change(db, old_status, models.ApplicationStatus.UNDER_REVIEW, count)
+
+    db.commit()
+    return {
+        "created": [
+            {"review_id": row["id"], "application_id": row["application_id"], "reviewer_id": row["reviewer_id"]}
+            for row in rows
+        ],
+        "skipped": skipped,
+    }
+
 def get_reviews_by_reviewer(db: Session, reviewer_id: str):
     return db.query(models.Review).filter(models.Review.reviewer_id == reviewer_id).all()
 
+def get_review(db: Session, review_id: str):
+    return db.query(models.Review).filter(models.Review.id == review_id).first()
+
+def change_application_status(db: Session, application: models.Application, new_status: models.ApplicationStatus, actor_id: str = None):
+    """Apply a workflow transition and commit; raises workflow.InvalidTransition."""
+    workflow.transition(db, application, new_status, actor_id=actor_id)
+    db.commit()
+    db.refresh(application)
+    return application
+
+def get_review_inbox(db: Session, reviewer_id: str, status: models.ReviewStatus = None, skip: int = 0, limit: int = 50):
+    """A reviewer's reviews joined with application summaries, plus the total, in one query."""
+    Review, Application = models.Review, models.Application
+    query = (
+        db.query(
+            Review.id, Review.application_id, Review.reviewer_id, Review.status,
+            Review.result, Review.comments, Review.assigned_at, Review.submitted_at,
+            Application.course_name_zh, Application.course_name_en, Application.status.label("application_status"),
+            Application.main_department, Application.academic_year, Application.semester,
+            Application.completeness, Application.updated_at, models.User.name.label("teacher_name"),
+            func.count().over().label("total"),
+        )
+        .join(Application, Application.id == Review.application_id)
+        .outerjoin(models.User, models.User.id == Application.teacher_id)
+        .filter(Review.reviewer_id == reviewer_id)
+    )
+    if status is not None:
+        query = query.filter(Review.status == status)
+    rows = (
+        # PENDING sorts after COMPLETED, so descending puts open reviews first
+        query.order_by(Review.status.desc(), Review.assigned_at.desc())
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
+    items = [
+        {
+            "id": row.id,
+            "application_id": row.application_id,
+            "reviewer_id": row.reviewer_id,
+            "status": row.status,
+            "result": row.result,
+            "comments": row.comments,
+            "assigned_at": row.assigned_at,
+            "submitted_at": row.submitted_at,
+            "application": {
+                "id": row.application_id,
+                "course_name_zh": row.course_name_zh,
+                "course_name_en": row.course_name_en,
+                "status": row.application_status,
+                "teacher_name": row.teacher_name,
+                "main_department": row.main_department,
+                "academic_year": row.academic_year,
+                "semester": row.semester,
+                "completeness": row.completeness,
+                "updated_at": row.updated_at,
+            },
+        }
+        for row in rows
+    ]
+    total = rows[0].total if rows else (0 if skip == 0 else query.count())
+    return {"items": items, "total": total, "skip": skip, "limit": limit}
+
+def get_drive_upload(db: Session, upload_id: str):
+    return db.query(models.DriveUpload).filter(models.DriveUpload.id == upload_id).first()
+
 def get_application(db: Session, application_id: str):
     return db.query(models.Application).filter(models.Application.id == application_id).first()
 
-def update_review(db: Session, review_id: str, review_update: schemas.ReviewBase):
+def get_attachments(db: Session, application_id: str):
+    return (
+        db.query(models.Attachment)
+        .filter(models.Attachment.application_id == application_id)
+        .order_by(models.Attachment.uploaded_at)
+        .all()
+    )
+
+def get_attachment(db: Session, application_id: str, attachment_id: str):
+    return db.query(models.Attachment).filter(
+        models.Attachment.id == attachment_id,
+        models.Attachment.application_id == application_id,
+    ).first()
+
+def create_attachment(db: Session, application_id: str, incoming):
+    """
+    Record a received attachments_store.IncomingFile, moving it into the blob store.
+
+    Re-uploading identical content to the same application returns the
+    existing row, also when two identical uploads race (the unique index on
+    application_id and content_hash decides). Returns (attachment, created).
+    """
+    def existing_attachment():
+        return db.query(models.Attachment).filter(
+            models.Attachment.application_id == application_id,
+            models.Attachment.content_hash == incoming.content_hash,
+        ).first()
+
+    existing = existing_attachment()
+    if existing is not None:
+        incoming.discard()
+        return existing, False
+    blobstore.put_file(db, incoming.path, incoming.content_hash, incoming.size, incoming.content_type)
+    attachment = models.Attachment(
+        application_id=application_id,
+        file_name=incoming.filename,
+        file_path=blobstore.blob_key(incoming.content_hash),
+        file_type=incoming.content_type,
+        file_size=incoming.size,
+        content_hash=incoming.content_hash,
+    )
+    db.add(attachment)
+    try:
+        db.commit()
+    except IntegrityError:
+        # An identical upload committed first; its row also holds the blob reference
+        db.rollback()
+        existing = existing_attachment()
+        if existing is None:
+            raise
+        return existing, False
+    db.refresh(attachment)
+    return attachment, True
+
+def delete_attachment(db: Session, attachment: models.Attachment):
+    """Delete the row and release its blob (collected by blobstore.gc once unreferenced)."""
+    blobstore.release(db, attachment.content_hash)
+    db.delete(attachment)
+    db.commit()
+
+def update_review(db: Session, review_id: str, review_update: schemas.ReviewBase, actor_id: str = None):
     db_review = db.query(models.Review).filter(models.Review.id == review_id).first()
     if db_review:
+        first_completion = db_review.status != models.ReviewStatus.COMPLETED
         db_review.result = review_update.result
         db_review.comments = review_update.comments
         db_review.status = models.ReviewStatus.COMPLETED
         db_review.submitted_at = datetime.utcnow()
+        if first_completion:
+            stats.track_review_completed(db, db_review)
+        db.flush()
+        
+        # Derive the application's status from all reviews of the round, same transaction
+        workflow.recompute_status(db, db_review.application, actor_id=actor_id)
         db.commit()
         db.refresh(db_review)
         
-        # Check if all reviews are completed to update application status
-        # For now, simple logic: if this review is completed, maybe update app status?
-        # Let's keep it simple: just update review for now.
-        
     return db_review
+
+def _sync_form_fields(application: models.Application):
+    """Copy fields that are also stored as columns out of form_data."""
+    form_data = application.form_data or {}
+    if "course_name_zh" in form_data:
+        application.course_name_zh = form_data["course_name_zh"]
+    projection.apply(application)
+
+def update_application_form_data(
+    db: Session,
+    application: models.Application,
+    form_data: dict,
+    expected_version: int = None,
+    author_id: str = None
+):
+    """Replace form_data, rejecting the write if expected_version is stale."""
+    if expected_version is not None and expected_version != application.version:
+        raise StaleVersionError()
+    previous_form_data = application.form_data
+    before = stats.application_dims(application)
+    application.form_data = form_data
+    _sync_form_fields(application)
+    validation.apply(application, previous_form_data)
+    stats.track_application(db, before, application)
+    revisions.record_revision(db, application, previous_form_data, author_id=author_id)
+    search.index_application(db, application)
+    try:
+        db.commit()
+    except StaleDataError:
+        # A concurrent writer bumped the version between our read and write
+        db.rollback()
+        raise StaleVersionError()
+    db.refresh(application)
+    return application
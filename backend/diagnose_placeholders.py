@@ -1,31 +1,21 @@
 """
 Diagnostic script to compare template placeholders with generated file.
-"""
-from docx import Document
-import re
 
-# Get template placeholders
-template = Document(r'resources/template.docx')
-template_phs = set()
+Usage: python diagnose_placeholders.py generated.docx
+"""
+import sys
 
-def find_placeholders(element, container):
-    if hasattr(element, 'paragraphs'):
-        for para in element.paragraphs:
-            matches = re.findall(r'\{\{([^}]+)\}\}', para.text)
-            container.update(m.strip() for m in matches)
-    if hasattr(element, 'tables'):
-        for table in element.tables:
-            for row in table.rows:
-                for cell in row.cells:
-                    find_placeholders(cell, container)
+import placeholder_scanner
 
-find_placeholders(template, template_phs)
+if len(sys.argv) < 2:
+    print(__doc__)
+    sys.exit(1)
 
-# Get unreplaced from generated file  
-generated = Document(r'c:\Users\user\Desktop\ewant\映竹專案\新興科技創新與智慧財產權管理_c749b5b6_教學計畫表.docx')
-unreplaced = set()
+# Get template placeholders
+template_phs = set(placeholder_scanner.keys(r'resources/template.docx'))
 
-find_placeholders(generated, unreplaced)
+# Get unreplaced from generated file
+unreplaced = placeholder_scanner.counts(sys.argv[1])
 
 print(f'Template placeholders: {len(template_phs)}')
 print(f'Unreplaced in generated: {len(unreplaced)}')
@@ -33,4 +23,4 @@ print()
 print('Unreplaced placeholder keys:')
 for i, u in enumerate(sorted(unreplaced), 1):
     in_template = "YES" if u in template_phs else "NO"
-    print(f'{i}. [Template: {in_template}] {u[:100]}')
+    print(f'{i}. [Template: {in_template}] x{unreplaced[u]} {u[:100]}')
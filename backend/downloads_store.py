@@ -0,0 +1,171 @@
+"""
+Managed Downloads Store
+
+Generated documents are stored once per content hash in the blob store
+(see blobstore.py), tracked in the downloads table and served through
+signed, expiring URLs instead of a public static mount. Each downloads row
+holds one reference on its blob.
+
+Disk use is bounded two ways: put() evicts least-recently-used documents
+while they add up to more than DOWNLOADS_MAX_MB, and a background sweeper
+drops documents not downloaded for DOWNLOAD_TTL_HOURS, then runs the blob
+store's garbage collection, which frees blobs nothing references any more.
+
+URL expiry is rounded up to a DOWNLOAD_URL_TTL_MINUTES bucket, so the same
+document gets the same URL for a while and browsers and proxies can reuse
+their cached copy (responses are marked immutable).
+"""
+
+import base64
+import hashlib
+import hmac
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+from urllib.parse import quote
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+import blobstore
+import models
+import security
+
+MAX_BYTES = int(float(os.getenv("DOWNLOADS_MAX_MB", "500")) * 1024 * 1024)
+TTL = timedelta(hours=float(os.getenv("DOWNLOAD_TTL_HOURS", "24")))
+URL_TTL_SECONDS = int(os.getenv("DOWNLOAD_URL_TTL_MINUTES", "60")) * 60
+SWEEP_INTERVAL_SECONDS = int(os.getenv("DOWNLOAD_SWEEP_INTERVAL_SECONDS", "600"))
+# Avoid a write per request for hot files
+TOUCH_INTERVAL = timedelta(minutes=1)
+
+DOCX_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+
+def put(db: Session, data: bytes, content_type: str = DOCX_TYPE) -> models.Download:
+    """Store data (once per content hash) and mark it as recently used."""
+    content_hash = hashlib.sha256(data).hexdigest()
+    download = db.get(models.Download, content_hash)
+    if download is None:
+        blobstore.put_bytes(db, data, content_type)
+        download = models.Download(content_hash=content_hash, size=len(data), content_type=content_type)
+        db.add(download)
+        try:
+            db.commit()
+        except IntegrityError:
+            # Stored concurrently by another request (which holds the reference)
+            db.rollback()
+            download = db.get(models.Download, content_hash)
+        print(f"[DOWNLOADS] Stored {content_hash[:12]} ({len(data)} bytes)")
+    else:
+        if not blobstore.exists(content_hash):
+            blobstore.get_store().put_bytes(blobstore.blob_key(content_hash), data)
+        download.last_accessed_at = datetime.utcnow()
+        db.commit()
+        print(f"[DOWNLOADS] Reused {content_hash[:12]}")
+    enforce_size_limit(db, keep=content_hash)
+    return download
+
+
+def get(db: Session, content_hash: str) -> Optional[models.Download]:
+    """Look up a stored file, refreshing its LRU position; None if missing or evicted."""
+    download = db.get(models.Download, content_hash)
+    if download is None or not blobstore.exists(content_hash):
+        return None
+    now = datetime.utcnow()
+    if download.last_accessed_at is None or now - download.last_accessed_at > TOUCH_INTERVAL:
+        download.last_accessed_at = now
+        db.commit()
+    return download
+
+
+def _evict(db: Session, download: models.Download):
+    blobstore.release(db, download.content_hash)
+    db.delete(download)
+
+
+def enforce_size_limit(db: Session, keep: Optional[str] = None) -> int:
+    """Evict least recently used files until the store fits MAX_BYTES; returns files evicted."""
+    total = db.query(func.coalesce(func.sum(models.Download.size), 0)).scalar()
+    if total <= MAX_BYTES:
+        return 0
+    evicted = 0
+    for download in db.query(models.Download).order_by(models.Download.last_accessed_at).all():
+        if total <= MAX_BYTES:
+            break
+        if download.content_hash == keep:
+            continue
+        total -= download.size or 0
+        _evict(db, download)
+        evicted += 1
+    db.commit()
+    print(f"[DOWNLOADS] Evicted {evicted} files over the {MAX_BYTES} byte cap")
+    return evicted
+
+
+def sweep(db: Session) -> int:
+    """Remove expired entries, then collect unreferenced blobs; returns downloads removed."""
+    cutoff = datetime.utcnow() - TTL
+    expired = db.query(models.Download).filter(models.Download.last_accessed_at < cutoff).all()
+    for download in expired:
+        _evict(db, download)
+    db.commit()
+    removed = len(expired) + enforce_size_limit(db)
+    if removed:
+        print(f"[DOWNLOADS] Swept {removed} files")
+    blobstore.gc(db)
+    return removed
+
+
+def _signature(content_hash: str, expires: int, filename: str) -> str:
+    message = f"{content_hash}:{expires}:{filename}".encode("utf-8")
+    digest = hmac.new(security.SECRET_KEY.encode(), message, hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest[:18]).decode()
+
+
+def signed_url(content_hash: str, filename: str) -> str:
+    """Relative URL valid for at least URL_TTL_SECONDS; stable within one expiry bucket."""
+    expires = (int(time.time()) // URL_TTL_SECONDS + 2) * URL_TTL_SECONDS
+    query = f"name={quote(filename, safe='')}&exp={expires}&sig={_signature(content_hash, expires, filename)}"
+    return f"/api/downloads/{content_hash}?{query}"
+
+
+def verify(content_hash: str, filename: str, expires: int, signature: str) -> bool:
+    if expires < time.time():
+        return False
+    return hmac.compare_digest(_signature(content_hash, expires, filename), signature)
+
+
+class Sweeper:
+    """Background thread running sweep() at start-up and every SWEEP_INTERVAL_SECONDS."""
+
+    def __init__(self, session_factory, interval: int = SWEEP_INTERVAL_SECONDS):
+        self.session_factory = session_factory
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="downloads-sweeper", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self):
+        while True:
+            db = self.session_factory()
+            try:
+                sweep(db)
+            except Exception as e:
+                print(f"[DOWNLOADS] Sweep failed: {type(e).__name__}: {e}")
+            finally:
+                db.close()
+            if self._stop.wait(self.interval):
+                break
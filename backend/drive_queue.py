@@ -0,0 +1,267 @@
+"""
+Background Google Drive Upload Queue
+
+enqueue() spools a document to DRIVE_SPOOL_DIR, records a drive_uploads row
+and returns immediately; worker threads upload it later so requests never
+wait on Drive. Each worker holds one backend (and so one cached Drive
+service client), uploads in resumable chunks and saves the session URI and
+progress after every chunk, so a retry or a restart continues where the
+upload stopped. Failures back off exponentially up to DRIVE_MAX_ATTEMPTS.
+
+Claiming a job leases it: next_attempt_at moves DRIVE_LEASE_SECONDS ahead
+and is renewed after every chunk. A job whose lease ran out (its worker or
+process died) becomes due again and is picked up by any worker, resuming
+its resumable session.
+Link-sharing permissions for everything a worker uploaded in one pass are
+set with a single batched request.
+
+DRIVE_BACKEND selects the backend: "google" (default when the service account
+file exists), "fake" for the filesystem stand-in, or "none" to disable.
+"""
+
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional
+
+from sqlalchemy.orm import Session
+
+import drive_upload
+import models
+
+SPOOL_DIR = os.getenv("DRIVE_SPOOL_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "drive_spool"))
+WORKERS = int(os.getenv("DRIVE_UPLOAD_WORKERS", "1"))
+MAX_ATTEMPTS = int(os.getenv("DRIVE_MAX_ATTEMPTS", "8"))
+BACKOFF_BASE_SECONDS = float(os.getenv("DRIVE_BACKOFF_BASE_SECONDS", "5"))
+BACKOFF_MAX_SECONDS = float(os.getenv("DRIVE_BACKOFF_MAX_SECONDS", "900"))
+POLL_INTERVAL_SECONDS = float(os.getenv("DRIVE_POLL_INTERVAL_SECONDS", "30"))
+LEASE_SECONDS = float(os.getenv("DRIVE_LEASE_SECONDS", "600"))
+BATCH_SIZE = 20
+
+DOCX_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+Status = models.DriveUploadStatus
+
+
+def backend_name() -> str:
+    name = os.getenv("DRIVE_BACKEND")
+    if name:
+        return name.lower()
+    return "google" if os.path.exists(drive_upload.SERVICE_ACCOUNT_FILE) else "none"
+
+
+def create_backend(name: Optional[str] = None):
+    name = name or backend_name()
+    if name == "google":
+        return drive_upload.GoogleDriveBackend()
+    if name == "fake":
+        return drive_upload.FakeDrive()
+    raise ValueError(f"Unknown DRIVE_BACKEND: {name}")
+
+
+def spool_path(upload_id: str) -> str:
+    return os.path.join(SPOOL_DIR, upload_id)
+
+
+def backoff(attempts: int) -> timedelta:
+    return timedelta(seconds=min(BACKOFF_BASE_SECONDS * 2 ** max(attempts - 1, 0), BACKOFF_MAX_SECONDS))
+
+
+def _session_expired(error: Exception) -> bool:
+    # Drive answers 404/410 once a resumable session is gone; the upload must start over
+    status = getattr(getattr(error, "resp", None), "status", None)
+    return status in (404, 410)
+
+
+def enqueue(db: Session, application_id: str, data: bytes, filename: str, mimetype: str = DOCX_TYPE) -> models.DriveUpload:
+    """Persist an upload job; the caller's request returns without touching Drive."""
+    upload = models.DriveUpload(application_id=application_id, filename=filename, mimetype=mimetype, size=len(data))
+    db.add(upload)
+    db.flush()
+    os.makedirs(SPOOL_DIR, exist_ok=True)
+    with open(spool_path(upload.id), "wb") as f:
+        f.write(data)
+    db.commit()
+    db.refresh(upload)
+    queue.notify()
+    return upload
+
+
+def pending_count(db: Session) -> int:
+    return (
+        db.query(models.DriveUpload)
+        .filter(models.DriveUpload.status.in_([Status.PENDING, Status.UPLOADING, Status.UPLOADED]))
+        .count()
+    )
+
+
+def _lease() -> datetime:
+    return datetime.utcnow() + timedelta(seconds=LEASE_SECONDS)
+
+
+def _claim(db: Session, limit: int) -> List[models.DriveUpload]:
+    """
+    Atomically lease up to limit due jobs for this worker: PENDING and UPLOADED
+    jobs whose retry time has come, and UPLOADING jobs whose lease expired.
+    """
+    now = datetime.utcnow()
+    claimable = [Status.PENDING, Status.UPLOADING, Status.UPLOADED]
+    candidates = (
+        db.query(models.DriveUpload.id, models.DriveUpload.status)
+        .filter(models.DriveUpload.status.in_(claimable), models.DriveUpload.next_attempt_at <= now)
+        .order_by(models.DriveUpload.next_attempt_at)
+        .limit(limit)
+        .all()
+    )
+    claimed = []
+    for upload_id, status in candidates:
+        # Still due and in the same status, so no other worker leased it meanwhile
+        new_status = Status.UPLOADED if status == Status.UPLOADED else Status.UPLOADING
+        won = (
+            db.query(models.DriveUpload)
+            .filter(
+                models.DriveUpload.id == upload_id,
+                models.DriveUpload.status == status,
+                models.DriveUpload.next_attempt_at <= now,
+            )
+            .update(
+                {models.DriveUpload.status: new_status, models.DriveUpload.next_attempt_at: _lease()},
+                synchronize_session=False,
+            )
+        )
+        if won:
+            claimed.append(upload_id)
+    db.commit()
+    return db.query(models.DriveUpload).filter(models.DriveUpload.id.in_(claimed)).all() if claimed else []
+
+
+def _fail(db: Session, upload: models.DriveUpload, error: Exception, retry_status: models.DriveUploadStatus):
+    upload.attempts = (upload.attempts or 0) + 1
+    upload.last_error = f"{type(error).__name__}: {error}"
+    if upload.attempts >= MAX_ATTEMPTS:
+        upload.status = Status.FAILED
+        print(f"[DRIVE] Upload {upload.id} failed permanently: {upload.last_error}")
+    else:
+        upload.status = retry_status
+        upload.next_attempt_at = datetime.utcnow() + backoff(upload.attempts)
+        print(f"[DRIVE] Upload {upload.id} attempt {upload.attempts} failed, retrying: {upload.last_error}")
+    db.commit()
+
+
+def _upload(db: Session, backend, upload: models.DriveUpload) -> bool:
+    """Send the remaining chunks of one job; returns True once the file is on Drive."""
+    session = backend.open_upload(
+        spool_path(upload.id), upload.filename, upload.mimetype,
+        resumable_uri=upload.resumable_uri, progress=upload.bytes_sent or 0,
+    )
+    try:
+        while True:
+            resource = session.next_chunk()
+            upload.resumable_uri = session.resumable_uri
+            upload.bytes_sent = upload.size if resource else session.progress
+            if resource:
+                break
+            upload.next_attempt_at = _lease()
+            db.commit()
+    except Exception as e:
+        if _session_expired(e):
+            upload.resumable_uri = None
+            upload.bytes_sent = 0
+        _fail(db, upload, e, Status.PENDING)
+        return False
+
+    upload.drive_file_id = resource.get("id")
+    upload.web_view_link = resource.get("webViewLink")
+    upload.web_content_link = resource.get("webContentLink")
+    upload.status = Status.UPLOADED
+    upload.resumable_uri = None
+    db.commit()
+    return True
+
+
+def _share(db: Session, backend, uploads: List[models.DriveUpload]):
+    try:
+        errors = backend.share([u.drive_file_id for u in uploads])
+    except Exception as e:
+        for upload in uploads:
+            _fail(db, upload, e, Status.UPLOADED)
+        return
+    for upload in uploads:
+        error = errors.get(upload.drive_file_id)
+        if error is not None:
+            _fail(db, upload, error, Status.UPLOADED)
+            continue
+        upload.status = Status.DONE
+        upload.completed_at = datetime.utcnow()
+        upload.last_error = None
+        try:
+            os.remove(spool_path(upload.id))
+        except FileNotFoundError:
+            pass
+        print(f"[DRIVE] Upload complete: {upload.filename} -> {upload.web_view_link}")
+    db.commit()
+
+
+def process_batch(db: Session, backend, limit: int = BATCH_SIZE) -> int:
+    """Run one pass: upload due jobs, then share them in one batch; returns jobs handled."""
+    uploads = _claim(db, limit)
+    to_share = []
+    for upload in uploads:
+        if upload.status == Status.UPLOADED or _upload(db, backend, upload):
+            to_share.append(upload)
+    if to_share:
+        _share(db, backend, to_share)
+    return len(uploads)
+
+
+class DriveUploadQueue:
+    def __init__(self, session_factory=None, backend_factory: Optional[Callable] = None, workers: int = WORKERS):
+        self.session_factory = session_factory
+        self.backend_factory = backend_factory or create_backend
+        self.workers = workers
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    @property
+    def running(self) -> bool:
+        return bool(self._threads)
+
+    def notify(self):
+        self._wake.set()
+
+    def start(self, session_factory=None):
+        if self._threads:
+            return
+        self.session_factory = session_factory or self.session_factory
+        self._stop.clear()
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"drive-upload-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        print(f"[DRIVE] Upload queue started with {self.workers} worker(s)")
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout=10)
+        self._threads = []
+
+    def _run(self):
+        # One backend, and so one Drive service client, per worker thread
+        backend = self.backend_factory()
+        while not self._stop.is_set():
+            self._wake.clear()
+            db = self.session_factory()
+            try:
+                handled = process_batch(db, backend)
+            except Exception as e:
+                handled = 0
+                print(f"[DRIVE] Worker error: {type(e).__name__}: {e}")
+            finally:
+                db.close()
+            if not handled:
+                self._wake.wait(POLL_INTERVAL_SECONDS)
+
+
+queue = DriveUploadQueue()
@@ -1,12 +1,19 @@
 """
 Google Drive Upload Service
 Uploads generated Word documents to a shared Google Drive folder.
+
+GoogleDriveBackend and FakeDrive share the small interface the background
+upload queue (drive_queue.py) uses: open_upload() returns a resumable
+session that sends one chunk per next_chunk() call, and share() grants
+link access to many files in one batched request. FakeDrive keeps files
+on the local filesystem for tests and development (DRIVE_BACKEND=fake).
 """
 import os
 import io
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseUpload
+import json
+import threading
+import uuid
+from typing import Dict, List, Optional
 
 # Configuration
 SCOPES = ['https://www.googleapis.com/auth/drive']
@@ -16,9 +23,22 @@ SERVICE_ACCOUNT_FILE = os.path.join(os.path.dirname(__file__), 'google_service_a
 # URL: https://drive.google.com/drive/folders/1vTwM-_EH-nwLuvnLAQr5ilW4MrmPkAQa
 FOLDER_ID = '1vTwM-_EH-nwLuvnLAQr5ilW4MrmPkAQa'
 
+# Resumable uploads send the file in chunks of this size (must be a multiple of 256 KiB)
+CHUNK_SIZE = int(os.getenv("DRIVE_CHUNK_SIZE", str(1024 * 1024)))
+FILE_FIELDS = 'id, name, webViewLink, webContentLink'
+# In-process retries of one chunk on transient errors, before the queue's own backoff
+CHUNK_RETRIES = int(os.getenv("DRIVE_CHUNK_RETRIES", "2"))
 
-def get_drive_service():
-    """Create and return a Google Drive service instance."""
+_service = None
+_service_lock = threading.Lock()
+
+
+def build_drive_service():
+    """Create a new Google Drive service instance (loads credentials and the discovery document)."""
+    # Imported here: the Google client libraries are slow to import and only workers need them
+    from google.oauth2 import service_account
+    from googleapiclient.discovery import build
+    
     if not os.path.exists(SERVICE_ACCOUNT_FILE):
         raise FileNotFoundError(
             f"Service account file not found: {SERVICE_ACCOUNT_FILE}\n"
@@ -28,7 +48,16 @@ def get_drive_service():
     credentials = service_account.Credentials.from_service_account_file(
         SERVICE_ACCOUNT_FILE, scopes=SCOPES
     )
-    return build('drive', 'v3', credentials=credentials)
+    return build('drive', 'v3', credentials=credentials, cache_discovery=False)
+
+
+def get_drive_service():
+    """Return the process-wide Drive service, building it on first use."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = build_drive_service()
+        return _service
 
 
 def upload_to_drive(file_bytes: bytes, filename: str, folder_id: str = FOLDER_ID) -> dict:
@@ -52,6 +81,7 @@ def upload_to_drive(file_bytes: bytes, filename: str, folder_id: str = FOLDER_ID
     }
     
     # Create media upload
+    from googleapiclient.http import MediaIoBaseUpload
     media = MediaIoBaseUpload(
         io.BytesIO(file_bytes),
         mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document',
@@ -86,6 +116,184 @@ def upload_to_drive(file_bytes: bytes, filename: str, folder_id: str = FOLDER_ID
     }
 
 
+class _GoogleUploadSession:
+    def __init__(self, request):
+        self.request = request
+
+    @property
+    def resumable_uri(self) -> Optional[str]:
+        return self.request.resumable_uri
+
+    @property
+    def progress(self) -> int:
+        return self.request.resumable_progress
+
+    def next_chunk(self) -> Optional[dict]:
+        """Send one chunk; returns the file resource once the upload is complete."""
+        # The client library retries transient errors itself, re-syncing the session offset
+        _, response = self.request.next_chunk(num_retries=CHUNK_RETRIES)
+        return response
+
+
+class _CompletedUploadSession:
+    """A resumed session whose upload had already finished on Drive."""
+
+    def __init__(self, resumable_uri: str, progress: int, resource: dict):
+        self.resumable_uri = resumable_uri
+        self.progress = progress
+        self.resource = resource
+
+    def next_chunk(self) -> Optional[dict]:
+        return self.resource
+
+
+class GoogleDriveBackend:
+    """Drive API backend. Not thread-safe: give each worker thread its own instance."""
+
+    def __init__(self, folder_id: str = FOLDER_ID):
+        self.folder_id = folder_id
+        self._service = None
+
+    @property
+    def service(self):
+        if self._service is None:
+            self._service = build_drive_service()
+        return self._service
+
+    def open_upload(self, path: str, filename: str, mimetype: str, resumable_uri: Optional[str] = None, progress: int = 0):
+        from googleapiclient.http import MediaFileUpload
+        media = MediaFileUpload(path, mimetype=mimetype, chunksize=CHUNK_SIZE, resumable=True)
+        request = self.service.files().create(
+            body={'name': filename, 'parents': [self.folder_id]},
+            media_body=media,
+            fields=FILE_FIELDS
+        )
+        if resumable_uri:
+            request.resumable_uri = resumable_uri
+            # Ask the server how much it already has rather than trusting progress
+            received, resource = self._query_upload(request.http, resumable_uri, media.size())
+            request.resumable_progress = received
+            if resource is not None:
+                return _CompletedUploadSession(resumable_uri, received, resource)
+        return _GoogleUploadSession(request)
+
+    @staticmethod
+    def _query_upload(http, resumable_uri: str, size: int):
+        """
+        Status of a resumable session (an empty PUT with "Content-Range: bytes */size").
+        Returns (bytes received, file resource if the upload already completed);
+        raises HttpError when the session is gone (404/410).
+        """
+        from googleapiclient.errors import HttpError
+        resp, content = http.request(
+            resumable_uri, method="PUT", headers={"Content-Length": "0", "Content-Range": f"bytes */{size}"}
+        )
+        if resp.status in (200, 201):
+            return size, json.loads(content)
+        if resp.status == 308:
+            # "Range: bytes=0-N" lists what arrived; no header means nothing yet
+            received = resp.get("range")
+            return (int(received.rsplit("-", 1)[1]) + 1 if received else 0), None
+        raise HttpError(resp, content, uri=resumable_uri)
+
+    def share(self, file_ids: List[str]) -> Dict[str, Optional[Exception]]:
+        """Make files readable by anyone with the link in one batch request; returns errors by file id."""
+        errors: Dict[str, Optional[Exception]] = {}
+
+        def callback(request_id, response, exception):
+            errors[request_id] = exception
+
+        batch = self.service.new_batch_http_request(callback=callback)
+        for file_id in file_ids:
+            batch.add(
+                self.service.permissions().create(fileId=file_id, body={'type': 'anyone', 'role': 'reader'}),
+                request_id=file_id
+            )
+        batch.execute()
+        return errors
+
+
+class _FakeUploadSession:
+    def __init__(self, drive: "FakeDrive", path: str, filename: str, mimetype: str, resumable_uri: Optional[str]):
+        self.drive = drive
+        self.path = path
+        self.filename = filename
+        self.mimetype = mimetype
+        self.resumable_uri = resumable_uri or f"fake://{uuid.uuid4().hex}"
+        self.size = os.path.getsize(path)
+
+    @property
+    def _part_path(self) -> str:
+        return os.path.join(self.drive.root, self.resumable_uri[len("fake://"):] + ".part")
+
+    @property
+    def progress(self) -> int:
+        # Like Drive, the server side decides how much has been received
+        return os.path.getsize(self._part_path) if os.path.exists(self._part_path) else 0
+
+    def next_chunk(self) -> Optional[dict]:
+        self.drive.chunk_calls += 1
+        if self.drive.fail_chunks > 0:
+            self.drive.fail_chunks -= 1
+            raise ConnectionError("Simulated network failure")
+        offset = self.progress
+        with open(self.path, 'rb') as source, open(self._part_path, 'ab') as part:
+            source.seek(offset)
+            part.write(source.read(self.drive.chunk_size))
+        if self.progress < self.size:
+            return None
+        file_id = uuid.uuid4().hex
+        os.replace(self._part_path, os.path.join(self.drive.root, file_id))
+        meta = {'id': file_id, 'name': self.filename, 'mimeType': self.mimetype, 'permissions': []}
+        self.drive._write_meta(file_id, meta)
+        return self.drive._resource(file_id, meta)
+
+
+class FakeDrive:
+    """Filesystem stand-in for Drive with the same interface as GoogleDriveBackend."""
+
+    def __init__(self, root: Optional[str] = None, chunk_size: int = CHUNK_SIZE, fail_chunks: int = 0):
+        self.root = root or os.getenv("DRIVE_FAKE_DIR", os.path.join(os.path.dirname(__file__), "fake_drive"))
+        self.chunk_size = chunk_size
+        self.fail_chunks = fail_chunks
+        self.chunk_calls = 0
+        self.share_batches = 0
+        os.makedirs(self.root, exist_ok=True)
+
+    def _meta_path(self, file_id: str) -> str:
+        return os.path.join(self.root, f"{file_id}.json")
+
+    def _write_meta(self, file_id: str, meta: dict):
+        with open(self._meta_path(file_id), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+    def _resource(self, file_id: str, meta: dict) -> dict:
+        path = os.path.join(self.root, file_id)
+        return {
+            'id': file_id,
+            'name': meta['name'],
+            'webViewLink': f"file://{path}",
+            'webContentLink': f"file://{path}",
+        }
+
+    def open_upload(self, path: str, filename: str, mimetype: str, resumable_uri: Optional[str] = None, progress: int = 0):
+        return _FakeUploadSession(self, path, filename, mimetype, resumable_uri)
+
+    def share(self, file_ids: List[str]) -> Dict[str, Optional[Exception]]:
+        self.share_batches += 1
+        errors: Dict[str, Optional[Exception]] = {}
+        for file_id in file_ids:
+            if not os.path.exists(self._meta_path(file_id)):
+                errors[file_id] = FileNotFoundError(file_id)
+                continue
+            with open(self._meta_path(file_id), encoding='utf-8') as f:
+                meta = json.load(f)
+            meta['permissions'].append({'type': 'anyone', 'role': 'reader'})
+            self._write_meta(file_id, meta)
+            errors[file_id] = None
+        return errors
+
+
 def test_connection():
     """Test the Google Drive connection."""
     try:
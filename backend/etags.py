@@ -0,0 +1,120 @@
+"""
+Conditional GET Support
+
+Weak ETags for the application and review read endpoints. A tag is a hash of
+a cheap aggregate "fingerprint" query (versions, timestamps and counts) plus
+the requesting user and the query parameters, so a matching If-None-Match
+is answered with 304 before any rows are loaded or serialized.
+
+The fingerprint is taken before the response body is read. If a write lands
+in between, the tag describes older data than the body, and the next
+request simply misses and refetches.
+"""
+
+import hashlib
+from typing import Any, Dict, Optional
+
+from fastapi import Response
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+import models
+
+# Browsers must revalidate every time; tags are per user, so never share them
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts: Any) -> str:
+    digest = hashlib.blake2b(repr(parts).encode("utf-8"), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+
+def _opaque(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against etag."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(_opaque(tag) == _opaque(etag) for tag in if_none_match.split(","))
+
+
+def headers(etag: str) -> Dict[str, str]:
+    return {"ETag": etag, "Cache-Control": CACHE_CONTROL, "Vary": "Authorization"}
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers=headers(etag))
+
+
+def _review_columns(condition):
+    Review = models.Review
+    return [
+        select(func.count(Review.id)).where(condition).scalar_subquery(),
+        select(func.max(Review.assigned_at)).where(condition).scalar_subquery(),
+        select(func.max(Review.submitted_at)).where(condition).scalar_subquery(),
+    ]
+
+
+def _attachment_columns(condition):
+    Attachment = models.Attachment
+    return [
+        select(func.count(Attachment.id)).where(condition).scalar_subquery(),
+        select(func.max(Attachment.uploaded_at)).where(condition).scalar_subquery(),
+    ]
+
+
+def application_etag(db: Session, application_id: str, user: Any) -> Optional[str]:
+    """ETag for a single application, or None if it does not exist."""
+    Application = models.Application
+    row = (
+        db.query(
+            Application.version,
+            Application.updated_at,
+            *_review_columns(models.Review.application_id == application_id),
+            *_attachment_columns(models.Attachment.application_id == application_id),
+        )
+        .filter(Application.id == application_id)
+        .first()
+    )
+    if row is None:
+        return None
+    return make_etag("application", application_id, user.id, user.role, tuple(row))
+
+
+def applications_etag(db: Session, user: Any, query, **params: Any) -> str:
+    """ETag for a page of an application list; query is the unpaged, filtered list query."""
+    Application = models.Application
+    ids = query.with_entities(Application.id).scalar_subquery()
+    row = query.with_entities(
+        func.count(Application.id),
+        func.sum(Application.version),
+        func.max(Application.created_at),
+        func.max(Application.updated_at),
+        *_review_columns(models.Review.application_id.in_(ids)),
+        *_attachment_columns(models.Attachment.application_id.in_(ids)),
+    ).one()
+    return make_etag("applications", user.id, user.role, sorted(params.items()), tuple(row))
+
+
+def reviews_etag(db: Session, user: Any, **params: Any) -> str:
+    """ETag for a reviewer's review list, including the reviewed applications' versions."""
+    Review, Application = models.Review, models.Application
+    row = (
+        db.query(
+            func.count(Review.id),
+            func.count(Review.submitted_at),
+            func.max(Review.assigned_at),
+            func.max(Review.submitted_at),
+            func.sum(Application.version),
+            func.max(Application.updated_at),
+        )
+        .outerjoin(Application, Application.id == Review.application_id)
+        .filter(Review.reviewer_id == user.id)
+        .one()
+    )
+    return make_etag("reviews", user.id, user.role, sorted(params.items()), tuple(row))
@@ -0,0 +1,95 @@
+"""
+Gemini SDK Access
+
+google.generativeai pulls in a large protobuf/grpc import tree, so it is
+imported and configured on first use instead of when word_generator or
+ai_assistant is imported. This keeps it off the API's cold-start path.
+
+GEMINI_STUB=1 swaps the SDK for an offline stand-in (for load tests and
+local runs without an API key): uploads return a fake file handle, JSON
+requests answer every placeholder listed in the prompt, chat requests get a
+fixed reply, each after GEMINI_STUB_LATENCY_MS of simulated latency.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+
+_genai = None
+_lock = threading.Lock()
+
+STUB_LATENCY_SECONDS = float(os.getenv("GEMINI_STUB_LATENCY_MS", "200")) / 1000
+# The placeholder list word_generator puts in each batch prompt
+_BATCH_PATTERN = re.compile(r"\(Placeholders for this batch\):\s*(\[.*?\])\s*\n\s*\n", re.DOTALL)
+
+
+class _StubFile:
+    def __init__(self, display_name: str):
+        self.name = f"files/stub-{display_name}"
+        self.display_name = display_name
+
+
+class _StubPart:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class _StubContent:
+    def __init__(self, text: str):
+        self.parts = [_StubPart(text)]
+
+
+class _StubCandidate:
+    def __init__(self, text: str):
+        self.content = _StubContent(text)
+
+
+class _StubResponse:
+    def __init__(self, text: str):
+        self.text = text
+        self.candidates = [_StubCandidate(text)]
+
+
+class _StubModel:
+    def __init__(self, model_name: str = "", generation_config: dict = None, system_instruction: str = None, **kwargs):
+        self.model_name = model_name
+        self.json_output = (generation_config or {}).get("response_mime_type") == "application/json"
+
+    def generate_content(self, content, **kwargs):
+        time.sleep(STUB_LATENCY_SECONDS)
+        prompt = next((part for part in reversed(content) if isinstance(part, str)), "") if isinstance(content, list) else str(content)
+        if not self.json_output:
+            return _StubResponse("（離線測試模式）收到您的訊息，請繼續填寫表單。")
+        match = _BATCH_PATTERN.search(prompt)
+        keys = json.loads(match.group(1)) if match else []
+        return _StubResponse(json.dumps({key: f"測試值 {index}" for index, key in enumerate(keys)}, ensure_ascii=False))
+
+
+class _StubGenAI:
+    """Offline stand-in for the parts of google.generativeai this app uses."""
+
+    GenerativeModel = _StubModel
+
+    def upload_file(self, path: str, display_name: str = None, **kwargs):
+        time.sleep(STUB_LATENCY_SECONDS)
+        return _StubFile(display_name or os.path.basename(path))
+
+
+def stubbed() -> bool:
+    return os.getenv("GEMINI_STUB", "0") == "1"
+
+
+def client():
+    """The configured google.generativeai module, imported on first call."""
+    global _genai
+    if _genai is None:
+        with _lock:
+            if _genai is None and stubbed():
+                _genai = _StubGenAI()
+            if _genai is None:
+                import google.generativeai as genai
+                genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+                _genai = genai
+    return _genai
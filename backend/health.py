@@ -0,0 +1,155 @@
+"""
+Health Checks and Warm-up
+
+Liveness only says the process is serving requests. Readiness probes the
+things a real request depends on:
+
+- database: a timed SELECT 1 (fails when the DB is unreachable or locked)
+- template: the Word template parses and its placeholders are cached
+- references: the sample PDF exists; whether it has been uploaded to the
+  Gemini File API is reported but not required, so a Gemini outage does not
+  take the rest of the API out of rotation
+- drive_queue: Drive upload jobs still waiting, compared to
+  READY_MAX_QUEUE_DEPTH
+
+A warm-up thread started with the app parses the template, uploads the
+reference PDF and opens a DB connection, so the first user after a deploy
+does not pay those costs. Readiness stays false until it has finished.
+"""
+
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from sqlalchemy import text
+
+import drive_queue
+import logs
+import word_generator
+
+READY_MAX_DB_MS = float(os.getenv("READY_MAX_DB_MS", "1000"))
+READY_MAX_QUEUE_DEPTH = int(os.getenv("READY_MAX_QUEUE_DEPTH", "500"))
+# WARMUP=0 skips warm-up (readiness is then green as soon as the probes pass)
+WARMUP_ENABLED = os.getenv("WARMUP", "1") != "0"
+
+logger = logs.get_logger("health")
+
+
+def _gemini_configured() -> bool:
+    return bool(os.getenv("GEMINI_API_KEY"))
+
+
+def check_database(db) -> Dict[str, Any]:
+    start = time.perf_counter()
+    try:
+        db.execute(text("SELECT 1")).scalar()
+    except Exception as e:
+        return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    return {"ok": elapsed_ms <= READY_MAX_DB_MS, "latency_ms": round(elapsed_ms, 2)}
+
+
+def check_template() -> Dict[str, Any]:
+    if not os.path.exists(word_generator.TEMPLATE_PATH):
+        return {"ok": False, "error": "template.docx not found"}
+    # Served from cache unless the template file changed since it was parsed
+    try:
+        _, placeholders = word_generator.load_template()
+    except Exception as e:
+        return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+    return {"ok": True, "placeholders": len(placeholders)}
+
+
+def check_references() -> Dict[str, Any]:
+    if not os.path.exists(word_generator.SAMPLE_PDF_PATH):
+        return {"ok": False, "error": "sample.pdf not found"}
+    return {"ok": True, "uploaded": _gemini_configured() and word_generator.reference_uploaded()}
+
+
+def check_drive_queue(db) -> Dict[str, Any]:
+    if not drive_queue.queue.running:
+        return {"ok": True, "running": False}
+    try:
+        depth = drive_queue.pending_count(db)
+    except Exception as e:
+        return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+    return {"ok": depth <= READY_MAX_QUEUE_DEPTH, "running": True, "depth": depth}
+
+
+class WarmUp:
+    """Runs the warm-up steps once in a background thread and records the outcome."""
+
+    def __init__(self, session_factory):
+        self.session_factory = session_factory
+        self.done = threading.Event()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.steps: Dict[str, Dict[str, Any]] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if not WARMUP_ENABLED:
+            self.done.set()
+            return
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run, name="warm-up", daemon=True)
+            self._thread.start()
+
+    def _step(self, name: str, func):
+        start = time.perf_counter()
+        try:
+            func()
+            self.steps[name] = {"ok": True}
+        except Exception as e:
+            # A failed step is reported by the readiness check it feeds; the
+            # request path will retry it on demand
+            self.steps[name] = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+            logger.warning("warm-up step failed", extra={"step": name, "error": str(e)})
+        self.steps[name]["ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+    def _database(self):
+        db = self.session_factory()
+        try:
+            db.execute(text("SELECT 1"))
+        finally:
+            db.close()
+
+    def _references(self):
+        if _gemini_configured():
+            word_generator.reference_file()
+
+    def run(self):
+        self.started_at = time.time()
+        self._step("database", self._database)
+        self._step("template", word_generator.load_template)
+        self._step("references", self._references)
+        self.finished_at = time.time()
+        self.done.set()
+        logger.info(
+            "warm-up finished",
+            extra={"duration_ms": round((self.finished_at - self.started_at) * 1000, 1), "steps": self.steps},
+        )
+
+    def status(self) -> Dict[str, Any]:
+        result: Dict[str, Any] = {"ok": self.done.is_set()}
+        if self.steps:
+            result["steps"] = self.steps
+        if self.started_at and self.finished_at:
+            result["duration_ms"] = round((self.finished_at - self.started_at) * 1000, 1)
+        return result
+
+
+def readiness(db, warm_up: WarmUp) -> Dict[str, Any]:
+    """All readiness checks; the service is ready when every one of them is ok."""
+    checks = {
+        "warm_up": warm_up.status(),
+        "database": check_database(db),
+        "template": check_template(),
+        "references": check_references(),
+        "drive_queue": check_drive_queue(db),
+    }
+    return {
+        "status": "ready" if all(check["ok"] for check in checks.values()) else "unavailable",
+        "checks": checks,
+    }
@@ -0,0 +1,176 @@
+"""
+JSON Patch (RFC 6902) and JSON Merge Patch (RFC 7396) helpers.
+
+Used to apply partial updates to Application.form_data without the client
+resending the whole form.
+"""
+
+import copy
+from typing import Any, Dict, List
+
+
+class JsonPatchError(ValueError):
+    """Raised when a patch is malformed or cannot be applied to the document."""
+
+
+def _parse_pointer(pointer: str) -> List[str]:
+    if pointer == "":
+        return []
+    if not pointer.startswith("/"):
+        raise JsonPatchError(f"Invalid JSON pointer: {pointer!r}")
+    return [part.replace("~1", "/").replace("~0", "~") for part in pointer[1:].split("/")]
+
+
+def _list_index(container: list, token: str, allow_end: bool = False) -> int:
+    if allow_end and token == "-":
+        return len(container)
+    if not token.isdigit() or (len(token) > 1 and token.startswith("0")):
+        raise JsonPatchError(f"Invalid array index: {token!r}")
+    index = int(token)
+    limit = len(container) + 1 if allow_end else len(container)
+    if index >= limit:
+        raise JsonPatchError(f"Array index out of range: {index}")
+    return index
+
+
+def _resolve(doc: Any, tokens: List[str]) -> Any:
+    node = doc
+    for token in tokens:
+        if isinstance(node, dict):
+            if token not in node:
+                raise JsonPatchError(f"Path not found: /{'/'.join(tokens)}")
+            node = node[token]
+        elif isinstance(node, list):
+            node = node[_list_index(node, token)]
+        else:
+            raise JsonPatchError(f"Path not found: /{'/'.join(tokens)}")
+    return node
+
+
+def _add(doc: Any, tokens: List[str], value: Any) -> Any:
+    if not tokens:
+        return value
+    parent = _resolve(doc, tokens[:-1])
+    key = tokens[-1]
+    if isinstance(parent, dict):
+        parent[key] = value
+    elif isinstance(parent, list):
+        parent.insert(_list_index(parent, key, allow_end=True), value)
+    else:
+        raise JsonPatchError(f"Cannot add to non-container at /{'/'.join(tokens[:-1])}")
+    return doc
+
+
+def _remove(doc: Any, tokens: List[str]) -> Any:
+    if not tokens:
+        raise JsonPatchError("Cannot remove the document root")
+    parent = _resolve(doc, tokens[:-1])
+    key = tokens[-1]
+    if isinstance(parent, dict):
+        if key not in parent:
+            raise JsonPatchError(f"Path not found: /{'/'.join(tokens)}")
+        return parent.pop(key)
+    if isinstance(parent, list):
+        return parent.pop(_list_index(parent, key))
+    raise JsonPatchError(f"Path not found: /{'/'.join(tokens)}")
+
+
+def apply_patch(doc: Any, operations: List[Dict[str, Any]]) -> Any:
+    """Apply RFC 6902 operations to a copy of doc and return the result.
+
+    The patch is atomic: if any operation fails, JsonPatchError is raised and
+    the original document is left untouched.
+    """
+    if not isinstance(operations, list):
+        raise JsonPatchError("A JSON Patch must be a list of operations")
+
+    result = copy.deepcopy(doc)
+    for operation in operations:
+        if not isinstance(operation, dict) or "op" not in operation or "path" not in operation:
+            raise JsonPatchError(f"Malformed operation: {operation!r}")
+        op = operation["op"]
+        tokens = _parse_pointer(operation["path"])
+
+        if op in ("add", "replace", "test") and "value" not in operation:
+            raise JsonPatchError(f"Operation {op!r} requires a value")
+        if op in ("move", "copy") and "from" not in operation:
+            raise JsonPatchError(f"Operation {op!r} requires 'from'")
+
+        if op == "add":
+            result = _add(result, tokens, copy.deepcopy(operation["value"]))
+        elif op == "remove":
+            _remove(result, tokens)
+        elif op == "replace":
+            if tokens:
+                _resolve(result, tokens)  # Target must exist
+                parent = _resolve(result, tokens[:-1])
+                if isinstance(parent, list):
+                    parent[_list_index(parent, tokens[-1])] = copy.deepcopy(operation["value"])
+                else:
+                    parent[tokens[-1]] = copy.deepcopy(operation["value"])
+            else:
+                result = copy.deepcopy(operation["value"])
+        elif op == "move":
+            from_tokens = _parse_pointer(operation["from"])
+            if tokens[:len(from_tokens)] == from_tokens and tokens != from_tokens:
+                raise JsonPatchError("Cannot move a value into one of its children")
+            value = _remove(result, from_tokens)
+            result = _add(result, tokens, value)
+        elif op == "copy":
+            value = copy.deepcopy(_resolve(result, _parse_pointer(operation["from"])))
+            result = _add(result, tokens, value)
+        elif op == "test":
+            if _resolve(result, tokens) != operation["value"]:
+                raise JsonPatchError(f"Test failed at {operation['path']}")
+        else:
+            raise JsonPatchError(f"Unknown operation: {op!r}")
+
+    return result
+
+
+def apply_merge_patch(doc: Any, patch: Any) -> Any:
+    """Apply an RFC 7396 merge patch to a copy of doc and return the result."""
+    if not isinstance(patch, dict):
+        return copy.deepcopy(patch)
+    result = copy.deepcopy(doc) if isinstance(doc, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = apply_merge_patch(result.get(key), value)
+    return result
+
+
+def _escape(token: str) -> str:
+    return str(token).replace("~", "~0").replace("/", "~1")
+
+
+def _diff(src: Any, dst: Any, path: str, operations: List[Dict[str, Any]]):
+    if src == dst:
+        return
+    if isinstance(src, dict) and isinstance(dst, dict):
+        for key in src:
+            if key not in dst:
+                operations.append({"op": "remove", "path": f"{path}/{_escape(key)}"})
+        for key, value in dst.items():
+            if key in src:
+                _diff(src[key], value, f"{path}/{_escape(key)}", operations)
+            else:
+                operations.append({"op": "add", "path": f"{path}/{_escape(key)}", "value": copy.deepcopy(value)})
+    elif isinstance(src, list) and isinstance(dst, list):
+        common = min(len(src), len(dst))
+        for index in range(common):
+            _diff(src[index], dst[index], f"{path}/{index}", operations)
+        for index in range(common, len(dst)):
+            operations.append({"op": "add", "path": f"{path}/{index}", "value": copy.deepcopy(dst[index])})
+        for index in range(len(src) - 1, common - 1, -1):
+            operations.append({"op": "remove", "path": f"{path}/{index}"})
+    else:
+        operations.append({"op": "replace", "path": path, "value": copy.deepcopy(dst)})
+
+
+def make_patch(src: Any, dst: Any) -> List[Dict[str, Any]]:
+    """Compute RFC 6902 operations that turn src into dst."""
+    operations: List[Dict[str, Any]] = []
+    _diff(src, dst, "", operations)
+    return operations
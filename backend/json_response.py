@@ -0,0 +1,29 @@
+"""
+Fast JSON Responses
+
+FastJSONResponse renders with orjson when it is installed, and otherwise
+falls back to compact stdlib json. Both keep non-ASCII text as raw UTF-8
+instead of \\uXXXX escapes, which halves the size of Chinese form_data.
+It is the app-wide default response class (see main.py).
+"""
+
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
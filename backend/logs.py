@@ -0,0 +1,57 @@
+"""
+Structured Logging
+
+JSON-lines logging for the API. Every record carries the id of the request
+being handled (taken from the X-Request-ID header or generated by
+metrics.MetricsMiddleware), so all lines of one request can be grepped
+together. Extra fields passed via `extra={...}` become top-level keys:
+
+    logger = logs.get_logger("generate")
+    logger.info("document generated", extra={"application_id": app_id, "bytes": 1234})
+
+LOG_LEVEL sets the threshold (default INFO).
+"""
+
+import contextvars
+import json
+import logging
+import os
+import sys
+from datetime import datetime, timezone
+
+request_id_var: contextvars.ContextVar = contextvars.ContextVar("request_id", default=None)
+
+# Attributes every LogRecord has; anything else came in through `extra`
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        request_id = request_id_var.get()
+        if request_id:
+            entry["request_id"] = request_id
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+_root = logging.getLogger("course")
+if not _root.handlers:
+    _handler = logging.StreamHandler(sys.stdout)
+    _handler.setFormatter(JsonFormatter())
+    _root.addHandler(_handler)
+    _root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    _root.propagate = False
+
+
+def get_logger(name: str) -> logging.Logger:
+    return _root.getChild(name)
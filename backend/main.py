@@ -1,29 +1,49 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Header, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse, FileResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import StreamingResponse, FileResponse, RedirectResponse
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from datetime import timedelta
+from datetime import datetime, timedelta
 import io
 import os
-import uuid
-import traceback
+import time
 
 import models, schemas, crud, database, security
+import ai_assistant
+import attachments_store
+import auth_cache
+import blobstore
+import compression
+import downloads_store
+import drive_queue
+import etags
+import health
+import json_patch
+import json_response
+import logs
+import metrics
+import migrations
+import revisions
+import search
+import stats
+import tracing
+import validation
+import workflow
 import word_generator
 
-models.Base.metadata.create_all(bind=database.engine)
-
-app = FastAPI(title="Remote Course System API", redirect_slashes=False)
-
-# Create downloads directory if not exists
-DOWNLOADS_DIR = os.path.join(os.path.dirname(__file__), "downloads")
-os.makedirs(DOWNLOADS_DIR, exist_ok=True)
+# Schema changes normally run as a deploy step (python migrations.py); with
+# AUTO_MIGRATE on (the default, for local development) start-up checks the
+# stored schema fingerprint and only migrates when models.py changed.
+if os.getenv("AUTO_MIGRATE", "1") != "0":
+    migrations.upgrade_if_needed(database.engine)
 
-# Mount static files for downloads
-app.mount("/downloads", StaticFiles(directory=DOWNLOADS_DIR), name="downloads")
+app = FastAPI(
+    title="Remote Course System API",
+    redirect_slashes=False,
+    default_response_class=json_response.FastJSONResponse,
+)
 
 # CORS - Allow all origins for production
 app.add_middleware(
@@ -32,58 +52,73 @@ app.add_middleware(
     allow_credentials=False,  # Must be False when using wildcard origins
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["Content-Disposition"],
+    expose_headers=[
+        "Content-Disposition", "X-Request-ID", "Server-Timing", "Content-Range", "Accept-Ranges",
+        "X-Unreplaced-Placeholders",
+    ],
 )
 
+# Compress large JSON bodies (br/gzip, negotiated per request)
+app.add_middleware(compression.CompressionMiddleware)
+
+# Outermost: request ids, latency/DB metrics and the access log
+app.add_middleware(metrics.MetricsMiddleware)
+
+logger = logs.get_logger("main")
+download_log = logs.get_logger("download")
+generate_log = logs.get_logger("generate")
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
 
-# Initialize demo users on startup
+
+# Initialize demo users on startup (SEED_DEMO_USERS=0 to skip)
 @app.on_event("startup")
 def init_demo_users():
+    if os.getenv("SEED_DEMO_USERS", "1") == "0":
+        return
     db = database.SessionLocal()
     try:
-        # Check if demo user exists
-        existing_user = db.query(models.User).filter(models.User.email == "test@example.com").first()
-        if not existing_user:
-            print("[STARTUP] Creating demo users...")
-            # Create teacher demo user
-            teacher = models.User(
-                email="test@example.com",
-                hashed_password=security.get_password_hash("password"),
-                name="Demo Teacher",
-                role="TEACHER",
-                department="資訊工程系"
-            )
-            db.add(teacher)
-            
-            # Create admin demo user
-            admin = models.User(
-                email="admin@example.com",
-                hashed_password=security.get_password_hash("password"),
-                name="Demo Admin",
-                role="ADMIN",
-                department="教務處"
-            )
-            db.add(admin)
-            
-            # Create reviewer demo user
-            reviewer = models.User(
-                email="reviewer@example.com",
-                hashed_password=security.get_password_hash("password"),
-                name="Demo Reviewer",
-                role="REVIEWER",
-                department="教學發展中心"
-            )
-            db.add(reviewer)
-            
-            db.commit()
-            print("[STARTUP] Demo users created successfully!")
+        if migrations.seed_demo_users(db):
+            logger.info("demo users created")
         else:
-            print("[STARTUP] Demo users already exist.")
-    except Exception as e:
-        print(f"[STARTUP] Error creating demo users: {e}")
+            logger.info("demo users already exist")
+    except Exception:
+        logger.exception("error creating demo users")
     finally:
         db.close()
 
+@app.on_event("startup")
+def init_stats():
+    db = database.SessionLocal()
+    try:
+        stats.ensure_initialized(db)
+    finally:
+        db.close()
+
+downloads_sweeper = downloads_store.Sweeper(database.SessionLocal)
+
+@app.on_event("startup")
+def start_downloads_sweeper():
+    downloads_sweeper.start()
+
+@app.on_event("shutdown")
+def stop_downloads_sweeper():
+    downloads_sweeper.stop()
+
+@app.on_event("startup")
+def start_drive_queue():
+    if drive_queue.backend_name() != "none":
+        drive_queue.queue.start(database.SessionLocal)
+
+@app.on_event("shutdown")
+def stop_drive_queue():
+    drive_queue.queue.stop()
+
+warm_up = health.WarmUp(database.SessionLocal)
+
+@app.on_event("startup")
+def start_warm_up():
+    warm_up.start()
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/token")
 
 def get_db():
@@ -106,25 +141,86 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
             raise credentials_exception
     except security.JWTError:
         raise credentials_exception
-    user = crud.get_user_by_email(db, email=email)
-    if user is None:
+    user_id = payload.get("uid")
+    principal = auth_cache.user_cache.get(email)
+    if principal is not None and (user_id is None or principal.id == user_id):
+        return principal
+    # Tokens carrying the id claim resolve by primary key
+    user = crud.get_user(db, user_id=user_id) if user_id else crud.get_user_by_email(db, email=email)
+    if user is None or user.email != email:
         raise credentials_exception
-    return user
+    return auth_cache.user_cache.put(email, user)
 
 @app.post("/api/token", response_model=dict)
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = crud.get_user_by_email(db, form_data.username)
-    if not user or not security.verify_password(form_data.password, user.hashed_password):
+    # Async so the key derivation runs in the hashing pool; the database work
+    # goes to the threadpool, keeping both off the event loop
+    user = await run_in_threadpool(crud.get_user_by_email, db, form_data.username)
+    verified, new_hash = False, None
+    if user:
+        verified, new_hash = await security.verify_and_update_password_async(form_data.password, user.hashed_password)
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    return await run_in_threadpool(complete_login, db, user, new_hash)
+
+def complete_login(db: Session, user: models.User, new_hash: Optional[str]) -> dict:
+    """Store an upgraded password hash, if any, and issue the session's tokens."""
+    if new_hash:
+        # Migrate the stored hash to the current cost parameters
+        crud.update_user_password_hash(db, user, new_hash)
+    return issue_tokens(user, crud.create_refresh_token(db, user.id))
+
+def issue_tokens(user: models.User, refresh_token: str) -> dict:
     access_token_expires = timedelta(minutes=security.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = security.create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
+        data={"sub": user.email, "uid": user.id, "role": user.role.value}, expires_delta=access_token_expires
     )
-    return {"access_token": access_token, "token_type": "bearer", "role": user.role}
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "role": user.role,
+        "expires_in": int(access_token_expires.total_seconds()),
+        "refresh_token": refresh_token,
+    }
+
+@app.post("/api/token/refresh", response_model=dict)
+def refresh_access_token(body: schemas.TokenRefresh, db: Session = Depends(get_db)):
+    """Exchange a refresh token for a new access token and a rotated refresh token."""
+    invalid_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    db_token = crud.get_refresh_token(db, body.refresh_token)
+    if db_token is None:
+        raise invalid_exception
+    if db_token.revoked_at is None:
+        if db_token.expires_at <= datetime.utcnow():
+            raise invalid_exception
+        successor = crud.rotate_refresh_token(db, db_token, body.refresh_token)
+        if successor is not None:
+            return issue_tokens(db_token.user, successor)
+        # Lost a race with a concurrent refresh of the same token; fall through
+        # to the grace path, which hands back the winner's successor
+        db.refresh(db_token)
+    successor = crud.recently_rotated_successor(db, db_token, body.refresh_token)
+    if successor is not None:
+        return issue_tokens(db_token.user, successor)
+    # A rotated token was presented again: assume it leaked and revoke the whole family
+    crud.revoke_user_refresh_tokens(db, db_token.user_id)
+    raise invalid_exception
+
+@app.post("/api/token/revoke")
+def revoke_refresh_token(body: schemas.TokenRefresh, db: Session = Depends(get_db)):
+    """Revoke a refresh token (logout). Unknown tokens are ignored."""
+    db_token = crud.get_refresh_token(db, body.refresh_token)
+    if db_token is not None:
+        crud.revoke_refresh_token(db, db_token)
+    return {"success": True}
 
 @app.post("/api/users/", response_model=schemas.User)
 def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
@@ -137,6 +233,13 @@ def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
 async def read_users_me(current_user: models.User = Depends(get_current_user)):
     return current_user
 
+@app.get("/api/auth/cache-stats")
+def read_auth_cache_stats(current_user: models.User = Depends(get_current_user)):
+    """Hit-rate metrics of the authenticated-user cache (admin only)."""
+    if current_user.role != models.UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return auth_cache.user_cache.stats()
+
 @app.post("/api/applications", response_model=schemas.Application)
 def create_application(
     application: schemas.ApplicationCreate, 
@@ -149,13 +252,45 @@ def create_application(
 def read_applications(
     skip: int = 0, 
     limit: int = 100, 
+    status: Optional[models.ApplicationStatus] = None,
+    academic_year: Optional[str] = None,
+    semester: Optional[str] = None,
+    main_department: Optional[str] = None,
+    degree_level: Optional[str] = None,
+    response: Response = None,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    filters = {
+        "status": status,
+        "academic_year": academic_year,
+        "semester": semester,
+        "main_department": main_department,
+        "degree_level": degree_level,
+    }
+    user_id = None if current_user.role == models.UserRole.ADMIN else current_user.id
+    etag = etags.applications_etag(
+        db, current_user, crud.applications_query(db, user_id=user_id, filters=filters),
+        skip=skip, limit=limit, **filters,
+    )
+    if etags.matches(if_none_match, etag):
+        return etags.not_modified(etag)
+    response.headers.update(etags.headers(etag))
+    return crud.get_applications(db, skip=skip, limit=limit, user_id=user_id, filters=filters)
+
+@app.get("/api/applications/search", response_model=List[schemas.ApplicationSearchResult])
+def search_applications(
+    q: str,
+    limit: int = 20,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    if current_user.role == models.UserRole.ADMIN:
-        return crud.get_applications(db, skip=skip, limit=limit)
-    else:
-        return crud.get_applications(db, skip=skip, limit=limit, user_id=current_user.id)
+    """Full-text search over course names, teacher, department, objectives and outline."""
+    limit = max(1, min(limit, 100))
+    # Teachers only search their own applications
+    teacher_id = current_user.id if current_user.role == models.UserRole.TEACHER else None
+    return search.search(db, q, limit=limit, teacher_id=teacher_id)
 
 @app.get("/api/users/reviewers", response_model=List[schemas.User])
 def read_reviewers(db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
@@ -163,6 +298,13 @@ def read_reviewers(db: Session = Depends(get_db), current_user: models.User = De
         raise HTTPException(status_code=403, detail="Not authorized")
     return crud.get_users_by_role(db, role=models.UserRole.REVIEWER)
 
+@app.get("/api/stats")
+def read_stats(db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+    """Dashboard statistics from incrementally maintained counters (admin only)."""
+    if current_user.role != models.UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return stats.get_stats(db)
+
 @app.post("/api/reviews/", response_model=schemas.Review)
 def create_review(
     review: schemas.ReviewCreate, 
@@ -171,14 +313,61 @@ def create_review(
 ):
     if current_user.role != models.UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Not authorized")
-    return crud.create_review(db=db, review=review)
+    try:
+        return crud.create_review(db=db, review=review)
+    except workflow.InvalidTransition as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.post("/api/reviews/bulk", response_model=schemas.BulkReviewResult)
+def bulk_assign_reviews(
+    request: schemas.BulkReviewAssign,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """Assign reviewers to many applications at once, explicitly or by strategy."""
+    if current_user.role != models.UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    if not request.assignments and not request.strategy:
+        raise HTTPException(status_code=400, detail="Provide either 'assignments' or a 'strategy'")
+    if request.reviewers_per_application < 1:
+        raise HTTPException(status_code=400, detail="reviewers_per_application must be at least 1")
+    return crud.bulk_assign_reviews(db, request)
 
 @app.get("/api/reviews/me", response_model=List[schemas.Review])
-def read_my_reviews(db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+def read_my_reviews(
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
     if current_user.role != models.UserRole.REVIEWER:
         raise HTTPException(status_code=403, detail="Not authorized")
+    etag = etags.reviews_etag(db, current_user, view="me")
+    if etags.matches(if_none_match, etag):
+        return etags.not_modified(etag)
+    response.headers.update(etags.headers(etag))
     return crud.get_reviews_by_reviewer(db, reviewer_id=current_user.id)
 
+@app.get("/api/reviews/inbox", response_model=schemas.ReviewInbox)
+def read_review_inbox(
+    status: Optional[models.ReviewStatus] = None,
+    skip: int = 0,
+    limit: int = 50,
+    response: Response = None,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """The reviewer's reviews with compact application summaries (no form_data)."""
+    if current_user.role != models.UserRole.REVIEWER:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    limit = max(1, min(limit, 200))
+    etag = etags.reviews_etag(db, current_user, view="inbox", status=status, skip=skip, limit=limit)
+    if etags.matches(if_none_match, etag):
+        return etags.not_modified(etag)
+    response.headers.update(etags.headers(etag))
+    return crud.get_review_inbox(db, reviewer_id=current_user.id, status=status, skip=max(skip, 0), limit=limit)
+
 @app.put("/api/reviews/{review_id}", response_model=schemas.Review)
 def update_review(
     review_id: str,
@@ -186,19 +375,34 @@ def update_review(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    # TODO: Check if user is the assigned reviewer
-    return crud.update_review(db=db, review_id=review_id, review_update=review)
+    db_review = crud.get_review(db, review_id=review_id)
+    if db_review is None:
+        raise HTTPException(status_code=404, detail="Review not found")
+    if db_review.reviewer_id != current_user.id and current_user.role != models.UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    if review.result is None:
+        # Saving a review completes it, and a completed review must say how it came out
+        raise HTTPException(status_code=422, detail="A review result is required to complete the review")
+    return crud.update_review(db=db, review_id=review_id, review_update=review, actor_id=current_user.id)
 
 @app.get("/api/applications/{application_id}", response_model=schemas.Application)
 def read_application(
     application_id: str,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
     # TODO: Check permissions
+    etag = etags.application_etag(db, application_id, current_user)
+    if etag is None:
+        raise HTTPException(status_code=404, detail="Application not found")
+    if etags.matches(if_none_match, etag):
+        return etags.not_modified(etag)
     application = crud.get_application(db, application_id=application_id)
     if application is None:
         raise HTTPException(status_code=404, detail="Application not found")
+    response.headers.update(etags.headers(etag))
     return application
 
 @app.put("/api/applications/{application_id}", response_model=schemas.Application)
@@ -219,15 +423,123 @@ def update_application(
     
     # Update form_data
     if "form_data" in update_data:
-        application.form_data = update_data["form_data"]
-        # Also update course name if it changed
-        if "course_name_zh" in update_data["form_data"]:
-            application.course_name_zh = update_data["form_data"]["course_name_zh"]
-        db.commit()
-        db.refresh(application)
+        try:
+            application = crud.update_application_form_data(
+                db, application, update_data["form_data"],
+                expected_version=update_data.get("version"), author_id=current_user.id
+            )
+        except crud.StaleVersionError:
+            raise HTTPException(status_code=409, detail="Application was modified by another session")
     
     return application
 
+@app.patch("/api/applications/{application_id}", response_model=schemas.ApplicationVersion)
+def patch_application(
+    application_id: str,
+    patch: schemas.ApplicationPatch,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """Apply a JSON Patch or merge patch to form_data; stale versions are rejected with 409."""
+    if (patch.operations is None) == (patch.merge is None):
+        raise HTTPException(status_code=400, detail="Provide exactly one of 'operations' or 'merge'")
+
+    application = crud.get_application(db, application_id=application_id)
+    if application is None:
+        raise HTTPException(status_code=404, detail="Application not found")
+    if application.teacher_id != current_user.id and current_user.role != models.UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Not authorized to update this application")
+    if patch.version != application.version:
+        raise HTTPException(status_code=409, detail="Application was modified by another session")
+
+    try:
+        if patch.operations is not None:
+            form_data = json_patch.apply_patch(application.form_data or {}, patch.operations)
+        else:
+            form_data = json_patch.apply_merge_patch(application.form_data or {}, patch.merge)
+    except json_patch.JsonPatchError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if not isinstance(form_data, dict):
+        raise HTTPException(status_code=422, detail="form_data must remain a JSON object")
+
+    try:
+        return crud.update_application_form_data(
+            db, application, form_data, expected_version=patch.version, author_id=current_user.id
+        )
+    except crud.StaleVersionError:
+        raise HTTPException(status_code=409, detail="Application was modified by another session")
+
+@app.post("/api/applications/{application_id}/status", response_model=schemas.Application)
+def change_application_status(
+    application_id: str,
+    change: schemas.ApplicationStatusChange,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """Move an application through the review workflow (submit, withdraw, cancel, ...)."""
+    application = crud.get_application(db, application_id=application_id)
+    if application is None:
+        raise HTTPException(status_code=404, detail="Application not found")
+    if current_user.role != models.UserRole.ADMIN:
+        is_owner = application.teacher_id == current_user.id
+        if not is_owner or (application.status, change.status) not in workflow.TEACHER_TRANSITIONS:
+            raise HTTPException(status_code=403, detail="Not authorized")
+    if change.status == models.ApplicationStatus.SUBMITTED:
+        result = validation.current(application)
+        if result["errors"]:
+            raise HTTPException(status_code=422, detail={
+                "message": f"Application has {len(result['errors'])} validation errors",
+                "errors": result["errors"],
+            })
+    try:
+        return crud.change_application_status(db, application, change.status, actor_id=current_user.id)
+    except workflow.InvalidTransition as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+def get_readable_application(db: Session, application_id: str, current_user: models.User) -> models.Application:
+    """Load an application visible to the owner, reviewers and admins."""
+    application = crud.get_application(db, application_id=application_id)
+    if application is None:
+        raise HTTPException(status_code=404, detail="Application not found")
+    if application.teacher_id != current_user.id and current_user.role == models.UserRole.TEACHER:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return application
+
+@app.get("/api/applications/{application_id}/validation", response_model=schemas.ValidationResult)
+def read_application_validation(
+    application_id: str,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """Completeness and validation errors, as stored on the last save."""
+    application = get_readable_application(db, application_id, current_user)
+    return validation.current(application)
+
+@app.get("/api/applications/{application_id}/revisions", response_model=List[schemas.ApplicationRevision])
+def read_application_revisions(
+    application_id: str,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """List the form_data revision history of an application."""
+    get_readable_application(db, application_id, current_user)
+    return revisions.list_revisions(db, application_id)
+
+@app.get("/api/applications/{application_id}/revisions/diff", response_model=schemas.RevisionDiff)
+def read_application_revision_diff(
+    application_id: str,
+    from_revision: int,
+    to_revision: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """JSON Patch between two revisions of an application's form_data."""
+    get_readable_application(db, application_id, current_user)
+    operations = revisions.diff_revisions(db, application_id, from_revision, to_revision)
+    if operations is None:
+        raise HTTPException(status_code=404, detail="Revision not found")
+    return {"from_revision": from_revision, "to_revision": to_revision, "operations": operations}
+
 @app.get("/api/applications/{application_id}/download")
 def download_application_document(
     application_id: str,
@@ -235,40 +547,39 @@ def download_application_document(
     current_user: models.User = Depends(get_current_user)
 ):
     """Generate and download a Word document for the application."""
-    import traceback
-    print(f"[DOWNLOAD] Starting download for application_id={application_id}")
+    download_log.info("download started", extra={"application_id": application_id})
     
     # Fetch application
     application = crud.get_application(db, application_id=application_id)
     if application is None:
-        print(f"[DOWNLOAD] Application not found")
+        download_log.info("application not found", extra={"application_id": application_id})
         raise HTTPException(status_code=404, detail="Application not found")
     
-    print(f"[DOWNLOAD] Found application: {application.course_name_zh}")
-    
     # Check permission (owner or admin)
     if application.teacher_id != current_user.id and current_user.role != models.UserRole.ADMIN:
-        print(f"[DOWNLOAD] Not authorized")
+        download_log.warning("not authorized", extra={"application_id": application_id, "user_id": current_user.id})
         raise HTTPException(status_code=403, detail="Not authorized")
     
     # Get form data
     form_data = application.form_data
     if not form_data:
-        print(f"[DOWNLOAD] No form data")
+        download_log.info("no form data", extra={"application_id": application_id})
         raise HTTPException(status_code=400, detail="No form data available for this application")
     
-    print(f"[DOWNLOAD] Form data keys: {list(form_data.keys())[:10]}...")
-    
     try:
         # Generate document
-        print(f"[DOWNLOAD] Starting document generation...")
-        doc_bytes = word_generator.generate_document(form_data)
-        print(f"[DOWNLOAD] Generated {len(doc_bytes)} bytes")
+        with tracing.collect() as timings:
+            doc_bytes, unreplaced = word_generator.build_document(form_data, application_id)
+        download_log.info("document generated", extra={
+            "application_id": application_id,
+            "bytes": len(doc_bytes),
+            "unreplaced": len(unreplaced),
+            "timings": timings.as_dict(),
+        })
         
         # Create filename with URL encoding for Chinese characters
         course_name = form_data.get("course_name_zh", "課程申請")
         filename = f"{course_name}_教學計畫表.docx"
-        print(f"[DOWNLOAD] Filename: {filename}")
         
         # URL encode the filename for Content-Disposition header
         from urllib.parse import quote
@@ -283,24 +594,26 @@ def download_application_document(
             media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
             headers={
                 "Content-Disposition": f'attachment; filename="{ascii_filename}"; filename*=UTF-8\'\'{encoded_filename}',
-                "Access-Control-Expose-Headers": "Content-Disposition"
+                "Access-Control-Expose-Headers": "Content-Disposition, Server-Timing, X-Unreplaced-Placeholders",
+                "Server-Timing": timings.server_timing(),
+                "X-Unreplaced-Placeholders": str(len(unreplaced)),
             }
         )
     except Exception as e:
-        print(f"[DOWNLOAD] Error: {type(e).__name__}: {e}")
-        traceback.print_exc()
+        download_log.exception("document generation failed", extra={"application_id": application_id})
         raise HTTPException(status_code=500, detail=f"Error generating document: {str(e)}")
 
 
 @app.post("/api/applications/{application_id}/generate-upload")
 async def generate_and_upload_to_drive(
     application_id: str, 
+    response: Response,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
     """Generate Word document and save to downloads folder, return download link."""
     
-    print(f"[GENERATE] Generating document for application: {application_id}")
+    generate_log.info("generate started", extra={"application_id": application_id})
     
     # Get application
     application = crud.get_application(db, application_id=application_id)
@@ -318,41 +631,197 @@ async def generate_and_upload_to_drive(
     
     try:
         # Generate document
-        print(f"[GENERATE] Generating document...")
-        doc_bytes = word_generator.generate_document(form_data)
-        print(f"[GENERATE] Generated {len(doc_bytes)} bytes")
+        with tracing.collect() as timings:
+            doc_bytes, unreplaced = word_generator.build_document(form_data, application_id)
+        generate_log.info("document generated", extra={
+            "application_id": application_id,
+            "bytes": len(doc_bytes),
+            "unreplaced": len(unreplaced),
+            "timings": timings.as_dict(),
+        })
         
-        # Create filename with unique ID to avoid conflicts
+        # Store by content hash; identical documents are kept once
         course_name = form_data.get("course_name_zh", "課程申請")
-        unique_id = str(uuid.uuid4())[:8]
-        safe_filename = f"{course_name}_{unique_id}_教學計畫表.docx"
+        safe_filename = f"{course_name}_教學計畫表.docx"
+        download = downloads_store.put(db, doc_bytes)
         
-        # Save to downloads folder
-        file_path = os.path.join(DOWNLOADS_DIR, safe_filename)
-        with open(file_path, 'wb') as f:
-            f.write(doc_bytes)
-        print(f"[GENERATE] Saved to: {file_path}")
+        # Signed, expiring URL (relative path for frontend to handle)
+        download_url = downloads_store.signed_url(download.content_hash, safe_filename)
         
-        # Return download URL (use relative path for frontend to handle)
-        download_url = f"/downloads/{safe_filename}"
+        # Archive to Google Drive in the background
+        drive_upload_id = None
+        if drive_queue.queue.running:
+            drive_upload_id = drive_queue.enqueue(db, application.id, doc_bytes, safe_filename).id
         
+        response.headers["Server-Timing"] = timings.server_timing()
+        response.headers["X-Unreplaced-Placeholders"] = str(len(unreplaced))
         return {
             "success": True,
             "filename": safe_filename,
             "downloadUrl": download_url,
-            "size": len(doc_bytes)
+            "size": len(doc_bytes),
+            "unreplacedPlaceholders": len(unreplaced),
+            "driveUploadId": drive_upload_id,
+            "timings": timings.as_dict()
         }
         
     except Exception as e:
-        print(f"[GENERATE] Error: {type(e).__name__}: {e}")
-        traceback.print_exc()
+        generate_log.exception("document generation failed", extra={"application_id": application_id})
         raise HTTPException(status_code=500, detail=f"Error generating document: {str(e)}")
 
 
+@app.get("/api/downloads/{content_hash}")
+def read_download(content_hash: str, name: str, exp: int, sig: str, db: Session = Depends(get_db)):
+    """Serve a stored document via a signed URL from generate-upload (supports Range requests)."""
+    if not downloads_store.verify(content_hash, name, exp, sig):
+        raise HTTPException(status_code=403, detail="Invalid or expired download link")
+    download = downloads_store.get(db, content_hash)
+    if download is None:
+        raise HTTPException(status_code=410, detail="Download is no longer available; generate it again")
+    # The URL names immutable content, so caches may keep it until the link expires
+    max_age = max(exp - int(time.time()), 0)
+    return blob_response(
+        content_hash,
+        name,
+        download.content_type,
+        headers={
+            "Cache-Control": f"public, max-age={max_age}, immutable",
+            "ETag": f'"{content_hash}"',
+        },
+    )
+
+
+def blob_response(content_hash: str, filename: str, content_type: str, headers: dict):
+    """Serve a blob: from disk with Range support, or by redirecting to a presigned bucket URL."""
+    store = blobstore.get_store()
+    key = blobstore.blob_key(content_hash)
+    path = store.local_path(key)
+    if path is not None:
+        return FileResponse(path, media_type=content_type, filename=filename, headers=headers)
+    if store.exists(key):
+        return RedirectResponse(store.presigned_url(key, filename, content_type), status_code=302)
+    raise HTTPException(status_code=410, detail="File is no longer available")
+
+
+@app.get("/api/drive-uploads/{upload_id}", response_model=schemas.DriveUpload)
+def read_drive_upload(
+    upload_id: str,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """Status of a background Google Drive upload started by generate-upload."""
+    upload = crud.get_drive_upload(db, upload_id=upload_id)
+    if upload is None:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    get_readable_application(db, upload.application_id, current_user)
+    return upload
+
+
+@app.get("/api/applications/{application_id}/attachments", response_model=List[schemas.Attachment])
+def read_attachments(
+    application_id: str,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    get_readable_application(db, application_id, current_user)
+    return crud.get_attachments(db, application_id=application_id)
+
+
+@app.post("/api/applications/{application_id}/attachments", response_model=schemas.Attachment)
+async def upload_attachment(
+    application_id: str,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """
+    Upload one file as multipart/form-data (field "file").
+
+    The body is streamed to disk while it is hashed, so large videos do not
+    sit in memory; identical content is stored once. Answers 201 for a new
+    attachment and 200 when this application already has the same file.
+    File and database work runs in the threadpool, never on the event loop.
+    """
+    await run_in_threadpool(authorize_attachment_upload, db, application_id, current_user)
+    try:
+        incoming = await attachments_store.receive(
+            request.stream(), request.headers.get("content-type"), request.headers.get("content-length")
+        )
+    except attachments_store.UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    attachment, created = await run_in_threadpool(store_attachment, db, application_id, incoming)
+    logger.info("attachment uploaded", extra={
+        "application_id": application_id,
+        "attachment_id": attachment.id,
+        "bytes": incoming.size,
+        "new": created,
+    })
+    response.status_code = status.HTTP_201_CREATED if created else status.HTTP_200_OK
+    return attachment
+
+
+def authorize_attachment_upload(db: Session, application_id: str, current_user: models.User):
+    application = crud.get_application(db, application_id=application_id)
+    if application is None:
+        raise HTTPException(status_code=404, detail="Application not found")
+    if application.teacher_id != current_user.id and current_user.role != models.UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Not authorized to update this application")
+
+
+def store_attachment(db: Session, application_id: str, incoming: attachments_store.IncomingFile):
+    try:
+        return crud.create_attachment(db, application_id, incoming)
+    except Exception:
+        incoming.discard()
+        raise
+
+
+@app.get("/api/applications/{application_id}/attachments/{attachment_id}")
+def download_attachment(
+    application_id: str,
+    attachment_id: str,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """Serve an attachment (supports Range requests, so videos can be seeked)."""
+    get_readable_application(db, application_id, current_user)
+    attachment = crud.get_attachment(db, application_id, attachment_id)
+    if attachment is None:
+        raise HTTPException(status_code=404, detail="Attachment not found")
+    return blob_response(
+        attachment.content_hash,
+        attachment.file_name,
+        attachment.file_type,
+        headers={
+            "Cache-Control": "private, max-age=0, must-revalidate",
+            "ETag": f'"{attachment.content_hash}"',
+        },
+    )
+
+
+@app.delete("/api/applications/{application_id}/attachments/{attachment_id}", status_code=204)
+def delete_attachment(
+    application_id: str,
+    attachment_id: str,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    application = crud.get_application(db, application_id=application_id)
+    if application is None:
+        raise HTTPException(status_code=404, detail="Application not found")
+    if application.teacher_id != current_user.id and current_user.role != models.UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Not authorized to update this application")
+    attachment = crud.get_attachment(db, application_id, attachment_id)
+    if attachment is None:
+        raise HTTPException(status_code=404, detail="Attachment not found")
+    crud.delete_attachment(db, attachment)
+    return Response(status_code=204)
+
+
 # =============================================================================
 # AI Assistant API Endpoints
 # =============================================================================
-import ai_assistant
 
 @app.post("/api/ai-assistant/chat")
 async def ai_chat(
@@ -401,7 +870,35 @@ async def ai_check_page(
     return {"response": response}
 
 
+@app.get("/api/metrics")
+def read_metrics(authorization: Optional[str] = Header(None)):
+    """Prometheus text-format metrics; requires 'Bearer <METRICS_TOKEN>' when that is set."""
+    if METRICS_TOKEN and authorization != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return Response(
+        metrics.render(auth_cache.user_cache.stats()),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
 @app.get("/api/health")
 def health_check():
     return {"status": "ok"}
 
+
+@app.get("/api/health/live")
+def liveness(response: Response):
+    """The process is up and serving requests."""
+    response.headers["Cache-Control"] = "no-store"
+    return {"status": "ok"}
+
+
+@app.get("/api/health/ready")
+def readiness(response: Response, db: Session = Depends(get_db)):
+    """503 until warm-up has finished and every dependency probe passes."""
+    result = health.readiness(db, warm_up)
+    response.headers["Cache-Control"] = "no-store"
+    if result["status"] != "ready":
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return result
+
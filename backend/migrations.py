@@ -0,0 +1,216 @@
+"""
+Lightweight schema migrations.
+
+create_all only creates missing tables; this also adds columns that were
+introduced after a table was first created, so existing databases pick up
+new columns without being recreated.
+
+Run as a deploy step before starting the server:
+
+    python migrations.py [--seed-demo]
+
+upgrade() records a fingerprint of the declared schema, so
+upgrade_if_needed() (used by the API when AUTO_MIGRATE is on) costs a single
+query once the database is current.
+"""
+
+import hashlib
+import os
+import sys
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.orm import Session
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+import blobstore
+import models
+import projection
+import search
+import security
+import validation
+from database import Base, SessionLocal, engine as default_engine
+
+SCHEMA_INFO_TABLE = "schema_info"
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _add_missing_columns(connection, table) -> set:
+    """Add declared columns the table lacks; returns the names added."""
+    existing = {column["name"] for column in inspect(connection).get_columns(table.name)}
+    added = set()
+    for column in table.columns:
+        if column.name in existing:
+            continue
+        column_type = column.type.compile(dialect=connection.dialect)
+        ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"
+        if column.server_default is not None:
+            default = column.server_default.arg
+            ddl += f" DEFAULT {getattr(default, 'text', default)}"
+        print(f"[MIGRATE] Adding column {table.name}.{column.name}")
+        connection.execute(text(ddl))
+        added.add(column.name)
+    # Indexes declared on columns added above (or added to the model later)
+    for index in table.indexes:
+        index.create(connection, checkfirst=True)
+    return added
+
+
+def schema_fingerprint(engine=default_engine) -> str:
+    """Hash of the DDL for every declared table, index and the search index, plus the validation rules."""
+    digest = hashlib.sha256()
+    for table in Base.metadata.sorted_tables:
+        digest.update(str(CreateTable(table).compile(dialect=engine.dialect)).encode())
+        for index in sorted(table.indexes, key=lambda i: i.name):
+            digest.update(str(CreateIndex(index).compile(dialect=engine.dialect)).encode())
+    digest.update(repr((search.FTS_TABLE, search.FTS_COLUMNS)).encode())
+    # Changed validation rules revalidate stored results on the next upgrade
+    digest.update(validation.RULES_VERSION.encode())
+    return digest.hexdigest()
+
+
+def _stored_fingerprint(engine):
+    try:
+        with engine.connect() as connection:
+            return connection.execute(
+                text(f"SELECT value FROM {SCHEMA_INFO_TABLE} WHERE key = 'fingerprint'")
+            ).scalar()
+    except (OperationalError, ProgrammingError):
+        return None
+
+
+def is_current(engine=default_engine) -> bool:
+    return _stored_fingerprint(engine) == schema_fingerprint(engine)
+
+
+def _import_legacy_files(engine):
+    """Move files of the old per-feature downloads/attachments directories into the blob store."""
+    legacy_dirs = [
+        os.getenv("DOWNLOADS_DIR", os.path.join(BASE_DIR, "downloads")),
+        os.getenv("ATTACHMENTS_DIR", os.path.join(BASE_DIR, "attachments")),
+    ]
+    if not any(os.path.isdir(directory) for directory in legacy_dirs):
+        return
+    with Session(bind=engine) as db:
+        blobstore.import_legacy_files(db, *legacy_dirs)
+
+
+def _dedupe_attachments(engine):
+    """
+    Remove duplicate (application_id, content_hash) attachments, keeping the
+    oldest, so the unique index on the pair can be created. Blob reference
+    counts are recomputed afterwards.
+    """
+    inspector = inspect(engine)
+    table_name = models.Attachment.__tablename__
+    if not inspector.has_table(table_name) or "content_hash" not in {c["name"] for c in inspector.get_columns(table_name)}:
+        return
+    with Session(bind=engine) as db:
+        seen, duplicates = set(), []
+        for attachment_id, application_id, content_hash in (
+            db.query(models.Attachment.id, models.Attachment.application_id, models.Attachment.content_hash)
+            .filter(models.Attachment.content_hash.isnot(None))
+            .order_by(models.Attachment.uploaded_at, models.Attachment.id)
+        ):
+            if (application_id, content_hash) in seen:
+                duplicates.append(attachment_id)
+            seen.add((application_id, content_hash))
+        if not duplicates:
+            return
+        db.query(models.Attachment).filter(models.Attachment.id.in_(duplicates)).delete(synchronize_session=False)
+        db.commit()
+        if inspector.has_table(models.Blob.__tablename__):
+            blobstore.recount(db)
+    print(f"[MIGRATE] Removed {len(duplicates)} duplicate attachments")
+
+
+def _project_applications(engine):
+    """Fill newly added projected columns for existing applications."""
+    with Session(bind=engine) as db:
+        count = projection.backfill(db)
+    if count:
+        print(f"[MIGRATE] Projected form fields of {count} applications")
+
+
+def _index_applications(engine):
+    """Create the search index, and fill it if applications predate it."""
+    if not search.ensure_index(engine):
+        return
+    with Session(bind=engine) as db:
+        count = search.rebuild(db)
+    print(f"[MIGRATE] Indexed {count} applications for search")
+
+
+def _validate_applications(engine):
+    """Store validation results for applications that have none or were checked with older rules."""
+    with Session(bind=engine) as db:
+        count = validation.backfill(db)
+    if count:
+        print(f"[MIGRATE] Validated {count} applications")
+
+
+def upgrade(engine=default_engine):
+    """Bring the database schema up to date with models.py."""
+    _dedupe_attachments(engine)
+    Base.metadata.create_all(bind=engine)
+    added = {}
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            added[table.name] = _add_missing_columns(connection, table)
+    if added[models.Application.__tablename__] & projection.PROJECTED_FIELDS.keys():
+        _project_applications(engine)
+    _index_applications(engine)
+    _import_legacy_files(engine)
+    _validate_applications(engine)
+    with engine.begin() as connection:
+        connection.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {SCHEMA_INFO_TABLE} (key VARCHAR PRIMARY KEY, value VARCHAR)"
+        ))
+        connection.execute(text(f"DELETE FROM {SCHEMA_INFO_TABLE} WHERE key = 'fingerprint'"))
+        connection.execute(
+            text(f"INSERT INTO {SCHEMA_INFO_TABLE} (key, value) VALUES ('fingerprint', :value)"),
+            {"value": schema_fingerprint(engine)},
+        )
+
+
+def upgrade_if_needed(engine=default_engine) -> bool:
+    """Run upgrade() unless the stored fingerprint says the schema is current."""
+    if is_current(engine):
+        return False
+    upgrade(engine)
+    return True
+
+
+DEMO_USERS = [
+    ("test@example.com", "Demo Teacher", models.UserRole.TEACHER, "資訊工程系"),
+    ("admin@example.com", "Demo Admin", models.UserRole.ADMIN, "教務處"),
+    ("reviewer@example.com", "Demo Reviewer", models.UserRole.REVIEWER, "教學發展中心"),
+]
+
+
+def seed_demo_users(db) -> bool:
+    """Create the demo accounts (password: "password") unless they exist; returns True if created."""
+    if db.query(models.User).filter(models.User.email == DEMO_USERS[0][0]).first():
+        return False
+    for email, name, role, department in DEMO_USERS:
+        db.add(models.User(
+            email=email,
+            hashed_password=security.get_password_hash("password"),
+            name=name,
+            role=role,
+            department=department,
+        ))
+    db.commit()
+    return True
+
+
+if __name__ == "__main__":
+    upgrade()
+    print("[MIGRATE] Schema is up to date.")
+    if "--seed-demo" in sys.argv:
+        session = SessionLocal()
+        try:
+            created = seed_demo_users(session)
+        finally:
+            session.close()
+        print("[MIGRATE] Demo users created." if created else "[MIGRATE] Demo users already exist.")
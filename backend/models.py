@@ -1,8 +1,9 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Enum, Text, JSON
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Enum, Text, JSON, LargeBinary, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
 import uuid
+from datetime import datetime
 from database import Base
 
 class UserRole(str, enum.Enum):
@@ -28,6 +29,13 @@ class ReviewResult(str, enum.Enum):
     MODIFICATION_NEEDED = "MODIFICATION_NEEDED"
     REJECTED = "REJECTED"
 
+class DriveUploadStatus(str, enum.Enum):
+    PENDING = "PENDING"
+    UPLOADING = "UPLOADING"
+    UPLOADED = "UPLOADED"  # file is on Drive, sharing permission not yet set
+    DONE = "DONE"
+    FAILED = "FAILED"
+
 class User(Base):
     __tablename__ = "users"
 
@@ -41,6 +49,7 @@ class User(Base):
 
     applications = relationship("Application", back_populates="teacher")
     reviews = relationship("Review", back_populates="reviewer")
+    refresh_tokens = relationship("RefreshToken", back_populates="user")
 
 class Application(Base):
     __tablename__ = "applications"
@@ -55,22 +64,42 @@ class Application(Base):
     is_moe_certified = Column(Boolean, default=False)
     form_data = Column(JSON, nullable=True)
     video_links = Column(JSON, nullable=True)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    # Projected from form_data on write (see projection.py)
+    academic_year = Column(String, nullable=True, index=True)
+    semester = Column(String, nullable=True)
+    main_department = Column(String, nullable=True, index=True)
+    degree_level = Column(String, nullable=True, index=True)
+    credits = Column(Integer, nullable=True)
+    platform = Column(String, nullable=True)
+    # Form validation result (see validation.py): percent of rules passing, and the full summary
+    completeness = Column(Integer, nullable=True)
+    validation = Column(JSON, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
     teacher = relationship("User", back_populates="applications")
     attachments = relationship("Attachment", back_populates="application")
     reviews = relationship("Review", back_populates="application")
+    revisions = relationship("ApplicationRevision", back_populates="application", order_by="ApplicationRevision.revision")
+
+    __table_args__ = (Index("ix_applications_academic_year_semester", "academic_year", "semester"),)
+    # Optimistic concurrency: every ORM UPDATE checks and bumps the version
+    __mapper_args__ = {"version_id_col": version}
 
 class Attachment(Base):
     __tablename__ = "attachments"
+    # One row per distinct file per application (crud.create_attachment relies on it)
+    __table_args__ = (Index("ix_attachments_application_content", "application_id", "content_hash", unique=True),)
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     application_id = Column(String, ForeignKey("applications.id"))
     file_name = Column(String)
+    # Blob store key (blobstore.blob_key); attachments with the same content share one blob
     file_path = Column(String)
     file_type = Column(String)
     file_size = Column(Integer)
+    content_hash = Column(String, index=True)  # sha256 of the file contents
     uploaded_at = Column(DateTime(timezone=True), server_default=func.now())
 
     application = relationship("Application", back_populates="attachments")
@@ -84,7 +113,88 @@ class Review(Base):
     status = Column(Enum(ReviewStatus), default=ReviewStatus.PENDING)
     result = Column(Enum(ReviewResult), nullable=True)
     comments = Column(Text, nullable=True)
+    assigned_at = Column(DateTime, nullable=True, default=datetime.utcnow)
     submitted_at = Column(DateTime, nullable=True)
 
     application = relationship("Application", back_populates="reviews")
     reviewer = relationship("User", back_populates="reviews")
+
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    user_id = Column(String, ForeignKey("users.id"), index=True)
+    token_hash = Column(String, unique=True, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime)
+    revoked_at = Column(DateTime, nullable=True)
+    replaced_by = Column(String, nullable=True)
+
+    user = relationship("User", back_populates="refresh_tokens")
+
+class ApplicationRevision(Base):
+    __tablename__ = "application_revisions"
+    __table_args__ = (UniqueConstraint("application_id", "revision"),)
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    application_id = Column(String, ForeignKey("applications.id"), index=True)
+    revision = Column(Integer)
+    version = Column(Integer)
+    # Full form_data on snapshot revisions, otherwise a JSON Patch from the previous revision
+    is_snapshot = Column(Boolean, default=False)
+    data = Column(LargeBinary)
+    author_id = Column(String, ForeignKey("users.id"), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    application = relationship("Application", back_populates="revisions")
+
+class StatCounter(Base):
+    __tablename__ = "stat_counters"
+
+    dimension = Column(String, primary_key=True)
+    key = Column(String, primary_key=True)
+    value = Column(Integer, default=0)
+
+class Blob(Base):
+    __tablename__ = "blobs"
+
+    # sha256 of the contents; the blob lives at blobstore.blob_key(content_hash)
+    content_hash = Column(String, primary_key=True)
+    size = Column(Integer)
+    content_type = Column(String)
+    # Attachments and downloads rows pointing at this blob
+    refcount = Column(Integer, default=0, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    # Last reference change; gc() waits a grace period after the count drops to zero
+    updated_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+class Download(Base):
+    __tablename__ = "downloads"
+
+    # sha256 of the file contents; identical documents share one row and file
+    content_hash = Column(String, primary_key=True)
+    size = Column(Integer)
+    content_type = Column(String)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_accessed_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+class DriveUpload(Base):
+    __tablename__ = "drive_uploads"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    application_id = Column(String, ForeignKey("applications.id"), index=True)
+    filename = Column(String)
+    mimetype = Column(String)
+    size = Column(Integer)
+    status = Column(Enum(DriveUploadStatus), default=DriveUploadStatus.PENDING, index=True)
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow)
+    # Resumable session, kept so an interrupted upload continues where it stopped
+    resumable_uri = Column(Text, nullable=True)
+    bytes_sent = Column(Integer, default=0)
+    drive_file_id = Column(String, nullable=True)
+    web_view_link = Column(String, nullable=True)
+    web_content_link = Column(String, nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    completed_at = Column(DateTime, nullable=True)
@@ -0,0 +1,145 @@
+"""
+Placeholder Scanner
+
+Finds {{placeholder}} markers in a .docx by streaming its XML parts
+(document body, headers, footers, foot/endnotes) with iterparse, instead of
+building a python-docx object tree. One pass reports every occurrence with
+its location, so the same scanner serves template extraction
+(word_generator.extract_placeholders) and auditing generated documents for
+placeholders that were left unreplaced.
+
+Word often splits a placeholder over several runs ("{{", "課程", "名稱}}"),
+so text is joined per paragraph before matching; line breaks and tabs are
+kept as "\\n" and "\\t", as in python-docx's Paragraph.text. Keys are
+normalized by collapsing whitespace, the same way fill_template looks them
+up. Paragraphs nested in text boxes are scanned as paragraphs of their own.
+"""
+
+import io
+import re
+import sys
+import zipfile
+from typing import Any, Dict, List, Union
+from xml.etree.ElementTree import iterparse
+
+# Shared with word_generator.fill_template so scanning and filling agree
+PLACEHOLDER_PATTERN = re.compile(r"\{\{(.*?)\}\}", re.DOTALL)
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_P, _T, _TBL, _TR, _TC = _W + "p", _W + "t", _W + "tbl", _W + "tr", _W + "tc"
+_BREAKS = {_W + "br": "\n", _W + "cr": "\n", _W + "tab": "\t"}
+_PART_PATTERN = re.compile(r"word/(document|header\d*|footer\d*|footnotes|endnotes)\.xml$")
+
+
+def normalize_key(raw: str) -> str:
+    """Collapse whitespace (including line breaks) inside a placeholder."""
+    return " ".join(raw.split())
+
+
+def _location(part: str, path: List[List[Any]]) -> str:
+    """Human-readable position, e.g. 'Table 2, Row 3, Cell 1, Para 0'."""
+    labels = []
+    for kind, index in path:
+        if kind == "tbl":
+            labels.append(f"Table {index}")
+        elif kind == "tr":
+            labels.append(f"Row {index}")
+        elif kind == "tc":
+            labels.append(f"Cell {index}")
+        else:
+            labels.append(f"Para {index}" if labels else f"Paragraph {index}")
+    location = ", ".join(labels)
+    return location if part == "word/document.xml" else f"{part}: {location}"
+
+
+def _scan_part(part: str, stream, occurrences: List[Dict[str, Any]]):
+    # Counters of child tables/rows/cells/paragraphs per open container, and
+    # the path of [kind, index] leading to the current element
+    counters: List[Dict[str, int]] = [{}]
+    path: List[List[Any]] = []
+    paragraphs: List[List[str]] = []  # text of each open (possibly nested) paragraph
+    kinds = {_P: "p", _TBL: "tbl", _TR: "tr", _TC: "tc"}
+
+    for event, element in iterparse(stream, events=("start", "end")):
+        tag = element.tag
+        kind = kinds.get(tag)
+        if event == "start":
+            if kind is not None:
+                siblings = counters[-1]
+                index = siblings.get(kind, 0)
+                siblings[kind] = index + 1
+                path.append([kind, index])
+                counters.append({})
+                if kind == "p":
+                    paragraphs.append([])
+            continue
+
+        if tag == _T:
+            if paragraphs and element.text:
+                paragraphs[-1].append(element.text)
+        elif tag in _BREAKS:
+            if paragraphs:
+                paragraphs[-1].append(_BREAKS[tag])
+        elif kind is not None:
+            if kind == "p":
+                text = "".join(paragraphs.pop())
+                if "{{" in text:
+                    location = _location(part, path)
+                    for match in PLACEHOLDER_PATTERN.finditer(text):
+                        occurrences.append({
+                            "key": normalize_key(match.group(1)),
+                            "placeholder": match.group(0),
+                            "part": part,
+                            "location": location,
+                            "context": text[:100] + "..." if len(text) > 100 else text,
+                        })
+            path.pop()
+            counters.pop()
+            if not path:
+                element.clear()
+
+
+def scan(source: Union[str, bytes, Any]) -> List[Dict[str, Any]]:
+    """
+    Every placeholder occurrence in a .docx, in document order.
+
+    source is a path, the document bytes or a binary file object. Each
+    occurrence has key (normalized), placeholder (as written), part
+    (e.g. word/document.xml), location and context (paragraph text).
+    """
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    occurrences: List[Dict[str, Any]] = []
+    with zipfile.ZipFile(source) as archive:
+        names = sorted(name for name in archive.namelist() if _PART_PATTERN.match(name))
+        # Body first, then headers/footers/notes
+        names.sort(key=lambda name: name != "word/document.xml")
+        for name in names:
+            with archive.open(name) as stream:
+                _scan_part(name, stream, occurrences)
+    return occurrences
+
+
+def keys(source) -> List[str]:
+    """Sorted unique normalized keys."""
+    return sorted({occurrence["key"] for occurrence in scan(source)})
+
+
+def counts(source) -> Dict[str, int]:
+    """Normalized key -> number of occurrences."""
+    result: Dict[str, int] = {}
+    for occurrence in scan(source):
+        result[occurrence["key"]] = result.get(occurrence["key"], 0) + 1
+    return result
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(f"Usage: python {sys.argv[0]} file.docx")
+        sys.exit(1)
+    found = scan(sys.argv[1])
+    for i, occurrence in enumerate(found, 1):
+        print(f"{i}. {occurrence['placeholder']}")
+        print(f"   Key: {occurrence['key']}")
+        print(f"   Location: {occurrence['location']}")
+    print(f"\n{len(found)} occurrences, {len({o['key'] for o in found})} unique keys")
@@ -0,0 +1,103 @@
+"""
+Form Data Projection
+
+Copies a declared set of form_data fields into real, indexed columns on
+applications so filters and reports can use index scans instead of decoding
+every row's JSON. apply() runs on every form_data write (see crud.py);
+backfill() fills the columns for rows written before they existed;
+migrations.upgrade() runs it when it adds a projected column.
+
+Backfill existing rows by hand with: python projection.py
+"""
+
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+import models
+
+
+def _text(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _to_int(value: Any) -> Optional[int]:
+    try:
+        return int(str(value).strip())
+    except (TypeError, ValueError):
+        return None
+
+
+def _join_list(value: Any) -> Optional[str]:
+    if isinstance(value, (list, tuple)):
+        return _text(",".join(str(v) for v in value if v))
+    return _text(value)
+
+
+# form_data key -> converter; each key is also the column name on models.Application
+PROJECTED_FIELDS: Dict[str, Callable[[Any], Any]] = {
+    "academic_year": _text,
+    "semester": _text,
+    "main_department": _text,
+    "degree_level": _text,
+    "credits": _to_int,
+    "platform": _join_list,
+}
+
+
+def project(form_data: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Column values extracted from form_data."""
+    form_data = form_data or {}
+    return {field: convert(form_data.get(field)) for field, convert in PROJECTED_FIELDS.items()}
+
+
+def apply(application: models.Application):
+    """Update the projected columns of an application from its form_data."""
+    for field, value in project(application.form_data).items():
+        setattr(application, field, value)
+
+
+def backfill(db: Session, batch_size: int = 500) -> int:
+    """Recompute projected columns for every application; returns rows updated.
+
+    Uses Core UPDATEs so the backfill neither bumps the optimistic-locking
+    version nor touches updated_at.
+    """
+    count = 0
+    last_id = ""
+    while True:
+        rows = (
+            db.query(models.Application.id, models.Application.form_data)
+            .filter(models.Application.id > last_id)
+            .order_by(models.Application.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            break
+        for application_id, form_data in rows:
+            db.execute(
+                update(models.Application)
+                .where(models.Application.id == application_id)
+                .values(updated_at=models.Application.updated_at, **project(form_data))
+            )
+        db.commit()
+        count += len(rows)
+        last_id = rows[-1][0]
+    return count
+
+
+if __name__ == "__main__":
+    import migrations
+    from database import SessionLocal
+
+    migrations.upgrade()
+    session = SessionLocal()
+    try:
+        print(f"[PROJECTION] Backfilled {backfill(session)} applications")
+    finally:
+        session.close()
@@ -0,0 +1,134 @@
+"""
+Form Data Revision History
+
+Every change to Application.form_data appends a row to application_revisions.
+Most rows store a zlib-compressed JSON Patch against the previous revision;
+every SNAPSHOT_INTERVAL-th row stores the full form_data, so reconstructing
+any revision replays at most SNAPSHOT_INTERVAL - 1 diffs.
+"""
+
+import json
+import os
+import zlib
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func, inspect
+from sqlalchemy.orm import Session
+
+import json_patch
+import models
+
+SNAPSHOT_INTERVAL = int(os.getenv("REVISION_SNAPSHOT_INTERVAL", "20"))
+
+
+def _encode(value: Any) -> bytes:
+    return zlib.compress(json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+
+def _decode(data: bytes) -> Any:
+    return json.loads(zlib.decompress(data).decode("utf-8"))
+
+
+def _latest_revision_number(db: Session, application_id: str) -> int:
+    latest = (
+        db.query(func.max(models.ApplicationRevision.revision))
+        .filter(models.ApplicationRevision.application_id == application_id)
+        .scalar()
+    )
+    return latest or 0
+
+
+def record_revision(
+    db: Session,
+    application: models.Application,
+    previous_form_data: Optional[Dict[str, Any]],
+    author_id: Optional[str] = None,
+) -> Optional[models.ApplicationRevision]:
+    """Append a revision for the application's current form_data.
+
+    Must be called before the commit that persists the new form_data, so the
+    revision lands in the same transaction. Returns None if nothing changed.
+    """
+    form_data = application.form_data or {}
+    if previous_form_data is not None and previous_form_data == form_data:
+        return None
+    revision = _latest_revision_number(db, application.id) + 1
+
+    if revision == 1 and previous_form_data is not None:
+        # Application predates revision history: keep its prior state as the base snapshot
+        db.add(models.ApplicationRevision(
+            application_id=application.id,
+            revision=1,
+            version=application.version,
+            is_snapshot=True,
+            data=_encode(previous_form_data),
+        ))
+        revision = 2
+
+    if revision == 1 or (revision - 1) % SNAPSHOT_INTERVAL == 0:
+        is_snapshot, payload = True, form_data
+    else:
+        is_snapshot, payload = False, json_patch.make_patch(previous_form_data or {}, form_data)
+
+    db_revision = models.ApplicationRevision(
+        application_id=application.id,
+        revision=revision,
+        # version_id_col bumps on the pending flush; record the version this write produces
+        version=application.version + 1 if inspect(application).modified else application.version,
+        is_snapshot=is_snapshot,
+        data=_encode(payload),
+        author_id=author_id,
+    )
+    db.add(db_revision)
+    return db_revision
+
+
+def list_revisions(db: Session, application_id: str) -> List[models.ApplicationRevision]:
+    return (
+        db.query(models.ApplicationRevision)
+        .filter(models.ApplicationRevision.application_id == application_id)
+        .order_by(models.ApplicationRevision.revision)
+        .all()
+    )
+
+
+def reconstruct(db: Session, application_id: str, revision: int) -> Optional[Dict[str, Any]]:
+    """Rebuild form_data as of the given revision, or None if it does not exist."""
+    snapshot_revision = (
+        db.query(func.max(models.ApplicationRevision.revision))
+        .filter(
+            models.ApplicationRevision.application_id == application_id,
+            models.ApplicationRevision.is_snapshot.is_(True),
+            models.ApplicationRevision.revision <= revision,
+        )
+        .scalar()
+    )
+    if snapshot_revision is None:
+        return None
+
+    rows = (
+        db.query(models.ApplicationRevision)
+        .filter(
+            models.ApplicationRevision.application_id == application_id,
+            models.ApplicationRevision.revision >= snapshot_revision,
+            models.ApplicationRevision.revision <= revision,
+        )
+        .order_by(models.ApplicationRevision.revision)
+        .all()
+    )
+    if not rows or rows[-1].revision != revision:
+        return None
+
+    form_data = _decode(rows[0].data)
+    for row in rows[1:]:
+        form_data = json_patch.apply_patch(form_data, _decode(row.data))
+    return form_data
+
+
+def diff_revisions(db: Session, application_id: str, from_revision: int, to_revision: int) -> Optional[List[Dict[str, Any]]]:
+    """JSON Patch that turns from_revision into to_revision, or None if either is missing."""
+    source = reconstruct(db, application_id, from_revision)
+    target = reconstruct(db, application_id, to_revision)
+    if source is None or target is None:
+        return None
+    return json_patch.make_patch(source, target)
@@ -1,7 +1,7 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Literal
 from datetime import datetime
-from models import UserRole, ApplicationStatus, ReviewStatus, ReviewResult
+from models import UserRole, ApplicationStatus, ReviewStatus, ReviewResult, DriveUploadStatus
 
 # User Schemas
 class UserBase(BaseModel):
@@ -20,6 +20,10 @@ class User(UserBase):
     class Config:
         orm_mode = True
 
+# Token Schemas
+class TokenRefresh(BaseModel):
+    refresh_token: str
+
 # Attachment Schemas
 class AttachmentBase(BaseModel):
     file_name: str
@@ -29,6 +33,7 @@ class AttachmentBase(BaseModel):
 class Attachment(AttachmentBase):
     id: str
     application_id: str
+    content_hash: Optional[str] = None
     uploaded_at: datetime
 
     class Config:
@@ -43,6 +48,31 @@ class ReviewCreate(ReviewBase):
     reviewer_id: str
     application_id: str
 
+class ReviewAssignment(BaseModel):
+    application_id: str
+    reviewer_id: str
+
+class BulkReviewAssign(BaseModel):
+    """Either explicit assignments, or application_ids distributed by strategy."""
+    application_ids: List[str] = []
+    assignments: Optional[List[ReviewAssignment]] = None
+    strategy: Optional[Literal["round_robin", "least_loaded"]] = None
+    reviewer_ids: Optional[List[str]] = None
+    reviewers_per_application: int = 1
+    exclude_same_department: bool = True
+
+class CreatedReviewAssignment(ReviewAssignment):
+    review_id: str
+
+class SkippedReviewAssignment(BaseModel):
+    application_id: str
+    reviewer_id: Optional[str] = None
+    reason: str
+
+class BulkReviewResult(BaseModel):
+    created: List[CreatedReviewAssignment]
+    skipped: List[SkippedReviewAssignment]
+
 class Review(ReviewBase):
     id: str
     application_id: str
@@ -73,6 +103,14 @@ class Application(ApplicationBase):
     id: str
     teacher_id: str
     status: ApplicationStatus
+    version: int = 1
+    academic_year: Optional[str] = None
+    semester: Optional[str] = None
+    main_department: Optional[str] = None
+    degree_level: Optional[str] = None
+    credits: Optional[int] = None
+    platform: Optional[str] = None
+    completeness: Optional[int] = None
     submission_time: Optional[datetime] = None
     created_at: datetime
     updated_at: Optional[datetime] = None
@@ -82,3 +120,112 @@ class Application(ApplicationBase):
 
     class Config:
         orm_mode = True
+
+class ApplicationPatch(BaseModel):
+    """Partial form_data update: either JSON Patch operations or a merge patch."""
+    version: int
+    operations: Optional[List[Dict[str, Any]]] = None
+    merge: Optional[Dict[str, Any]] = None
+
+class ApplicationVersion(BaseModel):
+    id: str
+    version: int
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        orm_mode = True
+
+class ApplicationRevision(BaseModel):
+    revision: int
+    version: Optional[int] = None
+    is_snapshot: bool
+    author_id: Optional[str] = None
+    created_at: datetime
+
+    class Config:
+        orm_mode = True
+
+class RevisionDiff(BaseModel):
+    from_revision: int
+    to_revision: int
+    operations: List[Dict[str, Any]]
+
+class ApplicationSearchResult(BaseModel):
+    id: str
+    course_name_zh: str
+    course_name_en: Optional[str] = None
+    status: ApplicationStatus
+    teacher_id: str
+    score: float
+
+class ApplicationStatusChange(BaseModel):
+    status: ApplicationStatus
+
+class ValidationIssue(BaseModel):
+    rule: str
+    page: int
+    field: str
+    message: str
+    severity: str = "error"
+
+class ValidationPage(BaseModel):
+    page: int
+    rules: int
+    passed: int
+    errors: int
+    warnings: int = 0
+
+class ValidationResult(BaseModel):
+    """Form validation summary of an application (see validation.py)."""
+    completeness: int
+    complete: bool
+    pages: List[ValidationPage]
+    errors: List[ValidationIssue]
+    # Recommendations; they do not block submission
+    warnings: List[ValidationIssue] = []
+    validated_at: Optional[datetime] = None
+
+class ApplicationSummary(BaseModel):
+    """Application fields needed to list it, without form_data."""
+    id: str
+    course_name_zh: str
+    course_name_en: Optional[str] = None
+    status: ApplicationStatus
+    teacher_name: Optional[str] = None
+    main_department: Optional[str] = None
+    academic_year: Optional[str] = None
+    semester: Optional[str] = None
+    completeness: Optional[int] = None
+    updated_at: Optional[datetime] = None
+
+class ReviewInboxItem(ReviewBase):
+    id: str
+    application_id: str
+    reviewer_id: str
+    status: ReviewStatus
+    assigned_at: Optional[datetime] = None
+    submitted_at: Optional[datetime] = None
+    application: ApplicationSummary
+
+class ReviewInbox(BaseModel):
+    items: List[ReviewInboxItem]
+    total: int
+    skip: int
+    limit: int
+
+class DriveUpload(BaseModel):
+    id: str
+    application_id: str
+    filename: str
+    status: DriveUploadStatus
+    attempts: int = 0
+    size: Optional[int] = None
+    bytes_sent: Optional[int] = None
+    web_view_link: Optional[str] = None
+    web_content_link: Optional[str] = None
+    last_error: Optional[str] = None
+    created_at: datetime
+    completed_at: Optional[datetime] = None
+
+    class Config:
+        orm_mode = True
@@ -0,0 +1,186 @@
+"""
+Full-Text Search over Applications
+
+Maintains an SQLite FTS5 index (application_search) over course names,
+teacher, department, teaching objectives and weekly outline content.
+FTS5's unicode61 tokenizer does not split Chinese text into words, so text
+is pre-tokenized here: CJK runs become overlapping character bigrams and
+other words are lower-cased, both at index and at query time.
+
+On databases without FTS5 the index functions are no-ops and search()
+falls back to a LIKE scan of the course names.
+
+migrations.upgrade() builds the index when it is created on a database that
+already has applications. Rebuild the whole index with: python search.py --rebuild
+"""
+
+import hashlib
+import re
+import sys
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import or_, text
+from sqlalchemy.orm import Session
+
+import models
+
+FTS_TABLE = "application_search"
+# Column weights for bm25(), in FTS column order (application_id is unindexed)
+FTS_COLUMNS = ("course_name", "teacher", "department", "objectives", "outline")
+FTS_WEIGHTS = (0.0, 10.0, 4.0, 3.0, 2.0, 1.0)
+
+_CJK = "\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\u3040-\u30ff\uac00-\ud7af"
+_TOKEN_RE = re.compile(f"([{_CJK}]+)|([^\\W{_CJK}]+)")
+
+
+def _is_sqlite(bind) -> bool:
+    return bind.dialect.name == "sqlite"
+
+
+def _doc_id(application_id: str) -> int:
+    # Stable 56-bit rowid per application, so updates hit the rowid index instead
+    # of scanning the unindexed application_id column
+    return int.from_bytes(hashlib.blake2b(application_id.encode(), digest_size=7).digest(), "big")
+
+
+def ensure_index(engine) -> bool:
+    """Create the FTS5 table if the database supports it.
+
+    Returns True when the index is empty but applications exist (it was just
+    created on a database with data), i.e. it needs a rebuild().
+    """
+    if not _is_sqlite(engine):
+        return False
+    with engine.begin() as connection:
+        connection.execute(text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            f"application_id UNINDEXED, {', '.join(FTS_COLUMNS)}, tokenize='unicode61')"
+        ))
+        if connection.execute(text(f"SELECT 1 FROM {FTS_TABLE} LIMIT 1")).first():
+            return False
+        return connection.execute(text(f"SELECT 1 FROM {models.Application.__tablename__} LIMIT 1")).first() is not None
+
+
+def tokenize(value: Optional[str]) -> List[str]:
+    """Split text into index terms: CJK character bigrams and lower-cased words."""
+    tokens = []
+    for cjk, word in _TOKEN_RE.findall(value or ""):
+        if cjk:
+            if len(cjk) == 1:
+                tokens.append(cjk)
+            else:
+                tokens.extend(cjk[i:i + 2] for i in range(len(cjk) - 1))
+        else:
+            tokens.append(word.lower())
+    return tokens
+
+
+def _document(application: models.Application) -> Dict[str, str]:
+    form_data = application.form_data or {}
+    weeks = form_data.get("course_outline_weeks") or []
+    teacher_name = form_data.get("teacher_name") or (application.teacher.name if application.teacher else "")
+    fields = {
+        "course_name": " ".join(filter(None, [
+            application.course_name_zh, application.course_name_en, application.permanent_course_id,
+        ])),
+        "teacher": teacher_name,
+        "department": " ".join(filter(None, [form_data.get("main_department"), form_data.get("co_department")])),
+        "objectives": form_data.get("teaching_objectives") or "",
+        "outline": " ".join(str(week.get("content") or "") for week in weeks if isinstance(week, dict)),
+    }
+    return {name: " ".join(tokenize(value)) for name, value in fields.items()}
+
+
+def index_application(db: Session, application: models.Application):
+    """(Re)index one application inside the caller's transaction."""
+    if not _is_sqlite(db.get_bind()):
+        return
+    doc_id = _doc_id(application.id)
+    db.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :doc_id"), {"doc_id": doc_id})
+    document = _document(application)
+    db.execute(
+        text(
+            f"INSERT INTO {FTS_TABLE} (rowid, application_id, {', '.join(FTS_COLUMNS)}) "
+            f"VALUES (:doc_id, :application_id, {', '.join(':' + c for c in FTS_COLUMNS)})"
+        ),
+        {"doc_id": doc_id, "application_id": application.id, **document},
+    )
+
+
+def remove_application(db: Session, application_id: str):
+    if _is_sqlite(db.get_bind()):
+        db.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :doc_id"), {"doc_id": _doc_id(application_id)})
+
+
+def _match_expression(query: str) -> str:
+    terms = []
+    for token in tokenize(query):
+        quoted = '"' + token.replace('"', '""') + '"'
+        # A lone CJK character should also match the bigrams that start with it
+        terms.append(quoted + "*" if len(token) == 1 else quoted)
+    return " ".join(terms)
+
+
+def search(db: Session, query: str, limit: int = 20, teacher_id: str = None) -> List[Dict[str, Any]]:
+    """Return applications matching query, best match first."""
+    if not _is_sqlite(db.get_bind()):
+        return _search_fallback(db, query, limit, teacher_id)
+
+    expression = _match_expression(query)
+    if not expression:
+        return []
+    weights = ", ".join(str(w) for w in FTS_WEIGHTS)
+    sql = (
+        f"SELECT a.id, a.course_name_zh, a.course_name_en, a.status, a.teacher_id, "
+        f"bm25({FTS_TABLE}, {weights}) AS rank "
+        f"FROM {FTS_TABLE} JOIN applications a ON a.id = {FTS_TABLE}.application_id "
+        f"WHERE {FTS_TABLE} MATCH :expression"
+    )
+    params = {"expression": expression, "limit": limit}
+    if teacher_id:
+        sql += " AND a.teacher_id = :teacher_id"
+        params["teacher_id"] = teacher_id
+    sql += " ORDER BY rank LIMIT :limit"
+    rows = db.execute(text(sql), params).mappings().all()
+    # bm25 scores are negative; flip them so that higher means more relevant
+    return [{**row, "score": -row["rank"]} for row in rows]
+
+
+def _search_fallback(db: Session, query: str, limit: int, teacher_id: str = None) -> List[Dict[str, Any]]:
+    pattern = f"%{query}%"
+    rows = db.query(models.Application).filter(
+        or_(models.Application.course_name_zh.ilike(pattern), models.Application.course_name_en.ilike(pattern))
+    )
+    if teacher_id:
+        rows = rows.filter(models.Application.teacher_id == teacher_id)
+    return [
+        {
+            "id": a.id, "course_name_zh": a.course_name_zh, "course_name_en": a.course_name_en,
+            "status": a.status, "teacher_id": a.teacher_id, "score": 1.0,
+        }
+        for a in rows.limit(limit).all()
+    ]
+
+
+def rebuild(db: Session) -> int:
+    """Reindex every application; returns the number indexed."""
+    count = 0
+    for application in db.query(models.Application).all():
+        index_application(db, application)
+        count += 1
+    db.commit()
+    return count
+
+
+if __name__ == "__main__":
+    from database import SessionLocal, engine
+
+    if "--rebuild" not in sys.argv:
+        print(__doc__)
+        sys.exit(0)
+    ensure_index(engine)
+    session = SessionLocal()
+    try:
+        print(f"[SEARCH] Indexed {rebuild(session)} applications")
+    finally:
+        session.close()
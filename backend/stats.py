@@ -0,0 +1,195 @@
+"""
+Admin Statistics
+
+Counters for the admin dashboard are kept in the stat_counters table and
+updated in the same transaction as every application write, status
+transition and review change, so reading them costs one small query no
+matter how many applications exist. reconcile() recomputes everything from
+the source tables to repair any drift.
+
+Recompute counters with: python stats.py --reconcile
+"""
+
+import sys
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+import models
+
+# Dimensions tracked per application
+STATUS = "status"
+DEPARTMENT = "department"
+SEMESTER = "semester"
+# Dimensions tracked per review
+REVIEWER_PENDING = "reviewer_pending"
+REVIEWER_COMPLETED = "reviewer_completed"
+TURNAROUND = "turnaround"
+TURNAROUND_SECONDS = "total_seconds"
+TURNAROUND_COUNT = "completed_reviews"
+
+
+def _bump(db: Session, dimension: str, key: str, delta: int):
+    if not delta:
+        return
+    updated = (
+        db.query(models.StatCounter)
+        .filter(models.StatCounter.dimension == dimension, models.StatCounter.key == key)
+        .update({models.StatCounter.value: models.StatCounter.value + delta}, synchronize_session=False)
+    )
+    if not updated:
+        db.add(models.StatCounter(dimension=dimension, key=key, value=delta))
+        db.flush()
+
+
+def _semester_key(academic_year: Optional[str], semester: Optional[str]) -> str:
+    return f"{academic_year or ''}-{semester or ''}".strip("-")
+
+
+def application_dims(application: models.Application) -> List[Tuple[str, str]]:
+    """The (dimension, key) pairs an application is counted under."""
+    status = application.status or models.ApplicationStatus.DRAFT
+    return [
+        (STATUS, status.value if isinstance(status, models.ApplicationStatus) else str(status)),
+        (DEPARTMENT, application.main_department or ""),
+        (SEMESTER, _semester_key(application.academic_year, application.semester)),
+    ]
+
+
+def track_application(db: Session, before: Optional[Iterable[Tuple[str, str]]], application: models.Application):
+    """Move an application's counts from its previous dims (None if new) to its current ones."""
+    before = list(before or [])
+    after = application_dims(application)
+    for dim in before:
+        if dim not in after:
+            _bump(db, dim[0], dim[1], -1)
+    for dim in after:
+        if dim not in before:
+            _bump(db, dim[0], dim[1], 1)
+
+
+def track_status_change(db: Session, old_status: models.ApplicationStatus, new_status: models.ApplicationStatus, count: int = 1):
+    """Move count applications between status buckets (for bulk status UPDATEs)."""
+    if old_status == new_status:
+        return
+    _bump(db, STATUS, (old_status or models.ApplicationStatus.DRAFT).value, -count)
+    _bump(db, STATUS, new_status.value, count)
+
+
+def track_reviews_assigned(db: Session, reviewer_id: str, count: int = 1):
+    _bump(db, REVIEWER_PENDING, reviewer_id, count)
+
+
+def track_review_completed(db: Session, review: models.Review):
+    """Count a review's first completion; call before committing the COMPLETED status."""
+    _bump(db, REVIEWER_PENDING, review.reviewer_id, -1)
+    _bump(db, REVIEWER_COMPLETED, review.reviewer_id, 1)
+    if review.assigned_at and review.submitted_at:
+        seconds = int((review.submitted_at - review.assigned_at).total_seconds())
+        _bump(db, TURNAROUND, TURNAROUND_SECONDS, max(seconds, 0))
+        _bump(db, TURNAROUND, TURNAROUND_COUNT, 1)
+
+
+def get_stats(db: Session) -> Dict[str, Any]:
+    """Assemble dashboard statistics from the counter table."""
+    counters: Dict[str, Dict[str, int]] = {}
+    for row in db.query(models.StatCounter).all():
+        if row.value:
+            counters.setdefault(row.dimension, {})[row.key] = row.value
+
+    reviewer_ids = set(counters.get(REVIEWER_PENDING, {})) | set(counters.get(REVIEWER_COMPLETED, {}))
+    names = dict(
+        db.query(models.User.id, models.User.name).filter(models.User.id.in_(reviewer_ids)).all()
+    ) if reviewer_ids else {}
+    workload = [
+        {
+            "reviewer_id": reviewer_id,
+            "reviewer_name": names.get(reviewer_id),
+            "pending": counters.get(REVIEWER_PENDING, {}).get(reviewer_id, 0),
+            "completed": counters.get(REVIEWER_COMPLETED, {}).get(reviewer_id, 0),
+        }
+        for reviewer_id in sorted(reviewer_ids)
+    ]
+
+    turnaround = counters.get(TURNAROUND, {})
+    completed = turnaround.get(TURNAROUND_COUNT, 0)
+    by_status = counters.get(STATUS, {})
+    return {
+        "total_applications": sum(by_status.values()),
+        "by_status": by_status,
+        "by_department": counters.get(DEPARTMENT, {}),
+        "by_semester": counters.get(SEMESTER, {}),
+        "reviewer_workload": workload,
+        "average_review_turnaround_hours": (
+            round(turnaround.get(TURNAROUND_SECONDS, 0) / completed / 3600, 2) if completed else None
+        ),
+    }
+
+
+def reconcile(db: Session):
+    """Rebuild every counter from the applications and reviews tables."""
+    db.query(models.StatCounter).delete(synchronize_session=False)
+
+    rows = (
+        db.query(
+            models.Application.status, models.Application.main_department,
+            models.Application.academic_year, models.Application.semester, func.count(),
+        )
+        .group_by(
+            models.Application.status, models.Application.main_department,
+            models.Application.academic_year, models.Application.semester,
+        )
+        .all()
+    )
+    totals: Dict[Tuple[str, str], int] = {}
+    for status, department, academic_year, semester, count in rows:
+        status = status or models.ApplicationStatus.DRAFT
+        for dim in [(STATUS, status.value), (DEPARTMENT, department or ""), (SEMESTER, _semester_key(academic_year, semester))]:
+            totals[dim] = totals.get(dim, 0) + count
+
+    for reviewer_id, review_status, count in (
+        db.query(models.Review.reviewer_id, models.Review.status, func.count())
+        .group_by(models.Review.reviewer_id, models.Review.status)
+        .all()
+    ):
+        dimension = REVIEWER_COMPLETED if review_status == models.ReviewStatus.COMPLETED else REVIEWER_PENDING
+        totals[(dimension, reviewer_id)] = totals.get((dimension, reviewer_id), 0) + count
+
+    total_seconds, completed = 0, 0
+    for assigned_at, submitted_at in (
+        db.query(models.Review.assigned_at, models.Review.submitted_at)
+        .filter(models.Review.assigned_at.isnot(None), models.Review.submitted_at.isnot(None))
+        .all()
+    ):
+        total_seconds += max(int((submitted_at - assigned_at).total_seconds()), 0)
+        completed += 1
+    totals[(TURNAROUND, TURNAROUND_SECONDS)] = total_seconds
+    totals[(TURNAROUND, TURNAROUND_COUNT)] = completed
+
+    db.add_all(models.StatCounter(dimension=d, key=k, value=v) for (d, k), v in totals.items())
+    db.commit()
+
+
+def ensure_initialized(db: Session):
+    """Reconcile once if the counters have never been populated."""
+    if db.query(models.StatCounter).first() is None:
+        reconcile(db)
+
+
+if __name__ == "__main__":
+    import migrations
+    from database import SessionLocal
+
+    if "--reconcile" not in sys.argv:
+        print(__doc__)
+        sys.exit(0)
+    migrations.upgrade()
+    session = SessionLocal()
+    try:
+        started = datetime.utcnow()
+        reconcile(session)
+        print(f"[STATS] Reconciled counters in {(datetime.utcnow() - started).total_seconds():.2f}s")
+    finally:
+        session.close()
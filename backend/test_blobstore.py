@@ -0,0 +1,180 @@
+"""
+Tests for the blob store, run against both backends (LocalBlobStore and
+S3BlobStore over LocalS3Client) and a scratch SQLite database.
+
+Usage:
+    python -m pytest test_blobstore.py
+    python test_blobstore.py
+"""
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import blobstore
+import models
+
+DATA = os.urandom(50_000)
+HASH = hashlib.sha256(DATA).hexdigest()
+KEY = blobstore.blob_key(HASH)
+NO_GRACE = timedelta(0)
+
+
+class Scratch:
+    """A temporary database and blob store of the given backend ("local" or "s3-local")."""
+
+    def __init__(self, backend: str):
+        self.root = tempfile.mkdtemp(prefix="blobstore-test-")
+        engine = create_engine(f"sqlite:///{os.path.join(self.root, 'test.db')}")
+        models.Base.metadata.create_all(engine)
+        self.Session = sessionmaker(bind=engine)
+        self.blobstore_dir = blobstore.BLOBSTORE_DIR
+        blobstore.BLOBSTORE_DIR = os.path.join(self.root, "blobs")
+        if backend == "s3-local":
+            client = blobstore.LocalS3Client(os.path.join(self.root, "s3"))
+            self.store = blobstore.S3BlobStore(client, "bucket")
+        else:
+            self.store = blobstore.LocalBlobStore(blobstore.BLOBSTORE_DIR)
+        self.previous_store = blobstore._store
+        blobstore.set_store(self.store)
+
+    def close(self):
+        blobstore.set_store(self.previous_store)
+        blobstore.BLOBSTORE_DIR = self.blobstore_dir
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def put(self, data: bytes = DATA):
+        db = self.Session()
+        try:
+            blobstore.put_bytes(db, data, "application/octet-stream")
+            db.commit()
+        finally:
+            db.close()
+
+    def release(self):
+        db = self.Session()
+        try:
+            blobstore.release(db, HASH)
+            db.commit()
+        finally:
+            db.close()
+
+    def gc(self) -> int:
+        db = self.Session()
+        try:
+            return blobstore.gc(db, grace=NO_GRACE)
+        finally:
+            db.close()
+
+    def refcount(self):
+        db = self.Session()
+        try:
+            blob = db.get(models.Blob, HASH)
+            return None if blob is None else blob.refcount
+        finally:
+            db.close()
+
+    def read(self) -> bytes:
+        with self.store.open(KEY) as f:
+            return f.read()
+
+
+def backends(test):
+    def run():
+        for backend in ("local", "s3-local"):
+            scratch = Scratch(backend)
+            try:
+                test(scratch)
+            finally:
+                scratch.close()
+    run.__name__ = test.__name__
+    return run
+
+
+@backends
+def test_put_and_read(scratch):
+    scratch.put()
+    assert scratch.store.exists(KEY)
+    assert scratch.read() == DATA
+    assert scratch.refcount() == 1
+    # Spool files are consumed
+    assert os.listdir(scratch.store.temp_dir) == []
+
+
+@backends
+def test_same_content_is_stored_once(scratch):
+    scratch.put()
+    scratch.put()
+    assert scratch.refcount() == 2
+    assert [key for key, _ in scratch.store.keys()] == [KEY]
+
+
+@backends
+def test_gc_keeps_referenced_blobs(scratch):
+    scratch.put()
+    scratch.put()
+    scratch.release()
+    assert scratch.gc() == 0
+    assert scratch.store.exists(KEY)
+
+    scratch.release()
+    assert scratch.refcount() == 0
+    assert scratch.gc() == 1
+    assert scratch.refcount() is None
+    assert not scratch.store.exists(KEY)
+
+
+@backends
+def test_gc_honours_grace(scratch):
+    scratch.put()
+    scratch.release()
+    db = scratch.Session()
+    try:
+        assert blobstore.gc(db, grace=timedelta(hours=1)) == 0
+    finally:
+        db.close()
+    assert scratch.store.exists(KEY)
+
+
+@backends
+def test_gc_removes_stray_files(scratch):
+    scratch.store.put_bytes(KEY, DATA)
+    assert scratch.gc() == 1
+    assert not scratch.store.exists(KEY)
+
+
+@backends
+def test_new_row_rewrites_leftover_file(scratch):
+    # gc() removed the row but has not deleted the file yet: the upload that
+    # re-creates the row must write its own bytes, not reuse a file about to go
+    scratch.store.put_bytes(KEY, b"left behind")
+    scratch.put()
+    assert scratch.refcount() == 1
+    assert scratch.read() == DATA
+
+
+@backends
+def test_recount(scratch):
+    scratch.put()
+    db = scratch.Session()
+    try:
+        db.get(models.Blob, HASH).refcount = 5
+        db.commit()
+        assert blobstore.recount(db) == 1
+    finally:
+        db.close()
+    assert scratch.refcount() == 0
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"{name}: ok")
@@ -0,0 +1,169 @@
+"""
+Tests for the Drive upload queue, run against FakeDrive and a scratch SQLite database.
+
+Usage:
+    python -m pytest test_drive_queue.py
+    python test_drive_queue.py
+"""
+import os
+import shutil
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import drive_queue
+import drive_upload
+import models
+
+Status = models.DriveUploadStatus
+DATA = os.urandom(100_000)
+
+
+class Scratch:
+    """A temporary database, spool directory and FakeDrive root."""
+
+    def __init__(self, **fake_options):
+        self.root = tempfile.mkdtemp(prefix="drive-queue-test-")
+        engine = create_engine(f"sqlite:///{os.path.join(self.root, 'test.db')}")
+        models.Base.metadata.create_all(engine)
+        self.Session = sessionmaker(bind=engine)
+        self.spool_dir = drive_queue.SPOOL_DIR
+        drive_queue.SPOOL_DIR = os.path.join(self.root, "spool")
+        self.drive = drive_upload.FakeDrive(root=os.path.join(self.root, "drive"), chunk_size=16_384, **fake_options)
+
+    def close(self):
+        drive_queue.SPOOL_DIR = self.spool_dir
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def enqueue(self) -> str:
+        db = self.Session()
+        try:
+            return drive_queue.enqueue(db, "app-1", DATA, "course.docx").id
+        finally:
+            db.close()
+
+    def get(self, upload_id: str) -> models.DriveUpload:
+        db = self.Session()
+        try:
+            return db.get(models.DriveUpload, upload_id)
+        finally:
+            db.close()
+
+    def make_due(self, upload_id: str):
+        db = self.Session()
+        try:
+            db.get(models.DriveUpload, upload_id).next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+            db.commit()
+        finally:
+            db.close()
+
+    def process(self) -> int:
+        db = self.Session()
+        try:
+            return drive_queue.process_batch(db, self.drive)
+        finally:
+            db.close()
+
+    def claim(self):
+        db = self.Session()
+        try:
+            return [upload.id for upload in drive_queue._claim(db, 10)]
+        finally:
+            db.close()
+
+    def uploaded_bytes(self, upload: models.DriveUpload) -> bytes:
+        with open(os.path.join(self.drive.root, upload.drive_file_id), "rb") as f:
+            return f.read()
+
+
+def test_upload_and_share():
+    scratch = Scratch()
+    try:
+        upload_id = scratch.enqueue()
+        assert scratch.process() == 1
+        upload = scratch.get(upload_id)
+        assert upload.status == Status.DONE
+        assert scratch.uploaded_bytes(upload) == DATA
+        assert scratch.drive.share_batches == 1
+        assert not os.path.exists(drive_queue.spool_path(upload_id))
+    finally:
+        scratch.close()
+
+
+def test_failed_chunk_backs_off_and_resumes():
+    scratch = Scratch(fail_chunks=1)
+    try:
+        upload_id = scratch.enqueue()
+        scratch.process()
+        upload = scratch.get(upload_id)
+        assert upload.status == Status.PENDING
+        assert upload.attempts == 1
+        assert upload.next_attempt_at > datetime.utcnow()
+        # Not due yet
+        assert scratch.process() == 0
+
+        scratch.make_due(upload_id)
+        scratch.process()
+        upload = scratch.get(upload_id)
+        assert upload.status == Status.DONE
+        assert scratch.uploaded_bytes(upload) == DATA
+    finally:
+        scratch.close()
+
+
+def test_job_is_claimed_once():
+    scratch = Scratch()
+    try:
+        upload_id = scratch.enqueue()
+        assert scratch.claim() == [upload_id]
+        assert scratch.claim() == []
+
+        # Uploaded but not yet shared: still leased to the first worker
+        db = scratch.Session()
+        upload = db.get(models.DriveUpload, upload_id)
+        assert drive_queue._upload(db, scratch.drive, upload)
+        db.close()
+        assert scratch.get(upload_id).status == Status.UPLOADED
+        assert scratch.claim() == []
+    finally:
+        scratch.close()
+
+
+def test_expired_lease_is_taken_over():
+    scratch = Scratch()
+    try:
+        upload_id = scratch.enqueue()
+        # A worker sends part of the file, then dies
+        db = scratch.Session()
+        upload = drive_queue._claim(db, 10)[0]
+        session = scratch.drive.open_upload(drive_queue.spool_path(upload_id), upload.filename, upload.mimetype)
+        session.next_chunk()
+        upload.resumable_uri = session.resumable_uri
+        upload.bytes_sent = session.progress
+        db.commit()
+        db.close()
+        assert scratch.get(upload_id).status == Status.UPLOADING
+        assert scratch.process() == 0
+
+        scratch.make_due(upload_id)
+        calls_before = scratch.drive.chunk_calls
+        assert scratch.process() == 1
+        upload = scratch.get(upload_id)
+        assert upload.status == Status.DONE
+        assert scratch.uploaded_bytes(upload) == DATA
+        # Resumed the session instead of starting over
+        assert scratch.drive.chunk_calls - calls_before == -(-len(DATA) // scratch.drive.chunk_size) - 1
+    finally:
+        scratch.close()
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"{name}: ok")
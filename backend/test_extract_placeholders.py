@@ -1,78 +1,13 @@
 """
 Test script to extract all {{placeholder}} from template.docx
-This will show all placeholders found in the template and compare with what the code is processing.
+This will show all placeholders found in the template, where they are, and
+how often each one occurs.
 """
-from docx import Document
-import re
 import os
 
-TEMPLATE_PATH = os.path.join(os.path.dirname(__file__), "resources", "template.docx")
-
-def extract_placeholders_from_paragraphs(doc):
-    """Extract placeholders from all paragraphs."""
-    placeholders = []
-    for para in doc.paragraphs:
-        text = para.text
-        matches = re.findall(r'\{\{([^}]+)\}\}', text)
-        placeholders.extend(matches)
-    return placeholders
-
-def extract_placeholders_from_tables(doc):
-    """Extract placeholders from all tables."""
-    placeholders = []
-    for table in doc.tables:
-        for row in table.rows:
-            for cell in row.cells:
-                for para in cell.paragraphs:
-                    text = para.text
-                    matches = re.findall(r'\{\{([^}]+)\}\}', text)
-                    placeholders.extend(matches)
-    return placeholders
+import placeholder_scanner
 
-def extract_placeholders_from_nested_tables(doc):
-    """Extract placeholders from nested tables (tables inside tables)."""
-    placeholders = []
-    
-    def scan_cell_tables(cell):
-        """Recursively scan for tables inside a cell."""
-        found = []
-        for nested_table in cell.tables:
-            for row in nested_table.rows:
-                for nested_cell in row.cells:
-                    for para in nested_cell.paragraphs:
-                        text = para.text
-                        matches = re.findall(r'\{\{([^}]+)\}\}', text)
-                        found.extend(matches)
-                    # Recursively check for more nested tables
-                    found.extend(scan_cell_tables(nested_cell))
-        return found
-    
-    for table in doc.tables:
-        for row in table.rows:
-            for cell in row.cells:
-                placeholders.extend(scan_cell_tables(cell))
-    
-    return placeholders
-
-def extract_all_text_runs(doc):
-    """Extract placeholders by examining individual text runs (handles split placeholders)."""
-    all_text = ""
-    
-    # From paragraphs
-    for para in doc.paragraphs:
-        for run in para.runs:
-            all_text += run.text
-    
-    # From tables
-    for table in doc.tables:
-        for row in table.rows:
-            for cell in row.cells:
-                for para in cell.paragraphs:
-                    for run in para.runs:
-                        all_text += run.text
-    
-    matches = re.findall(r'\{\{([^}]+)\}\}', all_text)
-    return matches
+TEMPLATE_PATH = os.path.join(os.path.dirname(__file__), "resources", "template.docx")
 
 def main():
     print("=" * 60)
@@ -84,43 +19,25 @@ def main():
         print(f"ERROR: Template not found at {TEMPLATE_PATH}")
         return
     
-    doc = Document(TEMPLATE_PATH)
-    
-    # Extract from different sources
-    print("\n" + "-" * 40)
-    print("1. Placeholders from PARAGRAPHS:")
-    print("-" * 40)
-    para_placeholders = extract_placeholders_from_paragraphs(doc)
-    for i, p in enumerate(para_placeholders, 1):
-        print(f"  {i}. {{{{{p}}}}}")
-    print(f"  Total: {len(para_placeholders)}")
-    
-    print("\n" + "-" * 40)
-    print("2. Placeholders from TABLES:")
-    print("-" * 40)
-    table_placeholders = extract_placeholders_from_tables(doc)
-    for i, p in enumerate(table_placeholders, 1):
-        print(f"  {i}. {{{{{p}}}}}")
-    print(f"  Total: {len(table_placeholders)}")
+    occurrences = placeholder_scanner.scan(TEMPLATE_PATH)
     
     print("\n" + "-" * 40)
-    print("3. Placeholders from NESTED TABLES:")
+    print("1. Placeholders by LOCATION:")
     print("-" * 40)
-    nested_placeholders = extract_placeholders_from_nested_tables(doc)
-    for i, p in enumerate(nested_placeholders, 1):
-        print(f"  {i}. {{{{{p}}}}}")
-    print(f"  Total: {len(nested_placeholders)}")
+    for i, occurrence in enumerate(occurrences, 1):
+        print(f"  {i}. [{occurrence['location']}] {occurrence['placeholder']}")
+    print(f"  Total: {len(occurrences)}")
     
-    # Combine all unique
-    all_placeholders = set(para_placeholders + table_placeholders + nested_placeholders)
+    counts = placeholder_scanner.counts(TEMPLATE_PATH)
     
     print("\n" + "=" * 60)
-    print("SUMMARY - All Unique Placeholders:")
+    print("SUMMARY - All Unique Placeholders (normalized):")
     print("=" * 60)
-    sorted_placeholders = sorted(all_placeholders)
+    sorted_placeholders = sorted(counts)
     for i, p in enumerate(sorted_placeholders, 1):
-        print(f"  {i}. {{{{{p}}}}}")
-    print(f"\n  TOTAL UNIQUE: {len(all_placeholders)}")
+        repeat = f"  (x{counts[p]})" if counts[p] > 1 else ""
+        print(f"  {i}. {{{{{p}}}}}{repeat}")
+    print(f"\n  TOTAL UNIQUE: {len(counts)}")
     
     # Save to file
     output_file = os.path.join(os.path.dirname(__file__), "extracted_placeholders.txt")
@@ -129,7 +46,7 @@ def main():
         f.write("=" * 50 + "\n\n")
         for i, p in enumerate(sorted_placeholders, 1):
             f.write(f"{i}. {{{{{p}}}}}\n")
-        f.write(f"\nTotal: {len(all_placeholders)}\n")
+        f.write(f"\nTotal: {len(counts)}\n")
     print(f"\nSaved to: {output_file}")
 
 if __name__ == "__main__":
@@ -0,0 +1,101 @@
+"""
+Tests for migrations.upgrade() on a database written by an older version.
+
+Usage:
+    python -m pytest test_migrations.py
+    python test_migrations.py
+"""
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.orm import Session
+
+import migrations
+import models
+import projection
+import search
+
+FORM_DATA = {
+    "course_name_zh": "遠距教學設計",
+    "teaching_objectives": "培養自主學習能力",
+    "main_department": "資訊工程學系",
+    "credits": "3",
+}
+
+
+class Scratch:
+    """A temporary database holding one application written before the upgrade."""
+
+    def __init__(self):
+        self.root = tempfile.mkdtemp(prefix="migrations-test-")
+        self.environ = {key: os.environ.get(key) for key in ("DOWNLOADS_DIR", "ATTACHMENTS_DIR")}
+        os.environ["DOWNLOADS_DIR"] = os.path.join(self.root, "downloads")
+        os.environ["ATTACHMENTS_DIR"] = os.path.join(self.root, "attachments")
+        self.engine = create_engine(f"sqlite:///{os.path.join(self.root, 'test.db')}")
+        models.Base.metadata.create_all(self.engine)
+        with self.engine.begin() as connection:
+            connection.execute(insert(models.Application).values(
+                id="app-1", course_name_zh=FORM_DATA["course_name_zh"], form_data=FORM_DATA,
+                status=models.ApplicationStatus.DRAFT, version=1,
+            ))
+
+    def drop_columns(self, names):
+        """Remove columns (and their indexes) to get the schema of an older version."""
+        table = models.Application.__table__
+        with self.engine.begin() as connection:
+            for index in table.indexes:
+                if {column.name for column in index.columns} & set(names):
+                    connection.execute(text(f"DROP INDEX {index.name}"))
+            for name in names:
+                connection.execute(text(f"ALTER TABLE {table.name} DROP COLUMN {name}"))
+
+    def close(self):
+        self.engine.dispose()
+        for key, value in self.environ.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def search(self, query: str) -> list:
+        with Session(bind=self.engine) as db:
+            return [row["id"] for row in search.search(db, query)]
+
+
+def test_existing_applications_are_searchable():
+    scratch = Scratch()
+    try:
+        migrations.upgrade(scratch.engine)
+        assert scratch.search("教學設計") == ["app-1"]
+        assert scratch.search("自主學習") == ["app-1"]
+        # A second upgrade leaves the filled index alone
+        assert not search.ensure_index(scratch.engine)
+    finally:
+        scratch.close()
+
+
+def test_added_projected_columns_are_backfilled():
+    scratch = Scratch()
+    try:
+        scratch.drop_columns(list(projection.PROJECTED_FIELDS))
+        migrations.upgrade(scratch.engine)
+        with Session(bind=scratch.engine) as db:
+            application = db.get(models.Application, "app-1")
+            assert application.main_department == "資訊工程學系"
+            assert application.credits == 3
+            assert db.query(models.Application.id).filter(models.Application.credits == 3).all() == [("app-1",)]
+    finally:
+        scratch.close()
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"{name}: ok")
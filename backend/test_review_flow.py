@@ -15,8 +15,10 @@ def test_flow():
     # 2. Get Applications
     print("Fetching applications...")
     apps = requests.get(f"{BASE_URL}/applications/", headers=headers_admin).json()
+    # Drafts must be submitted before reviewers can be assigned
+    apps = [a for a in apps if a["status"] in ("SUBMITTED", "UNDER_REVIEW", "CORRECTION_NEEDED")]
     if not apps:
-        print("No applications found. Please create one first.")
+        print("No submitted applications found. Please submit one first.")
         return
     app_id = apps[0]["id"]
     print(f"Selected Application ID: {app_id}")
@@ -0,0 +1,152 @@
+"""
+Tests for the form validation rules, run against synthetic forms (see bench_data.py).
+
+Usage:
+    python -m pytest test_validation.py
+    python test_validation.py
+"""
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import validation
+from bench_data import synthetic_form_data
+
+
+def complete_form() -> dict:
+    return synthetic_form_data(random.Random(0), 0)
+
+
+def failing_rules(form_data: dict) -> set:
+    return {e["rule"] for e in validation.validate(form_data)["errors"]}
+
+
+def test_complete_form_passes():
+    result = validation.validate(complete_form())
+    assert result["errors"] == []
+    assert result["complete"]
+    assert result["completeness"] == 100
+
+
+def test_required():
+    form_data = complete_form()
+    form_data["course_name_zh"] = "   "
+    assert failing_rules(form_data) == {"required:course_name_zh"}
+
+
+def test_required_if():
+    form_data = complete_form()
+    form_data["subject_type"] = "專業科目"
+    form_data["subject_type_other"] = ""
+    result = validation.validate(form_data)
+    assert "required:subject_type_other" in result["not_applicable"]
+    assert result["errors"] == []
+
+    form_data["subject_type"] = "其他"
+    assert failing_rules(form_data) == {"required:subject_type_other"}
+
+
+def test_integer():
+    form_data = complete_form()
+    for value in ("3", 3, "3.0"):
+        form_data["credits"] = value
+        assert failing_rules(form_data) == set(), value
+    for value in ("2.5", "-1", "three"):
+        form_data["credits"] = value
+        assert failing_rules(form_data) == {"integer:credits"}, value
+    form_data["class_count"] = "0"
+    assert "integer:class_count" in failing_rules(form_data)
+
+
+def test_non_finite_numbers_are_rejected():
+    form_data = complete_form()
+    for value in ("nan", "inf", "-inf", "1e999", float("nan"), float("inf")):
+        form_data["credits"] = value
+        assert failing_rules(form_data) == {"integer:credits"}, value
+
+    form_data = complete_form()
+    form_data["teaching_method_sync_hours"] = "1e999"
+    assert "teaching_method_remote_hours" in failing_rules(form_data)
+    form_data = complete_form()
+    form_data["teaching_method_total_weeks"] = "nan"
+    assert "integer:teaching_method_total_weeks" in failing_rules(form_data)
+    form_data["grading_criteria"][0]["percentage"] = "inf"
+    assert "grading_total" in failing_rules(form_data)
+
+
+def test_email():
+    form_data = complete_form()
+    form_data["ta_email"] = ""
+    assert "email:ta_email" in validation.validate(form_data)["not_applicable"]
+    form_data["ta_email"] = "not an email"
+    assert failing_rules(form_data) == {"email:ta_email"}
+
+
+def test_teaching_method_weeks():
+    form_data = complete_form()
+    total = validation._number(form_data["teaching_method_total_weeks"])
+    form_data["teaching_method_total_weeks"] = str(int(total) + 1)
+    assert "teaching_method_weeks" in failing_rules(form_data)
+
+
+def test_short_outline_is_only_a_warning():
+    form_data = complete_form()
+    form_data["course_outline_weeks"] = form_data["course_outline_weeks"][:16]
+    result = validation.validate(form_data)
+    assert result["errors"] == []
+    assert result["complete"]
+    assert result["completeness"] == 100
+    assert [w["rule"] for w in result["warnings"]] == ["course_outline_length"]
+    assert result["warnings"][0]["severity"] == validation.WARNING
+
+    form_data["course_outline_weeks"][3]["content"] = ""
+    assert failing_rules(form_data) == {"course_outline"}
+    form_data["course_outline_weeks"] = []
+    assert failing_rules(form_data) == {"course_outline"}
+
+
+def test_grading_total():
+    form_data = complete_form()
+    form_data["grading_criteria"] = [{"category": "期末報告", "percentage": "90"}]
+    assert "grading_total" in failing_rules(form_data)
+
+
+def test_revalidate_matches_full_run():
+    rng = random.Random(1)
+    previous = complete_form()
+    stored = validation.validate(previous)
+    edits = [
+        ("credits", "nan"),
+        ("course_name_zh", ""),
+        ("subject_type", "其他"),
+        ("teacher_email", "broken"),
+        ("course_outline_weeks", previous["course_outline_weeks"][:10]),
+        ("credits", "2"),
+        ("course_name_zh", "課程"),
+        ("subject_type_other", "跨域"),
+        ("teacher_email", "teacher@example.com"),
+        ("course_outline_weeks", previous["course_outline_weeks"]),
+    ]
+    for field, value in edits + rng.sample(edits, len(edits)):
+        current = {**previous, field: value}
+        stored = validation.revalidate(stored, previous, current)
+        full = validation.validate(current)
+        assert stored["errors"] == full["errors"], field
+        assert stored["warnings"] == full["warnings"], field
+        assert stored["completeness"] == full["completeness"], field
+        previous = current
+
+
+def test_revalidate_ignores_other_rule_versions():
+    form_data = complete_form()
+    stale = {**validation.validate({}), "rules_version": "outdated"}
+    assert validation.revalidate(stale, form_data, form_data)["errors"] == []
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"{name}: ok")
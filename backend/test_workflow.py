@@ -0,0 +1,113 @@
+"""
+Tests for the review workflow, run against a scratch SQLite database.
+
+Usage:
+    python -m pytest test_workflow.py
+    python test_workflow.py
+"""
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import crud
+import models
+import schemas
+import workflow
+
+S = models.ApplicationStatus
+Result = models.ReviewResult
+
+
+class Scratch:
+    """A temporary database with one teacher, two reviewers and a submitted application."""
+
+    def __init__(self):
+        self.root = tempfile.mkdtemp(prefix="workflow-test-")
+        engine = create_engine(f"sqlite:///{os.path.join(self.root, 'test.db')}")
+        models.Base.metadata.create_all(engine)
+        self.db = sessionmaker(bind=engine)()
+        teacher = models.User(email="teacher@example.com", role=models.UserRole.TEACHER, department="資訊工程系")
+        self.reviewers = [
+            models.User(email=f"reviewer{i}@example.com", role=models.UserRole.REVIEWER, department="教學發展中心")
+            for i in range(2)
+        ]
+        self.db.add_all([teacher, *self.reviewers])
+        self.db.flush()
+        self.application = models.Application(teacher_id=teacher.id, course_name_zh="測試課程", status=S.DRAFT)
+        self.db.add(self.application)
+        self.db.flush()
+        self.submit()
+
+    def close(self):
+        self.db.close()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def submit(self):
+        workflow.transition(self.db, self.application, S.SUBMITTED)
+        self.db.commit()
+
+    def assign(self, reviewer: models.User) -> dict:
+        return crud.bulk_assign_reviews(self.db, schemas.BulkReviewAssign(
+            assignments=[schemas.ReviewAssignment(application_id=self.application.id, reviewer_id=reviewer.id)],
+        ))
+
+    def review(self, assigned: dict, result: models.ReviewResult):
+        review_id = assigned["created"][0]["review_id"]
+        crud.update_review(self.db, review_id, schemas.ReviewBase(result=result))
+
+    def status(self) -> models.ApplicationStatus:
+        self.db.expire_all()
+        return self.db.get(models.Application, self.application.id).status
+
+
+def test_passed_review_approves():
+    scratch = Scratch()
+    try:
+        assigned = scratch.assign(scratch.reviewers[0])
+        assert scratch.status() == S.UNDER_REVIEW
+        scratch.review(assigned, Result.PASSED)
+        assert scratch.status() == S.APPROVED
+    finally:
+        scratch.close()
+
+
+def test_correction_needs_resubmission_before_review():
+    scratch = Scratch()
+    try:
+        scratch.review(scratch.assign(scratch.reviewers[0]), Result.MODIFICATION_NEEDED)
+        assert scratch.status() == S.CORRECTION_NEEDED
+
+        # Reassigning straight away would count the old verdict in the new round
+        assigned = scratch.assign(scratch.reviewers[1])
+        assert assigned["created"] == []
+        assert assigned["skipped"][0]["reason"] == "Cannot assign reviewers in status CORRECTION_NEEDED"
+        try:
+            crud.create_review(scratch.db, schemas.ReviewCreate(
+                application_id=scratch.application.id, reviewer_id=scratch.reviewers[1].id,
+            ))
+            raise AssertionError("create_review moved CORRECTION_NEEDED to UNDER_REVIEW")
+        except workflow.InvalidTransition:
+            scratch.db.rollback()
+        assert scratch.status() == S.CORRECTION_NEEDED
+
+        # After resubmission only the new round decides
+        scratch.submit()
+        assigned = scratch.assign(scratch.reviewers[1])
+        assert scratch.status() == S.UNDER_REVIEW
+        scratch.review(assigned, Result.PASSED)
+        assert scratch.status() == S.APPROVED
+    finally:
+        scratch.close()
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"{name}: ok")
@@ -0,0 +1,95 @@
+"""
+Tracing Spans
+
+span() wraps a block of work in an OpenTelemetry span when the
+opentelemetry package is installed (configure an SDK/exporter to ship them),
+and is a cheap no-op otherwise.
+
+Independently of OpenTelemetry, span durations are added to the Timings
+collector active in the current context (see collect()), which endpoints
+turn into a Server-Timing header:
+
+    with tracing.collect() as timings:
+        doc_bytes = word_generator.generate_document(form_data)
+    response.headers["Server-Timing"] = timings.server_timing()
+"""
+
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    from opentelemetry import trace as _otel_trace
+except ImportError:  # optional dependency
+    _otel_trace = None
+
+_tracer = _otel_trace.get_tracer("remote-course-system") if _otel_trace is not None else None
+
+
+class Timings:
+    """Span durations of one request, summed per span name in first-seen order."""
+
+    def __init__(self):
+        self._totals: Dict[str, List[float]] = {}
+
+    def add(self, name: str, seconds: float):
+        entry = self._totals.setdefault(name, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += 1
+
+    def as_dict(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            name: {"ms": round(total * 1000, 1), "count": count}
+            for name, (total, count) in self._totals.items()
+        }
+
+    def server_timing(self) -> str:
+        entries = []
+        for name, (total, count) in self._totals.items():
+            entry = f"{name};dur={total * 1000:.1f}"
+            if count > 1:
+                entry += f';desc="{count}x"'
+            entries.append(entry)
+        return ", ".join(entries)
+
+
+_timings: contextvars.ContextVar = contextvars.ContextVar("timings", default=None)
+
+
+@contextmanager
+def collect() -> Iterator[Timings]:
+    """Collect the durations of all spans run inside this block."""
+    timings = Timings()
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+
+class _NoopSpan:
+    __slots__ = ("attributes",)
+
+    def __init__(self, attributes: Dict[str, Any]):
+        self.attributes = attributes
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+
+@contextmanager
+def span(name: str, **attributes: Any):
+    """Time a block as a span; yields an object with set_attribute(key, value)."""
+    start = time.perf_counter()
+    try:
+        if _tracer is not None:
+            attributes = {k: v for k, v in attributes.items() if v is not None}
+            with _tracer.start_as_current_span(name, attributes=attributes) as otel_span:
+                yield otel_span
+        else:
+            yield _NoopSpan(attributes)
+    finally:
+        timings: Optional[Timings] = _timings.get()
+        if timings is not None:
+            timings.add(name, time.perf_counter() - start)
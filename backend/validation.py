@@ -0,0 +1,450 @@
+"""
+Form Validation
+
+Declarative rules for the six pages of the application form, numbered as in
+the frontend wizard (1-2 basic info, 3 teaching method and outline, 4
+activities and interaction, 5 grading and support, 6 final confirmation).
+Each rule names the top-level form_data fields it reads, so apply(), which
+runs on every form_data write (see crud.py), only re-runs the rules whose
+fields changed and keeps the stored results of the rest.
+
+Results are stored on the application: completeness (percent of rules
+passing) as a column dashboards can list and sort on, and the full summary
+(per-page counts, errors and warnings) in the validation column. Submitting
+is refused while there are errors (see main.py); warnings are
+recommendations and do not block it.
+
+Backfill existing rows with: python validation.py
+"""
+
+import hashlib
+import math
+import re
+from collections import namedtuple
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+import models
+
+PAGES = range(1, 7)
+OUTLINE_WEEKS = 18
+MOE_CATEGORY = "教育部數位學習課程認證"
+EMAIL_PATTERN = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+
+ERROR = "error"
+WARNING = "warning"
+
+# check(form_data) returns a list of (field, message), empty when the rule passes,
+# or None when it does not apply (e.g. an "其他" box that was not ticked); rules
+# that do not apply count toward neither completeness nor errors. Problems of
+# WARNING rules are recommendations: reported, but they neither block
+# submission nor lower completeness
+Rule = namedtuple("Rule", ["id", "page", "fields", "check", "severity"], defaults=(ERROR,))
+
+
+def _filled(value: Any) -> bool:
+    if isinstance(value, str):
+        return bool(value.strip())
+    if isinstance(value, (list, tuple, dict)):
+        return bool(value)
+    return value is not None and value is not False
+
+
+def _number(value: Any) -> Optional[float]:
+    """A finite number, or None; "nan", "inf" and overflowing input like "1e999" are not numbers."""
+    try:
+        number = float(str(value).strip())
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+
+def _rows(form: Dict[str, Any], field: str) -> List[Dict[str, Any]]:
+    """A table field (list of row objects); anything malformed counts as empty rows."""
+    value = form.get(field)
+    if not isinstance(value, list):
+        return []
+    return [row if isinstance(row, dict) else {} for row in value]
+
+
+def _selected(value: Any, option: str) -> bool:
+    """True if a radio value equals option or a checkbox list contains it."""
+    if isinstance(value, (list, tuple)):
+        return option in value
+    return value == option
+
+
+def required(page: int, field: str, label: str) -> Rule:
+    def check(form: Dict[str, Any]):
+        return [] if _filled(form.get(field)) else [(field, f"{label}尚未填寫")]
+    return Rule(f"required:{field}", page, (field,), check)
+
+
+def required_if(page: int, field: str, label: str, when_field: str, option: str) -> Rule:
+    """field is required when when_field has option selected (e.g. an "其他" text box)."""
+    def check(form: Dict[str, Any]):
+        if not _selected(form.get(when_field), option):
+            return None
+        return [] if _filled(form.get(field)) else [(field, f"{label}尚未填寫")]
+    return Rule(f"required:{field}", page, (field, when_field), check)
+
+
+def integer(page: int, field: str, label: str, minimum: int = 0) -> Rule:
+    def check(form: Dict[str, Any]):
+        value = form.get(field)
+        if not _filled(value):
+            return None
+        number = _number(value)
+        if number is None or number != int(number) or number < minimum:
+            return [(field, f"{label}須為不小於 {minimum} 的整數")]
+        return []
+    return Rule(f"integer:{field}", page, (field,), check)
+
+
+def email(page: int, field: str, label: str) -> Rule:
+    def check(form: Dict[str, Any]):
+        value = form.get(field)
+        if not _filled(value):
+            return None
+        return [] if EMAIL_PATTERN.match(str(value).strip()) else [(field, f"{label}格式不正確")]
+    return Rule(f"email:{field}", page, (field,), check)
+
+
+def rule(rule_id: str, page: int, fields: tuple, severity: str = ERROR) -> Callable:
+    """Decorator declaring a custom rule."""
+    def register(check: Callable) -> Rule:
+        return Rule(rule_id, page, fields, check, severity)
+    return register
+
+
+METHODS = ("async", "sync", "physical", "other")
+
+
+@rule("teaching_method_weeks", 3, tuple(f"teaching_method_{m}_weeks" for m in METHODS) + ("teaching_method_total_weeks",))
+def _teaching_method_weeks(form):
+    total = _number(form.get("teaching_method_total_weeks"))
+    weeks = [_number(form.get(f"teaching_method_{m}_weeks")) for m in METHODS if _filled(form.get(f"teaching_method_{m}_weeks"))]
+    if total is None or not weeks or None in weeks:
+        return None
+    if sum(weeks) != total:
+        return [("teaching_method_total_weeks", f"各授課方式週數合計 {sum(weeks):g} 週，與總計 {total:g} 週不符")]
+    return []
+
+
+@rule("teaching_method_remote_hours", 3, tuple(f"teaching_method_{m}_hours" for m in METHODS))
+def _teaching_method_remote_hours(form):
+    hours = {m: _number(form.get(f"teaching_method_{m}_hours") or 0) for m in METHODS}
+    if None in hours.values():
+        return [("teaching_method_async_hours", "授課時數須為數字")]
+    total = sum(hours.values())
+    if not total:
+        return None
+    if (hours["async"] + hours["sync"]) * 2 <= total:
+        return [("teaching_method_async_hours", "遠距(同步及非同步)授課時數須超過總授課時數二分之一")]
+    return []
+
+
+@rule("moe_weeks", 3, ("review_category", "teaching_method_async_weeks", "teaching_method_sync_weeks", "teaching_method_total_weeks"))
+def _moe_weeks(form):
+    total = _number(form.get("teaching_method_total_weeks"))
+    if not _selected(form.get("review_category"), MOE_CATEGORY) or not total:
+        return None
+    async_weeks = _number(form.get("teaching_method_async_weeks") or 0) or 0
+    sync_weeks = _number(form.get("teaching_method_sync_weeks") or 0) or 0
+    problems = []
+    if async_weeks * 2 < total:
+        problems.append(("teaching_method_async_weeks", "申請教育部認證，非同步遠距教學須達總週數二分之一以上"))
+    if sync_weeks * 6 < total:
+        problems.append(("teaching_method_sync_weeks", "申請教育部認證，同步遠距教學須達總週數六分之一以上"))
+    return problems
+
+
+@rule("course_outline", 3, ("course_outline_weeks",))
+def _course_outline(form):
+    weeks = _rows(form, "course_outline_weeks")
+    if not weeks:
+        return [("course_outline_weeks", "課程大綱尚未填寫")]
+    empty_weeks = [str(w.get("week", i + 1)) for i, w in enumerate(weeks) if not _filled(w.get("content"))]
+    if empty_weeks:
+        return [("course_outline_weeks", f"第 {', '.join(empty_weeks[:3])} 週內容尚未填寫")]
+    return []
+
+
+@rule("course_outline_length", 3, ("course_outline_weeks",), severity=WARNING)
+def _course_outline_length(form):
+    weeks = _rows(form, "course_outline_weeks")
+    if not weeks:
+        return None
+    if len(weeks) < OUTLINE_WEEKS:
+        return [("course_outline_weeks", f"課程大綱只有 {len(weeks)} 週，建議填滿 {OUTLINE_WEEKS} 週")]
+    return []
+
+
+@rule("async_check", 5, ("async_check", "teaching_method_async_weeks"))
+def _async_check(form):
+    if not _number(form.get("teaching_method_async_weeks")):
+        return None
+    if not _filled(form.get("async_check")):
+        return [("async_check", "有非同步遠距教學週數，請選擇非同步週數檢核方式")]
+    return []
+
+
+@rule("interaction", 4, tuple(f"interaction_{m}_{suffix}" for m in ("sync", "physical", "async") for suffix in ("checked", "count"))
+      + ("interaction_other_checked", "interaction_other_description"))
+def _interaction(form):
+    kinds = [m for m in ("sync", "physical", "async", "other") if form.get(f"interaction_{m}_checked")]
+    if not kinds:
+        return [("interaction_sync_checked", "師生互動方式至少須選擇一項")]
+    problems = []
+    for m in kinds:
+        field = "interaction_other_description" if m == "other" else f"interaction_{m}_count"
+        if not _filled(form.get(field)):
+            problems.append((field, "已勾選的互動方式須填寫次數或說明"))
+    return problems
+
+
+@rule("grading_total", 5, ("grading_criteria",))
+def _grading_total(form):
+    grading = _rows(form, "grading_criteria")
+    if not grading:
+        return [("grading_criteria", "成績評量方式尚未填寫")]
+    problems, total = [], 0.0
+    for i, row in enumerate(grading, 1):
+        if not _filled(row.get("category")):
+            problems.append(("grading_criteria", f"第 {i} 列評量類別尚未填寫"))
+        percentage = _number(row.get("percentage") or 0)
+        if percentage is None:
+            problems.append(("grading_criteria", f"第 {i} 列百分比須為數字"))
+        else:
+            total += percentage
+    if not problems and total != 100:
+        problems.append(("grading_criteria", f"成績評量百分比總和為 {total:g}%，應為 100%"))
+    return problems
+
+
+@rule("moe_grading", 5, ("review_category", "grading_criteria"))
+def _moe_grading(form):
+    grading = _rows(form, "grading_criteria")
+    if not _selected(form.get("review_category"), MOE_CATEGORY) or not grading:
+        return None
+    if len(grading) < 5:
+        return [("grading_criteria", "申請教育部認證，須以五種以上學習歷程紀錄做為評量依據")]
+    return []
+
+
+@rule("copyright_declaration", 6, ("copyright_declaration",))
+def _copyright_declaration(form):
+    return [] if form.get("copyright_declaration") is True else [("copyright_declaration", "需勾選著作權聲明才能提交")]
+
+
+RULES: List[Rule] = [
+    # Page 1: basic info A
+    required(1, "academic_year", "開課學年度"),
+    required(1, "semester", "開課學期"),
+    required(1, "main_department", "主開系所"),
+    required(1, "degree_level", "課程學制"),
+    required_if(1, "degree_program_type", "學位學程類別", "degree_level", "學位學程"),
+    required_if(1, "degree_level_other", "其他教學單位說明", "degree_level", "其他教學單位"),
+    required(1, "subject_type", "科目類別"),
+    required_if(1, "subject_type_other", "其他科目類別說明", "subject_type", "其他"),
+    required(1, "course_name_zh", "課程中文名稱"),
+    required(1, "course_name_en", "課程英文名稱"),
+    required(1, "teacher_name", "授課教師"),
+    # Page 2: basic info B
+    required(2, "credits", "學分數"),
+    integer(2, "credits", "學分數"),
+    required(2, "course_type", "課程類型"),
+    integer(2, "class_count", "開課班數", minimum=1),
+    integer(2, "student_count", "修課人數"),
+    required(2, "language", "授課語言"),
+    required(2, "subtitles", "字幕"),
+    required(2, "platform", "課程平台"),
+    required_if(2, "platform_other", "其他課程平台", "platform", "其他"),
+    required_if(2, "international_collaboration_other", "其他國際合作方式", "international_collaboration_type", "其他"),
+    required(2, "review_category", "審查類別"),
+    required(2, "past_async_materials_type", "過去非同步教材"),
+    required_if(2, "past_async_materials_e3_id", "前次開課課號", "past_async_materials_type", "E3"),
+    required_if(2, "past_async_materials_link", "雲端連結", "past_async_materials_type", "雲端"),
+    required_if(2, "past_async_materials_other", "其他非同步教材說明", "past_async_materials_type", "其他"),
+    # Page 3: teaching method and outline
+    required(3, "teaching_method_total_weeks", "授課總週數"),
+    integer(3, "teaching_method_total_weeks", "授課總週數", minimum=1),
+    _teaching_method_weeks,
+    _teaching_method_remote_hours,
+    _moe_weeks,
+    required(3, "teaching_objectives", "教學目標"),
+    _course_outline,
+    _course_outline_length,
+    # Page 4: activities and interaction
+    required(4, "teaching_activities", "教學活動"),
+    required_if(4, "teaching_activities_other", "其他教學活動說明", "teaching_activities", "M.其他"),
+    required(4, "e3_functions", "E3平台功能"),
+    required_if(4, "e3_functions_other", "其他E3功能說明", "e3_functions", "其他"),
+    _interaction,
+    required(4, "assignment_submission", "作業繳交方式"),
+    required_if(4, "assignment_submission_other", "其他作業繳交方式", "assignment_submission", "其他"),
+    # Page 5: grading and support
+    _grading_total,
+    _moe_grading,
+    _async_check,
+    required(5, "teacher_email", "授課教師Email"),
+    email(5, "teacher_email", "授課教師Email"),
+    email(5, "ta_email", "教學助理Email"),
+    required(5, "office_hour", "線上辦公室時間"),
+    # Page 6: final confirmation
+    _copyright_declaration,
+]
+
+_ORDER = {r.id: i for i, r in enumerate(RULES)}
+_BY_ID = {r.id: r for r in RULES}
+# Bump when a rule's logic, messages or thresholds change without its id or
+# fields changing (the hash below only sees those), so stored results are redone
+RULES_REVISION = 3
+# Stored results from another rule set are revalidated in full
+RULES_VERSION = hashlib.sha256(
+    f"{RULES_REVISION}|".encode() + "|".join(f"{r.id}:{r.page}:{','.join(r.fields)}" for r in RULES).encode()
+).hexdigest()[:12]
+
+
+def run_rules(form_data: Dict[str, Any], rules: List[Rule]) -> tuple:
+    """(problems of every severity, ids of rules that do not apply) for the given rules."""
+    issues, skipped = [], []
+    for r in rules:
+        problems = r.check(form_data)
+        if problems is None:
+            skipped.append(r.id)
+            continue
+        for field, message in problems:
+            issues.append({"rule": r.id, "page": r.page, "field": field, "message": message, "severity": r.severity})
+    return issues, skipped
+
+
+def summarize(issues: List[Dict[str, Any]], skipped: List[str]) -> Dict[str, Any]:
+    """The stored result: completeness, per-page counts, errors and warnings in form order."""
+    issues = sorted(issues, key=lambda e: _ORDER.get(e["rule"], len(_ORDER)))
+    errors = [e for e in issues if e.get("severity", ERROR) == ERROR]
+    warnings = [e for e in issues if e.get("severity", ERROR) != ERROR]
+    failing = {e["rule"] for e in errors}
+    skipped = sorted(set(skipped) & set(_ORDER), key=_ORDER.get)
+    pages = []
+    applicable_total, passed_total = 0, 0
+    for page in PAGES:
+        rule_ids = [r.id for r in RULES if r.page == page and r.id not in skipped]
+        passed = len([rule_id for rule_id in rule_ids if rule_id not in failing])
+        applicable_total += len(rule_ids)
+        passed_total += passed
+        pages.append({
+            "page": page,
+            "rules": len(rule_ids),
+            "passed": passed,
+            "errors": len([e for e in errors if e["page"] == page]),
+            "warnings": len([e for e in warnings if e["page"] == page]),
+        })
+    return {
+        "completeness": round(100 * passed_total / applicable_total) if applicable_total else 100,
+        "complete": not errors,
+        "pages": pages,
+        "errors": errors,
+        "warnings": warnings,
+        "not_applicable": skipped,
+        "rules_version": RULES_VERSION,
+        "validated_at": datetime.utcnow().isoformat(timespec="seconds"),
+    }
+
+
+def validate(form_data: Optional[Dict[str, Any]], page: Optional[int] = None) -> Dict[str, Any]:
+    """Run every rule (or those of one page) against form_data."""
+    rules = RULES if page is None else [r for r in RULES if r.page == page]
+    return summarize(*run_rules(form_data or {}, rules))
+
+
+def page_errors(form_data: Optional[Dict[str, Any]], page: int) -> List[Dict[str, Any]]:
+    """Problems of every severity on one page."""
+    return run_rules(form_data or {}, [r for r in RULES if r.page == page])[0]
+
+
+def changed_fields(previous: Optional[Dict[str, Any]], current: Optional[Dict[str, Any]]) -> Set[str]:
+    previous, current = previous or {}, current or {}
+    return {key for key in previous.keys() | current.keys() if previous.get(key) != current.get(key)}
+
+
+def revalidate(stored: Optional[Dict[str, Any]], previous_form_data: Optional[Dict[str, Any]],
+               form_data: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Update a stored result for a form_data change, re-running only affected rules."""
+    if not stored or stored.get("rules_version") != RULES_VERSION or previous_form_data is None:
+        return validate(form_data)
+    changed = changed_fields(previous_form_data, form_data)
+    if not changed:
+        return stored
+    rerun = [r for r in RULES if not changed.isdisjoint(r.fields)]
+    rerun_ids = {r.id for r in rerun}
+    issues, skipped = run_rules(form_data or {}, rerun)
+    issues += [e for e in stored.get("errors", []) + stored.get("warnings", []) if e["rule"] not in rerun_ids]
+    skipped += [rule_id for rule_id in stored.get("not_applicable", []) if rule_id not in rerun_ids]
+    return summarize(issues, skipped)
+
+
+def columns(result: Dict[str, Any]) -> Dict[str, Any]:
+    return {"completeness": result["completeness"], "validation": result}
+
+
+def apply(application: models.Application, previous_form_data: Optional[Dict[str, Any]] = None):
+    """Update the stored validation of an application after its form_data changed."""
+    result = revalidate(application.validation, previous_form_data, application.form_data)
+    for field, value in columns(result).items():
+        setattr(application, field, value)
+
+
+def current(application: models.Application) -> Dict[str, Any]:
+    """The stored result if it was made with the current rules, else a fresh (unsaved) one."""
+    stored = application.validation
+    if stored and stored.get("rules_version") == RULES_VERSION:
+        return stored
+    return validate(application.form_data)
+
+
+def backfill(db: Session, batch_size: int = 500) -> int:
+    """Validate every application whose stored result is missing or outdated; returns rows updated.
+
+    Uses Core UPDATEs so the backfill neither bumps the optimistic-locking
+    version nor touches updated_at.
+    """
+    count = 0
+    last_id = ""
+    while True:
+        rows = (
+            db.query(models.Application.id, models.Application.form_data, models.Application.validation)
+            .filter(models.Application.id > last_id)
+            .order_by(models.Application.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            break
+        for application_id, form_data, stored in rows:
+            if stored and stored.get("rules_version") == RULES_VERSION:
+                continue
+            db.execute(
+                update(models.Application)
+                .where(models.Application.id == application_id)
+                .values(updated_at=models.Application.updated_at, **columns(validate(form_data)))
+            )
+            count += 1
+        db.commit()
+        last_id = rows[-1][0]
+    return count
+
+
+if __name__ == "__main__":
+    import migrations
+    from database import SessionLocal
+
+    migrations.upgrade()
+    session = SessionLocal()
+    try:
+        print(f"[VALIDATION] Validated {backfill(session)} applications")
+    finally:
+        session.close()
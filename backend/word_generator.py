@@ -8,22 +8,25 @@ This module generates Word documents from form data by:
 """
 
 import os
-import re
 import json
 import io
-from typing import Dict, List, Any, Optional
+import threading
+import time
+import zipfile
+from typing import Dict, List, Any, Optional, Tuple
 from docx import Document
 from docx.oxml.ns import qn
 from docx.oxml import OxmlElement
-import google.generativeai as genai
 from dotenv import load_dotenv
+import gemini
+import logs
+import metrics
+import placeholder_scanner
+import tracing
 
 # Load environment variables
 load_dotenv()
 
-# Configure Gemini
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-
 # Paths
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 RESOURCES_DIR = os.path.join(BASE_DIR, "resources")
@@ -31,34 +34,94 @@ TEMPLATE_PATH = os.path.join(RESOURCES_DIR, "template.docx")
 SAMPLE_PDF_PATH = os.path.join(RESOURCES_DIR, "sample.pdf")
 SAMPLE_DOCX_PATH = os.path.join(RESOURCES_DIR, "sample.docx")
 
+# Gemini deletes uploaded files after 48 hours; upload again a little before that
+REFERENCE_UPLOAD_TTL_SECONDS = float(os.getenv("REFERENCE_UPLOAD_TTL_HOURS", "46")) * 3600
 
-def extract_placeholders(docx_path: str) -> List[str]:
-    """Extract all {{placeholder}} patterns from a Word document."""
-    placeholders = set()
-    doc = Document(docx_path)
-    
-    def find_in_text(text: str):
-        matches = re.findall(r'\{\{(.*?)\}\}', text, re.DOTALL)
-        for match in matches:
-            # Normalize: replace newlines with spaces, collapse multiple spaces, strip
-            normalized = ' '.join(match.split())
-            placeholders.add(normalized)
-    
-    def process_table(table):
-        for row in table.rows:
-            for cell in row.cells:
-                for para in cell.paragraphs:
-                    find_in_text(para.text)
-                for nested_table in cell.tables:
-                    process_table(nested_table)
-    
-    for para in doc.paragraphs:
-        find_in_text(para.text)
-    
-    for table in doc.tables:
-        process_table(table)
-    
-    return sorted(placeholders)
+logger = logs.get_logger("fill")
+
+_cache_lock = threading.Lock()
+_template_cache: Dict[str, tuple] = {}  # path -> (mtime, template bytes, placeholders)
+# Separate from _cache_lock and never held across the upload itself, so
+# template loads and readiness probes don't wait on Gemini
+_reference_lock = threading.Lock()
+_reference_upload: Optional[tuple] = None  # (uploaded file, monotonic upload time)
+_reference_flight: Optional["_Flight"] = None  # the upload in progress, if any
+
+
+class _Flight:
+    """One in-progress upload; concurrent callers wait for its outcome instead of uploading again."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+def extract_placeholders(docx_path) -> List[str]:
+    """Extract all {{placeholder}} patterns from a Word document (normalized, sorted)."""
+    return placeholder_scanner.keys(docx_path)
+
+
+def load_template(template_path: str = TEMPLATE_PATH) -> tuple:
+    """
+    Template bytes and placeholders, parsed once and reused until the file's
+    mtime changes.
+
+    Returns:
+        (template bytes, sorted placeholder list)
+    """
+    mtime = os.path.getmtime(template_path)
+    with _cache_lock:
+        cached = _template_cache.get(template_path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1], cached[2]
+        with open(template_path, "rb") as f:
+            template_bytes = f.read()
+        placeholders = extract_placeholders(io.BytesIO(template_bytes))
+        _template_cache[template_path] = (mtime, template_bytes, placeholders)
+        return template_bytes, placeholders
+
+
+def template_cached(template_path: str = TEMPLATE_PATH) -> bool:
+    cached = _template_cache.get(template_path)
+    return cached is not None and os.path.exists(template_path) and cached[0] == os.path.getmtime(template_path)
+
+
+def reference_file():
+    """The uploaded sample PDF, shared by all generations until it is about to expire."""
+    global _reference_upload, _reference_flight
+    with _reference_lock:
+        upload = _reference_upload
+        if upload is not None and time.monotonic() - upload[1] < REFERENCE_UPLOAD_TTL_SECONDS:
+            return upload[0]
+        flight = _reference_flight
+        leader = flight is None
+        if leader:
+            flight = _reference_flight = _Flight()
+
+    if not leader:
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    try:
+        flight.result = upload_reference_files()
+    except BaseException as e:
+        flight.error = e
+        raise
+    finally:
+        with _reference_lock:
+            if flight.result is not None:
+                _reference_upload = (flight.result, time.monotonic())
+            _reference_flight = None
+        flight.done.set()
+    return flight.result
+
+
+def reference_uploaded() -> bool:
+    upload = _reference_upload
+    return upload is not None and time.monotonic() - upload[1] < REFERENCE_UPLOAD_TTL_SECONDS
 
 
 def upload_reference_files() -> tuple:
@@ -68,7 +131,7 @@ def upload_reference_files() -> tuple:
     pdf_file = None
     
     if os.path.exists(SAMPLE_PDF_PATH):
-        pdf_file = genai.upload_file(SAMPLE_PDF_PATH, display_name="sample_format.pdf")
+        pdf_file = gemini.client().upload_file(SAMPLE_PDF_PATH, display_name="sample_format.pdf")
         print(f"  Uploaded PDF: {pdf_file.name}")
     
     return pdf_file
@@ -83,7 +146,7 @@ def generate_placeholder_values(
     
     model_name = os.getenv("MODEL_NAME", "gemini-2.0-flash")
     
-    model = genai.GenerativeModel(
+    model = gemini.client().GenerativeModel(
         model_name=model_name,
         generation_config={
             "temperature": 0.1,
@@ -189,32 +252,39 @@ IMPORTANT: You MUST provide a value for EVERY placeholder in the list. Do not sk
         if not remaining_placeholders:
             break
             
-        print(f"\n=== Round {retry_round + 1}/{MAX_RETRIES}: Processing {len(remaining_placeholders)} placeholders ===")
+        with tracing.span("llm_round", retry_round=retry_round + 1, remaining=len(remaining_placeholders)) as round_span:
+            print(f"\n=== Round {retry_round + 1}/{MAX_RETRIES}: Processing {len(remaining_placeholders)} placeholders ===")
         
-        total_batches = (len(remaining_placeholders) + BATCH_SIZE - 1) // BATCH_SIZE
-        round_values = {}
+            total_batches = (len(remaining_placeholders) + BATCH_SIZE - 1) // BATCH_SIZE
+            round_values = {}
         
-        for i in range(0, len(remaining_placeholders), BATCH_SIZE):
-            batch = remaining_placeholders[i:i + BATCH_SIZE]
-            batch_num = i // BATCH_SIZE + 1
-            print(f"  Batch {batch_num}/{total_batches}: processing {len(batch)} placeholders...")
+            for i in range(0, len(remaining_placeholders), BATCH_SIZE):
+                batch = remaining_placeholders[i:i + BATCH_SIZE]
+                batch_num = i // BATCH_SIZE + 1
+                print(f"  Batch {batch_num}/{total_batches}: processing {len(batch)} placeholders...")
             
-            # Only include PDF for first batch of first round
-            include_pdf = (retry_round == 0 and batch_num == 1)
-            batch_values = process_batch(batch, batch_num, total_batches, include_pdf)
+                # Only include PDF for first batch of first round
+                include_pdf = (retry_round == 0 and batch_num == 1)
+                with tracing.span(
+                    "llm_batch", batch_num=batch_num, batch_size=len(batch),
+                    retry_round=retry_round + 1, include_pdf=include_pdf,
+                ) as batch_span:
+                    batch_values = process_batch(batch, batch_num, total_batches, include_pdf)
+                    batch_span.set_attribute("values_returned", len(batch_values))
             
-            print(f"    Got {len(batch_values)} values from batch {batch_num}")
-            round_values.update(batch_values)
+                print(f"    Got {len(batch_values)} values from batch {batch_num}")
+                round_values.update(batch_values)
         
-        all_values.update(round_values)
+            all_values.update(round_values)
         
-        # Check which placeholders are still missing
-        remaining_placeholders = [p for p in remaining_placeholders if p not in all_values]
+            # Check which placeholders are still missing
+            remaining_placeholders = [p for p in remaining_placeholders if p not in all_values]
+            round_span.set_attribute("missing", len(remaining_placeholders))
         
-        if remaining_placeholders:
-            print(f"\n  Still missing {len(remaining_placeholders)} values after round {retry_round + 1}")
-        else:
-            print(f"\n  All placeholders filled after round {retry_round + 1}!")
+            if remaining_placeholders:
+                print(f"\n  Still missing {len(remaining_placeholders)} values after round {retry_round + 1}")
+            else:
+                print(f"\n  All placeholders filled after round {retry_round + 1}!")
     
     if remaining_placeholders:
         print(f"\nWARNING: Still missing {len(remaining_placeholders)} values after {MAX_RETRIES} rounds:")
@@ -225,7 +295,7 @@ IMPORTANT: You MUST provide a value for EVERY placeholder in the list. Do not sk
     return all_values
 
 
-def fill_template(template_path: str, values: Dict[str, str]) -> Document:
+def fill_template(template_path, values: Dict[str, str]) -> Document:
     """Fill the Word template with values, handling split placeholders across runs."""
     doc = Document(template_path)
     
@@ -241,13 +311,9 @@ def fill_template(template_path: str, values: Dict[str, str]) -> Document:
         full_text = ''.join(run.text for run in paragraph.runs)
         modified_text = full_text
         
-        # Find all placeholders in the text using regex
-        placeholder_pattern = r'\{\{(.*?)\}\}'
-        
         def replace_match(match):
-            raw_key = match.group(1)
             # Normalize the key (same as in extract_placeholders)
-            normalized_key = ' '.join(raw_key.split())
+            normalized_key = placeholder_scanner.normalize_key(match.group(1))
             
             # Look up the value
             if normalized_key in values:
@@ -259,7 +325,7 @@ def fill_template(template_path: str, values: Dict[str, str]) -> Document:
                 # Key not found, keep original
                 return match.group(0)
         
-        modified_text = re.sub(placeholder_pattern, replace_match, full_text, flags=re.DOTALL)
+        modified_text = placeholder_scanner.PLACEHOLDER_PATTERN.sub(replace_match, full_text)
         
         # If text was modified, update the runs
         if modified_text != full_text:
@@ -304,35 +370,79 @@ def fill_template(template_path: str, values: Dict[str, str]) -> Document:
     return doc
 
 
-def generate_document(form_data: Dict[str, Any]) -> bytes:
+def save_document(doc) -> bytes:
+    """Serialize a Document with fixed zip timestamps, so identical content gives identical bytes."""
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    source = zipfile.ZipFile(io.BytesIO(buffer.getvalue()))
+    output = io.BytesIO()
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as target:
+        for info in source.infolist():
+            entry = zipfile.ZipInfo(info.filename, date_time=(1980, 1, 1, 0, 0, 0))
+            target.writestr(entry, source.read(info), compress_type=zipfile.ZIP_DEFLATED)
+    return output.getvalue()
+
+
+def find_unreplaced(doc_bytes: bytes, application_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Placeholders still present in a generated document (see placeholder_scanner.scan)."""
+    unreplaced = placeholder_scanner.scan(doc_bytes)
+    if unreplaced:
+        keys = sorted({occurrence["key"] for occurrence in unreplaced})
+        metrics.UNREPLACED_PLACEHOLDERS.inc(amount=len(unreplaced))
+        logger.warning("placeholders left unreplaced", extra={
+            "application_id": application_id,
+            "unreplaced": len(unreplaced),
+            "keys": [key[:40] for key in keys[:10]],
+        })
+    return unreplaced
+
+
+def generate_document(form_data: Dict[str, Any], application_id: Optional[str] = None) -> bytes:
     """
     Main entry point: Generate a filled Word document from form data.
     
     Args:
         form_data: Dictionary containing form field values
+        application_id: Application the document is for, used in logs
         
     Returns:
         bytes: The generated Word document as bytes
     """
-    # 1. Extract placeholders from template
-    placeholders = extract_placeholders(TEMPLATE_PATH)
-    print(f"Found {len(placeholders)} placeholders in template")
-    
-    # 2. Upload reference files
-    pdf_file = upload_reference_files()
-    
-    # 3. Generate values using LLM
-    values = generate_placeholder_values(form_data, placeholders, pdf_file)
-    
-    # 4. Fill template
-    doc = fill_template(TEMPLATE_PATH, values)
-    
-    # 5. Save to bytes
-    buffer = io.BytesIO()
-    doc.save(buffer)
-    buffer.seek(0)
-    
-    return buffer.getvalue()
+    return build_document(form_data, application_id)[0]
+
+
+def build_document(form_data: Dict[str, Any], application_id: Optional[str] = None) -> Tuple[bytes, List[Dict[str, Any]]]:
+    """generate_document(), also returning the placeholders left unreplaced (see find_unreplaced)."""
+    with tracing.span("generate_document") as document_span:
+        # 1. Extract placeholders from template
+        with tracing.span("extract_placeholders", cached=template_cached()):
+            template_bytes, placeholders = load_template()
+        print(f"Found {len(placeholders)} placeholders in template")
+        document_span.set_attribute("placeholders", len(placeholders))
+        
+        # 2. Upload reference files
+        with tracing.span("upload_reference", cached=reference_uploaded()):
+            pdf_file = reference_file()
+        
+        # 3. Generate values using LLM
+        with tracing.span("llm_values", placeholders=len(placeholders)) as llm_span:
+            values = generate_placeholder_values(form_data, placeholders, pdf_file)
+            llm_span.set_attribute("missing", len([p for p in placeholders if p not in values]))
+        
+        # 4. Fill template
+        with tracing.span("fill_template", values=len(values)):
+            doc = fill_template(io.BytesIO(template_bytes), values)
+        
+        # 5. Save to bytes
+        with tracing.span("save_document"):
+            doc_bytes = save_document(doc)
+        
+        # 6. Check the result for placeholders that were not replaced
+        with tracing.span("verify_placeholders") as verify_span:
+            unreplaced = find_unreplaced(doc_bytes, application_id)
+            verify_span.set_attribute("unreplaced", len(unreplaced))
+        document_span.set_attribute("unreplaced", len(unreplaced))
+        return doc_bytes, unreplaced
 
 
 # Test function
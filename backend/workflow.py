@@ -0,0 +1,164 @@
+"""
+Application Review Workflow
+
+State machine for ApplicationStatus. All status changes go through
+transition(), which validates the move, keeps the stat counters in step and
+queues a TransitionEvent. Queued events are delivered to subscribers only
+after the surrounding transaction commits, and dropped on rollback.
+
+recompute_status() derives an application's aggregate status from its
+current review round with a single aggregate query.
+"""
+
+from collections import namedtuple
+from datetime import datetime
+from typing import Callable, List, Optional
+
+from sqlalchemy import case, event, func, or_
+from sqlalchemy.orm import Session
+
+import logs
+import models
+import stats
+
+S = models.ApplicationStatus
+
+TRANSITIONS = {
+    # Drafts reach review only through SUBMITTED, which checks the form (see main.py)
+    S.DRAFT: {S.SUBMITTED, S.CANCELLED},
+    S.SUBMITTED: {S.DRAFT, S.UNDER_REVIEW, S.CORRECTION_NEEDED, S.CANCELLED},
+    S.UNDER_REVIEW: {S.APPROVED, S.REJECTED, S.CORRECTION_NEEDED, S.CANCELLED},
+    # Back to review only through resubmission, which checks the form again and
+    # starts a new review round (see aggregate_status)
+    S.CORRECTION_NEEDED: {S.SUBMITTED, S.CANCELLED},
+    S.APPROVED: set(),
+    S.REJECTED: set(),
+    S.CANCELLED: {S.DRAFT},
+}
+
+# Transitions a teacher may request on their own application
+TEACHER_TRANSITIONS = {
+    (S.DRAFT, S.SUBMITTED),
+    (S.CORRECTION_NEEDED, S.SUBMITTED),
+    (S.SUBMITTED, S.DRAFT),
+    (S.DRAFT, S.CANCELLED),
+    (S.SUBMITTED, S.CANCELLED),
+    (S.CORRECTION_NEEDED, S.CANCELLED),
+}
+
+TransitionEvent = namedtuple("TransitionEvent", ["application_id", "old_status", "new_status", "actor_id", "at"])
+
+_subscribers: List[Callable[[TransitionEvent], None]] = []
+_EVENTS_KEY = "workflow_events"
+
+logger = logs.get_logger("workflow")
+
+
+class InvalidTransition(Exception):
+    def __init__(self, old_status: models.ApplicationStatus, new_status: models.ApplicationStatus):
+        super().__init__(f"Cannot change status from {old_status.value} to {new_status.value}")
+        self.old_status = old_status
+        self.new_status = new_status
+
+
+def subscribe(callback: Callable[[TransitionEvent], None]):
+    """Register a callback invoked with each committed TransitionEvent."""
+    _subscribers.append(callback)
+
+
+def can_transition(old_status: Optional[models.ApplicationStatus], new_status: models.ApplicationStatus) -> bool:
+    return new_status in TRANSITIONS[old_status or S.DRAFT]
+
+
+def queue_event(db: Session, application_id: str, old_status, new_status, actor_id: Optional[str] = None):
+    db.info.setdefault(_EVENTS_KEY, []).append(
+        TransitionEvent(application_id, old_status, new_status, actor_id, datetime.utcnow())
+    )
+
+
+def transition(db: Session, application: models.Application, new_status: models.ApplicationStatus, actor_id: Optional[str] = None) -> bool:
+    """Move an application to new_status; returns False if it is already there."""
+    old_status = application.status or S.DRAFT
+    if old_status == new_status:
+        return False
+    if not can_transition(old_status, new_status):
+        raise InvalidTransition(old_status, new_status)
+
+    before = stats.application_dims(application)
+    application.status = new_status
+    if new_status == S.SUBMITTED:
+        application.submission_time = datetime.utcnow()
+    stats.track_application(db, before, application)
+    queue_event(db, application.id, old_status, new_status, actor_id)
+    return True
+
+
+def aggregate_status(db: Session, application: models.Application) -> Optional[models.ApplicationStatus]:
+    """Status implied by the reviews of the current round, or None if there are none.
+
+    The current round is every review assigned since the last submission.
+    """
+    Review = models.Review
+    round_filter = [Review.application_id == application.id]
+    if application.submission_time is not None:
+        round_filter.append(or_(Review.assigned_at.is_(None), Review.assigned_at >= application.submission_time))
+
+    total, pending, rejected, modification = (
+        db.query(
+            func.count(Review.id),
+            # A completed review without a result (legacy rows) has not decided anything yet
+            func.sum(case((or_(Review.status == models.ReviewStatus.PENDING, Review.result.is_(None)), 1), else_=0)),
+            func.sum(case((Review.result == models.ReviewResult.REJECTED, 1), else_=0)),
+            func.sum(case((Review.result == models.ReviewResult.MODIFICATION_NEEDED, 1), else_=0)),
+        )
+        .filter(*round_filter)
+        .one()
+    )
+    if not total:
+        return None
+    if pending:
+        return S.UNDER_REVIEW
+    if rejected:
+        return S.REJECTED
+    if modification:
+        return S.CORRECTION_NEEDED
+    return S.APPROVED
+
+
+def recompute_status(db: Session, application: models.Application, actor_id: Optional[str] = None) -> bool:
+    """Apply the aggregate review outcome to the application, within the caller's transaction."""
+    target = aggregate_status(db, application)
+    if target is None or target == application.status or not can_transition(application.status, target):
+        return False
+    return transition(db, application, target, actor_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _dispatch_events(session):
+    events = session.info.pop(_EVENTS_KEY, [])
+    for transition_event in events:
+        for callback in _subscribers:
+            try:
+                callback(transition_event)
+            except Exception:
+                logger.exception("transition subscriber failed", extra={
+                    "application_id": transition_event.application_id,
+                    "subscriber": getattr(callback, "__qualname__", repr(callback)),
+                })
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_events(session):
+    session.info.pop(_EVENTS_KEY, None)
+
+
+def _log_transition(transition_event: TransitionEvent):
+    logger.info("status changed", extra={
+        "application_id": transition_event.application_id,
+        "old_status": transition_event.old_status.value,
+        "new_status": transition_event.new_status.value,
+        "actor_id": transition_event.actor_id,
+    })
+
+
+subscribe(_log_transition)
@@ -15,6 +15,16 @@ export async function PUT(request: NextRequest, { params }: { params: Promise<{
     return proxy(request, path);
 }
 
+export async function PATCH(request: NextRequest, { params }: { params: Promise<{ path: string[] }> }) {
+    const { path } = await params;
+    return proxy(request, path);
+}
+
+export async function HEAD(request: NextRequest, { params }: { params: Promise<{ path: string[] }> }) {
+    const { path } = await params;
+    return proxy(request, path);
+}
+
 export async function DELETE(request: NextRequest, { params }: { params: Promise<{ path: string[] }> }) {
     const { path } = await params;
     return proxy(request, path);
@@ -31,19 +41,25 @@ async function proxy(request: NextRequest, path: string[]) {
     headers.delete("host"); // Remove host header to avoid conflicts
 
     try {
-        const body = request.method !== "GET" && request.method !== "HEAD" ? await request.blob() : null;
+        // Stream request bodies through (attachment uploads can be hundreds of MB)
+        const body = request.method !== "GET" && request.method !== "HEAD" ? request.body : null;
 
         const response = await fetch(finalUrl, {
             method: request.method,
             headers: headers,
             body: body,
             cache: "no-store",
-        });
+            duplex: "half",
+        } as RequestInit);
 
         console.log(`Backend response status: ${response.status}`);
 
-        const responseBody = await response.blob();
+        // 304 (conditional GET) must not carry a body
+        const responseBody = response.status === 304 ? null : response.body;
         const responseHeaders = new Headers(response.headers);
+        // fetch() already decoded a br/gzip body; the original encoding and length no longer apply
+        responseHeaders.delete("content-encoding");
+        responseHeaders.delete("content-length");
 
         return new NextResponse(responseBody, {
             status: response.status,
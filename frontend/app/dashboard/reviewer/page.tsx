@@ -6,12 +6,22 @@ import { Button } from "@/components/ui/button";
 import { Badge } from "@/components/ui/badge";
 import Link from "next/link";
 
+interface ApplicationSummary {
+    id: string;
+    course_name_zh: string;
+    course_name_en: string | null;
+    status: string;
+    teacher_name: string | null;
+    main_department: string | null;
+}
+
 interface Review {
     id: string;
     application_id: string;
     status: string;
     result: string | null;
     submitted_at: string | null;
+    application: ApplicationSummary;
 }
 
 export default function ReviewerDashboard() {
@@ -22,14 +32,14 @@ export default function ReviewerDashboard() {
         const fetchReviews = async () => {
             try {
                 const token = localStorage.getItem("token");
-                const res = await fetch("/api/reviews/me", {
+                const res = await fetch("/api/reviews/inbox?limit=200", {
                     headers: {
                         Authorization: `Bearer ${token}`,
                     },
                 });
                 if (res.ok) {
                     const data = await res.json();
-                    setReviews(data);
+                    setReviews(data.items);
                 }
             } catch (error) {
                 console.error("Failed to fetch reviews", error);
@@ -63,7 +73,10 @@ export default function ReviewerDashboard() {
                             {reviews.map((review) => (
                                 <div key={review.id} className="flex items-center justify-between border-b pb-4 last:border-0 last:pb-0">
                                     <div>
-                                        <p className="font-medium">Application ID: {review.application_id}</p>
+                                        <p className="font-medium">{review.application.course_name_zh}</p>
+                                        <p className="text-sm text-muted-foreground">
+                                            {[review.application.teacher_name, review.application.main_department].filter(Boolean).join(" · ")}
+                                        </p>
                                         <p className="text-sm text-muted-foreground">Status: {review.status}</p>
                                     </div>
                                     <div className="flex items-center gap-4">
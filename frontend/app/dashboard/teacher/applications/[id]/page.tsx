@@ -1,6 +1,6 @@
 "use client";
 
-import { useState, useEffect } from "react";
+import { useState, useEffect, useRef } from "react";
 import { Button } from "@/components/ui/button";
 import { Card, CardContent, CardHeader, CardTitle, CardDescription } from "@/components/ui/card";
 import { Input } from "@/components/ui/input";
@@ -10,6 +10,7 @@ import { useRouter, useParams } from "next/navigation";
 import { useAuth } from "@/lib/auth";
 import { Plus, Trash2 } from "lucide-react";
 import AIChatWidget from "@/components/AIChatWidget";
+import { submitApplication } from "@/lib/applications";
 
 export default function CreateApplicationPage() {
     const router = useRouter();
@@ -138,6 +139,16 @@ export default function CreateApplicationPage() {
 
     const [loading, setLoading] = useState(true);
     const [saving, setSaving] = useState(false);
+    const [saveError, setSaveError] = useState<string | null>(null);
+    // Server version and form_data as of the last load or successful autosave
+    const versionRef = useRef<number>(1);
+    const savedRef = useRef<Record<string, any> | null>(null);
+    const savingRef = useRef(false);
+    const pendingRef = useRef(false);
+    // The server copy after a 409; autosave stays paused until the user resolves it
+    const [conflict, setConflict] = useState<{ version: number; form_data: Record<string, any> } | null>(null);
+    const conflictRef = useRef(conflict);
+    conflictRef.current = conflict;
 
     // Load existing application data
     useEffect(() => {
@@ -150,6 +161,8 @@ export default function CreateApplicationPage() {
                 });
                 if (!res.ok) throw new Error("Failed to fetch application");
                 const data = await res.json();
+                versionRef.current = data.version;
+                savedRef.current = data.form_data || {};
                 if (data.form_data) {
                     setFormData(data.form_data);
                 }
@@ -166,6 +179,101 @@ export default function CreateApplicationPage() {
         }
     }, [params.id]);
 
+    const formDataRef = useRef(formData);
+    formDataRef.current = formData;
+
+    // Top-level form fields that differ from the last saved form_data
+    const changedFields = () => {
+        const saved = savedRef.current || {};
+        const current = formDataRef.current as Record<string, any>;
+        const merge: Record<string, any> = {};
+        for (const key of Object.keys(current)) {
+            if (JSON.stringify(current[key]) !== JSON.stringify(saved[key])) merge[key] = current[key];
+        }
+        return merge;
+    };
+
+    // Autosave: send only the top-level fields that changed as a merge patch
+    const autosave = async (): Promise<void> => {
+        const saved = savedRef.current;
+        if (!saved || conflictRef.current) return;
+        if (savingRef.current) {
+            // Save again with the latest edits once the request in flight is done
+            pendingRef.current = true;
+            return;
+        }
+        const merge = changedFields();
+        if (Object.keys(merge).length === 0) return;
+
+        savingRef.current = true;
+        setSaving(true);
+        try {
+            const res = await fetch(`/api/applications/${params.id}`, {
+                method: "PATCH",
+                headers: {
+                    "Content-Type": "application/json",
+                    Authorization: `Bearer ${localStorage.getItem("token")}`,
+                },
+                body: JSON.stringify({ version: versionRef.current, merge }),
+            });
+            if (res.status === 409) {
+                // Saved from another tab or session. Re-applying our fields could
+                // overwrite edits made there (fields like course_outline_weeks are
+                // whole tables), so let the user choose which copy wins
+                const latest = await fetch(`/api/applications/${params.id}`, {
+                    headers: { Authorization: `Bearer ${localStorage.getItem("token")}` },
+                    cache: "no-store",
+                });
+                if (!latest.ok) throw new Error(`Failed to refetch: ${latest.status}`);
+                const data = await latest.json();
+                pendingRef.current = false;
+                setConflict({ version: data.version, form_data: data.form_data || {} });
+                return;
+            }
+            if (!res.ok) throw new Error(`Failed to save: ${res.status} ${await res.text()}`);
+            const data = await res.json();
+            versionRef.current = data.version;
+            savedRef.current = { ...saved, ...merge };
+            setSaveError(null);
+        } catch (error) {
+            console.error("Autosave failed:", error);
+            setSaveError("自動儲存失敗 (Autosave failed)");
+        } finally {
+            savingRef.current = false;
+            setSaving(false);
+            if (pendingRef.current) {
+                pendingRef.current = false;
+                setTimeout(() => autosave(), 0);
+            }
+        }
+    };
+
+    useEffect(() => {
+        if (loading) return;
+        const timer = setTimeout(() => autosave(), 1500);
+        return () => clearTimeout(timer);
+    }, [formData, loading]);
+
+    // Resolve a conflict: take the other session's copy, or overwrite it with ours
+    const loadLatest = () => {
+        if (!conflict) return;
+        versionRef.current = conflict.version;
+        savedRef.current = conflict.form_data;
+        setFormData(prev => ({ ...prev, ...conflict.form_data }));
+        conflictRef.current = null;
+        setConflict(null);
+        setSaveError(null);
+    };
+
+    const keepMine = () => {
+        if (!conflict) return;
+        versionRef.current = conflict.version;
+        savedRef.current = conflict.form_data;
+        conflictRef.current = null;
+        setConflict(null);
+        autosave();
+    };
+
     const handleChange = (e: React.ChangeEvent<HTMLInputElement | HTMLTextAreaElement>) => {
         const { name, value, type } = e.target;
 
@@ -239,29 +347,21 @@ export default function CreateApplicationPage() {
     };
 
     const handleSubmit = async () => {
+        // Save the latest edits first, then submit this application (not a copy)
+        while (savingRef.current) await new Promise((resolve) => setTimeout(resolve, 100));
+        await autosave();
+        if (conflictRef.current) {
+            alert("此申請已在其他視窗修改，請先選擇要保留的版本 (Resolve the edit conflict first)");
+            return;
+        }
+        if (Object.keys(changedFields()).length > 0) {
+            alert("尚有未儲存的變更，請稍後再試 (Unsaved changes, please try again)");
+            return;
+        }
         try {
-            const res = await fetch("/api/applications/", {
-                method: "POST",
-                headers: {
-                    "Content-Type": "application/json",
-                    Authorization: `Bearer ${localStorage.getItem("token")}`,
-                },
-                body: JSON.stringify({
-                    course_name_zh: formData.course_name_zh,
-                    course_name_en: formData.course_name_en,
-                    permanent_course_id: formData.permanent_course_id,
-                    is_moe_certified: formData.review_category.includes("教育部"),
-                    form_data: formData,
-                    video_links: { url: "" },
-                }),
-            });
-
-            if (!res.ok) {
-                const errorText = await res.text();
-                throw new Error(`Failed to submit: ${res.status} ${errorText}`);
+            if (await submitApplication(String(params.id))) {
+                router.push("/dashboard/teacher");
             }
-
-            router.push("/dashboard/teacher");
         } catch (error) {
             console.error("Full error:", error);
             alert("Failed to submit application. Check console for details.");
@@ -274,9 +374,24 @@ export default function CreateApplicationPage() {
         <div className="max-w-6xl mx-auto space-y-6 pb-20">
             <div className="flex items-center justify-between">
                 <h1 className="text-2xl font-bold">New Course Application (遠距教學課程申請)</h1>
-                <span className="text-sm text-gray-500">Step {step} of 6</span>
+                <span className="text-sm text-gray-500">
+                    {saveError ? <span className="text-red-500">{saveError}</span> : saving ? "儲存中… (Saving)" : ""} Step {step} of 6
+                </span>
             </div>
 
+            {conflict && (
+                <div className="flex items-center justify-between gap-4 rounded border border-amber-300 bg-amber-50 p-4 text-sm">
+                    <span>
+                        此申請已在其他視窗或裝置修改，自動儲存已暫停。
+                        (This application was changed in another session; autosave is paused.)
+                    </span>
+                    <div className="flex gap-2">
+                        <Button variant="outline" onClick={loadLatest}>載入最新版本 (Reload)</Button>
+                        <Button variant="destructive" onClick={keepMine}>保留我的版本並覆蓋 (Keep mine)</Button>
+                    </div>
+                </div>
+            )}
+
             <Card>
                 <CardHeader>
                     <CardTitle>
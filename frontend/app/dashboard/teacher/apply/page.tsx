@@ -10,6 +10,7 @@ import { useRouter } from "next/navigation";
 import { useAuth } from "@/lib/auth";
 import { Plus, Trash2 } from "lucide-react";
 import AIChatWidget from "@/components/AIChatWidget";
+import { submitApplication } from "@/lib/applications";
 
 export default function CreateApplicationPage() {
     const router = useRouter();
@@ -229,8 +230,14 @@ export default function CreateApplicationPage() {
                 const errorText = await res.text();
                 throw new Error(`Failed to submit: ${res.status} ${errorText}`);
             }
+            const created = await res.json();
 
-            router.push("/dashboard/teacher");
+            // The application is saved as a draft; submitting it checks the form
+            if (await submitApplication(created.id)) {
+                router.push("/dashboard/teacher");
+            } else {
+                router.push(`/dashboard/teacher/applications/${created.id}`);
+            }
         } catch (error) {
             console.error("Full error:", error);
             alert("Failed to submit application. Check console for details.");
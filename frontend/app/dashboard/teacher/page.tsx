@@ -153,6 +153,9 @@ export default function TeacherDashboard() {
                                                             }
                                                         }));
                                                     }
+                                                    if (result.unreplacedPlaceholders > 0) {
+                                                        alert(`文件中仍有 ${result.unreplacedPlaceholders} 個欄位未填入，請檢查後再使用。`);
+                                                    }
                                                 } catch (error: unknown) {
                                                     console.error("Download error:", error);
                                                     if (error instanceof Error && error.name === 'AbortError') {
@@ -32,7 +32,7 @@ export default function LoginPage() {
             if (!res.ok) throw new Error("Invalid credentials");
 
             const data = await res.json();
-            login(data.access_token, data.role);
+            login(data.access_token, data.role, data.refresh_token, data.expires_in);
         } catch (err) {
             setError("Login failed. Please check your credentials.");
         }
@@ -0,0 +1,25 @@
+// Submit a saved application for review. The backend checks the form first and
+// answers 422 with the validation errors, which are shown to the teacher.
+// Returns true if the application was submitted.
+export async function submitApplication(applicationId: string): Promise<boolean> {
+    const res = await fetch(`/api/applications/${applicationId}/status`, {
+        method: "POST",
+        headers: {
+            "Content-Type": "application/json",
+            Authorization: `Bearer ${localStorage.getItem("token")}`,
+        },
+        body: JSON.stringify({ status: "SUBMITTED" }),
+    });
+    if (res.status === 422) {
+        const { detail } = await res.json();
+        const errors: { page: number; message: string }[] = detail?.errors || [];
+        const lines = errors.slice(0, 10).map((e) => `第 ${e.page} 頁：${e.message}`);
+        if (errors.length > lines.length) lines.push(`……共 ${errors.length} 項`);
+        alert(`申請表尚未完成，已儲存為草稿 (Saved as draft, please fix the form):\n\n${lines.join("\n")}`);
+        return false;
+    }
+    if (!res.ok) {
+        throw new Error(`Failed to submit: ${res.status} ${await res.text()}`);
+    }
+    return true;
+}
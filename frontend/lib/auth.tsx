@@ -1,6 +1,6 @@
 "use client";
 
-import { createContext, useContext, useState, useEffect, ReactNode } from "react";
+import { createContext, useContext, useState, useEffect, useRef, ReactNode } from "react";
 import { useRouter } from "next/navigation";
 
 interface User {
@@ -12,25 +12,110 @@ interface User {
 
 interface AuthContextType {
     user: User | null;
-    login: (token: string, role: string) => void;
+    login: (token: string, role: string, refreshToken?: string, expiresIn?: number) => void;
     logout: () => void;
     isLoading: boolean;
 }
 
 const AuthContext = createContext<AuthContextType | undefined>(undefined);
 
+// Refresh the access token this many seconds before it expires
+const REFRESH_MARGIN_SECONDS = 60;
+// Web Lock shared by all tabs, so only one of them rotates the refresh token
+const REFRESH_LOCK = "auth-token-refresh";
+
+const tokenExpiresAt = (): number => {
+    const stored = Number(localStorage.getItem("token_expires_at"));
+    if (stored) return stored;
+    // Sessions from before token_expires_at was stored: read exp from the JWT
+    const token = localStorage.getItem("token");
+    try {
+        const payload = JSON.parse(atob(token!.split(".")[1].replace(/-/g, "+").replace(/_/g, "/")));
+        return payload.exp * 1000;
+    } catch {
+        return 0;
+    }
+};
+
+const storeTokens = (accessToken: string, refreshToken: string | undefined, expiresIn: number | undefined) => {
+    localStorage.setItem("token", accessToken);
+    if (refreshToken) localStorage.setItem("refresh_token", refreshToken);
+    if (expiresIn) localStorage.setItem("token_expires_at", String(Date.now() + expiresIn * 1000));
+    else localStorage.removeItem("token_expires_at");
+};
+
+const clearTokens = () => {
+    localStorage.removeItem("token");
+    localStorage.removeItem("refresh_token");
+    localStorage.removeItem("token_expires_at");
+};
+
+const withRefreshLock = <T,>(task: () => Promise<T>): Promise<T> =>
+    typeof navigator !== "undefined" && navigator.locks
+        ? navigator.locks.request(REFRESH_LOCK, task)
+        : task();
+
 export function AuthProvider({ children }: { children: ReactNode }) {
     const [user, setUser] = useState<User | null>(null);
     const [isLoading, setIsLoading] = useState(true);
     const router = useRouter();
+    const refreshTimer = useRef<ReturnType<typeof setTimeout> | null>(null);
+
+    // Schedule the next refresh from the stored expiry, which every tab shares
+    const scheduleRefresh = () => {
+        if (refreshTimer.current) clearTimeout(refreshTimer.current);
+        if (!localStorage.getItem("refresh_token")) return;
+        const delay = Math.max(tokenExpiresAt() - Date.now() - REFRESH_MARGIN_SECONDS * 1000, 0);
+        refreshTimer.current = setTimeout(refreshTokens, delay);
+    };
+
+    const refreshTokens = () =>
+        withRefreshLock(async () => {
+            // Another tab may have refreshed while we waited for the lock
+            if (tokenExpiresAt() - Date.now() > REFRESH_MARGIN_SECONDS * 1000) {
+                scheduleRefresh();
+                return true;
+            }
+            const refreshToken = localStorage.getItem("refresh_token");
+            if (!refreshToken) return false;
+            try {
+                const res = await fetch("/api/token/refresh", {
+                    method: "POST",
+                    headers: { "Content-Type": "application/json" },
+                    body: JSON.stringify({ refresh_token: refreshToken }),
+                });
+                if (res.status === 401) {
+                    clearTokens();
+                    setUser(null);
+                    return false;
+                }
+                if (!res.ok) throw new Error("Refresh failed");
+                const data = await res.json();
+                storeTokens(data.access_token, data.refresh_token, data.expires_in);
+                scheduleRefresh();
+                return true;
+            } catch {
+                // Network or server error: keep the tokens and try again shortly
+                if (refreshTimer.current) clearTimeout(refreshTimer.current);
+                refreshTimer.current = setTimeout(refreshTokens, 10000);
+                return false;
+            }
+        });
 
     useEffect(() => {
         const token = localStorage.getItem("token");
         if (token) {
-            // Fetch user details
-            fetch("/api/users/me", {
-                headers: { Authorization: `Bearer ${token}` },
-            })
+            // Only refresh on load if the stored access token is about to expire
+            const ready = tokenExpiresAt() - Date.now() > REFRESH_MARGIN_SECONDS * 1000
+                ? Promise.resolve(true)
+                : refreshTokens();
+            ready
+                .then(() => {
+                    scheduleRefresh();
+                    return fetch("/api/users/me", {
+                        headers: { Authorization: `Bearer ${localStorage.getItem("token")}` },
+                    });
+                })
                 .then((res) => {
                     if (res.ok) return res.json();
                     throw new Error("Failed to fetch user");
@@ -44,10 +129,26 @@ export function AuthProvider({ children }: { children: ReactNode }) {
         } else {
             setIsLoading(false);
         }
+
+        // Follow refreshes and logouts made in other tabs
+        const onStorage = (event: StorageEvent) => {
+            if (event.key === "token_expires_at" || event.key === "refresh_token") {
+                scheduleRefresh();
+            } else if (event.key === "token" && event.newValue === null) {
+                if (refreshTimer.current) clearTimeout(refreshTimer.current);
+                setUser(null);
+            }
+        };
+        window.addEventListener("storage", onStorage);
+        return () => {
+            window.removeEventListener("storage", onStorage);
+            if (refreshTimer.current) clearTimeout(refreshTimer.current);
+        };
     }, []);
 
-    const login = (token: string, role: string) => {
-        localStorage.setItem("token", token);
+    const login = (token: string, role: string, refreshToken?: string, expiresIn?: number) => {
+        storeTokens(token, refreshToken, expiresIn);
+        scheduleRefresh();
         // Refresh user data immediately
         fetch("/api/users/me", {
             headers: { Authorization: `Bearer ${token}` },
@@ -63,7 +164,16 @@ export function AuthProvider({ children }: { children: ReactNode }) {
     };
 
     const logout = () => {
-        localStorage.removeItem("token");
+        const refreshToken = localStorage.getItem("refresh_token");
+        if (refreshToken) {
+            fetch("/api/token/revoke", {
+                method: "POST",
+                headers: { "Content-Type": "application/json" },
+                body: JSON.stringify({ refresh_token: refreshToken }),
+            });
+        }
+        if (refreshTimer.current) clearTimeout(refreshTimer.current);
+        clearTokens();
         setUser(null);
         router.push("/login");
     };